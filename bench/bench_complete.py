@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+Latency of prefix search (WordnetSQL.complete / LemmaIndex)
+Latest version can be found at https://github.com/letuananh/yawlib
+
+Usage:
+    python3 -m bench.bench_complete            # synthetic vocabulary (150,000 lemmas)
+    python3 -m bench.bench_complete -w ~/wordnet/sqlite-30.db
+
+@author: Le Tuan Anh <tuananh.ke@gmail.com>
+'''
+
+# Copyright (c) 2017, Le Tuan Anh <tuananh.ke@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+__author__ = "Le Tuan Anh <tuananh.ke@gmail.com>"
+__copyright__ = "Copyright 2017, yawlib"
+__credits__ = []
+__license__ = "MIT"
+__version__ = "0.1"
+__maintainer__ = "Le Tuan Anh"
+__email__ = "<tuananh.ke@gmail.com>"
+__status__ = "Prototype"
+
+########################################################################
+
+import time
+import random
+import string
+import argparse
+from yawlib.wordnetsql import WordnetSQL, LemmaIndex
+
+########################################################################
+
+
+def synthetic_rows(count, seed=42):
+    rng = random.Random(seed)
+    for _ in range(count):
+        lemma = ''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(3, 12)))
+        yield lemma, rng.choice('nvar'), int(rng.paretovariate(1.5)) - 1
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def run(complete, prefixes, limit):
+    latencies = []
+    for prefix in prefixes:
+        start = time.perf_counter()
+        complete(prefix, limit)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prefix search benchmark")
+    parser.add_argument('-w', '--wnsql', help='Path to WordNet SQLite 3.0 DB (synthetic vocabulary is used otherwise)')
+    parser.add_argument('-n', '--queries', type=int, default=20000)
+    parser.add_argument('-l', '--limit', type=int, default=10)
+    args = parser.parse_args()
+    start = time.perf_counter()
+    if args.wnsql:
+        wn = WordnetSQL(args.wnsql)
+        index = wn.get_lemma_index()
+    else:
+        index = LemmaIndex(synthetic_rows(150000))
+    print("Index of {} lemmas built in {:.2f}s".format(len(index), time.perf_counter() - start))
+    rng = random.Random(7)
+    lemmas = index.lemmas
+    prefixes = [rng.choice(lemmas)[:rng.randint(1, 5)] for _ in range(args.queries)]
+    # first pass: memoizes short prefixes, second pass: steady state
+    for label in ('cold', 'warm'):
+        latencies = run(index.complete, prefixes, args.limit)
+        print("{}: p50 {:.3f}ms | p99 {:.3f}ms | max {:.3f}ms".format(label, *(x * 1000 for x in (percentile(latencies, 50), percentile(latencies, 99), max(latencies)))))
+
+
+if __name__ == "__main__":
+    main()
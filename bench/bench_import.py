@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+Import-time benchmark of yawlib (python -X importtime)
+Latest version can be found at https://github.com/letuananh/yawlib
+
+Usage:
+    python3 -m bench.bench_import
+    python3 -m bench.bench_import --budget 20 --stmt "import yawlib.wntk"
+
+Exit status is 1 when the import takes longer than the budget (best of N runs)
+or when it loads a heavy dependency (lxml, chirptext, puchikarui, fuzzywuzzy).
+
+@author: Le Tuan Anh <tuananh.ke@gmail.com>
+'''
+
+# Copyright (c) 2017, Le Tuan Anh <tuananh.ke@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+__author__ = "Le Tuan Anh <tuananh.ke@gmail.com>"
+__copyright__ = "Copyright 2017, yawlib"
+__credits__ = []
+__license__ = "MIT"
+__version__ = "0.1"
+__maintainer__ = "Le Tuan Anh"
+__email__ = "<tuananh.ke@gmail.com>"
+__status__ = "Prototype"
+
+########################################################################
+
+import re
+import sys
+import argparse
+import subprocess
+
+########################################################################
+
+DEFAULT_STMT = "from yawlib import SynsetID"
+BUDGET_MS = 20  # was ~115ms when yawlib/__init__ imported everything
+RUNS = 7
+HEAVY_MODULES = ('lxml', 'chirptext', 'puchikarui', 'fuzzywuzzy')
+# import time:    self [us] | cumulative | imported package
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)$')
+
+
+def importtime(stmt):
+    ''' Run stmt in a fresh interpreter
+    Return its wall time (us), a list of (module, self us, cumulative us, depth) and the newly loaded modules
+    '''
+    # modules imported by site (sitecustomize, .pth files) are not counted
+    code = ("import sys, time; _before = set(sys.modules); _start = time.perf_counter(); {}\n"
+            "print(int((time.perf_counter() - _start) * 1e6), *sorted(set(sys.modules) - _before))").format(stmt)
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                          stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True, check=True)
+    elapsed, *loaded = proc.stdout.split()
+    entries = []
+    started = False
+    for line in proc.stderr.splitlines():
+        m = IMPORTTIME_LINE.match(line)
+        if not m:
+            continue
+        name = m.group(4)
+        if not started:
+            # skip interpreter start-up, the first import of the statement is the first newly loaded module
+            if name not in loaded:
+                continue
+            started = True
+        entries.append((name, int(m.group(1)), int(m.group(2)), (len(m.group(3)) - 1) // 2))
+    return int(elapsed), entries, loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time benchmark of yawlib")
+    parser.add_argument('--stmt', default=DEFAULT_STMT, help="Import statement to measure")
+    parser.add_argument('--budget', type=float, default=BUDGET_MS, help="Budget in milliseconds")
+    parser.add_argument('-n', '--runs', type=int, default=RUNS, help="Number of runs (best is reported)")
+    parser.add_argument('--top', type=int, default=10, help="Number of slowest modules to show")
+    args = parser.parse_args()
+    best = None
+    for _ in range(args.runs):
+        total, entries, loaded = importtime(args.stmt)
+        if best is None or total < best[0]:
+            best = (total, entries, loaded)
+    total, entries, loaded = best
+    print("{} -- best of {} runs: {:.2f} ms (budget: {} ms)".format(args.stmt, args.runs, total / 1000, args.budget))
+    print('-' * 60)
+    for name, self_us, cumulative, depth in sorted(entries, key=lambda e: -e[1])[:args.top]:
+        print("{:<45} {:>8.2f} ms".format(name, self_us / 1000))
+    heavy = sorted({m.split('.')[0] for m in loaded if m.split('.')[0] in HEAVY_MODULES})
+    failed = False
+    if heavy:
+        print("FAIL: heavy dependencies were imported: {}".format(', '.join(heavy)))
+        failed = True
+    if total / 1000 > args.budget:
+        print("FAIL: over budget")
+        failed = True
+    if not failed:
+        print("OK")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
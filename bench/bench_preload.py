@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+Compare gunicorn workers with and without preloaded yawol caches
+Latest version can be found at https://github.com/letuananh/yawlib
+
+Usage:
+    python3 -m bench.bench_preload -w ~/wordnet/sqlite-30.db -n 4
+    python3 -m bench.bench_preload --app yawolsite.wsgi
+
+For each mode, gunicorn is started with gunicorn.conf.py and then:
+- the first requests (/yawol/complete and /yawol/search) are timed,
+  one per worker, all at once
+- memory of every worker is read from /proc (Linux only): RSS, PSS
+  (shared pages divided among processes) and USS (private pages)
+
+@author: Le Tuan Anh <tuananh.ke@gmail.com>
+'''
+
+# Copyright (c) 2017, Le Tuan Anh <tuananh.ke@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+__author__ = "Le Tuan Anh <tuananh.ke@gmail.com>"
+__copyright__ = "Copyright 2017, yawlib"
+__credits__ = []
+__license__ = "MIT"
+__version__ = "0.1"
+__maintainer__ = "Le Tuan Anh"
+__email__ = "<tuananh.ke@gmail.com>"
+__status__ = "Prototype"
+
+########################################################################
+
+import os
+import sys
+import time
+import argparse
+import threading
+import subprocess
+import http.client
+
+########################################################################
+
+ROOT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+FIRST_REQUESTS = ['/yawol/complete/a', '/yawol/search/love', '/yawol/search/be']
+
+
+def memory_of(pid):
+    ''' (RSS, PSS, USS) in KB '''
+    mem = {}
+    with open('/proc/{}/smaps_rollup'.format(pid)) as infile:
+        for line in infile:
+            parts = line.split()
+            if len(parts) >= 2 and parts[1].isdigit():
+                mem[parts[0].rstrip(':')] = int(parts[1])
+    uss = mem.get('Private_Clean', 0) + mem.get('Private_Dirty', 0)
+    return mem.get('Rss', 0), mem.get('Pss', 0), uss
+
+
+def workers_of(pid):
+    with open('/proc/{}/task/{}/children'.format(pid, pid)) as infile:
+        return [int(x) for x in infile.read().split()]
+
+
+def request(port, path, timeout=120):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=timeout)
+    start = time.perf_counter()
+    conn.request('GET', path)
+    conn.getresponse().read()
+    conn.close()
+    return time.perf_counter() - start
+
+
+def wait_until_ready(server, port, timeout=300):
+    start = time.time()
+    while time.time() - start < timeout:
+        if server.poll() is not None:
+            raise Exception("Server exited with code {}".format(server.returncode))
+        try:
+            request(port, '/yawol/version', timeout=5)
+            return time.time() - start
+        except OSError:
+            time.sleep(0.2)
+    raise Exception("Server did not start")
+
+
+def run(args, preload):
+    env = dict(os.environ, YAWOL_PRELOAD='1' if preload else '0', YAWOL_WORKERS=str(args.workers),
+               YAWOL_BIND='127.0.0.1:{}'.format(args.port))
+    if args.wnsql:
+        env['YAWLIB_WNSQL30_PATH'] = args.wnsql
+    cmd = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', args.app]
+    server = subprocess.Popen(cmd, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        startup = wait_until_ready(server, args.port)
+        time.sleep(1)  # let all workers boot
+        latencies = []
+        for path in FIRST_REQUESTS:
+            threads = [threading.Thread(target=lambda p=path: latencies.append((p, request(args.port, p))))
+                       for _ in range(args.workers)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+        mems = [memory_of(pid) for pid in workers_of(server.pid)]
+        master = memory_of(server.pid)
+    finally:
+        server.terminate()
+        server.wait()
+    print("preload={} | startup: {:.2f}s".format(preload, startup))
+    for path in FIRST_REQUESTS:
+        times = [t for p, t in latencies if p == path]
+        print("  first {:<25} max {:8.2f}ms | avg {:8.2f}ms".format(path, max(times) * 1000, sum(times) / len(times) * 1000))
+    print("  master RSS {:.1f}MB".format(master[0] / 1024))
+    for rss, pss, uss in mems:
+        print("  worker RSS {:.1f}MB | PSS {:.1f}MB | USS {:.1f}MB".format(rss / 1024, pss / 1024, uss / 1024))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="gunicorn preload benchmark")
+    parser.add_argument('-w', '--wnsql', help='Path to WordNet SQLite 3.0 DB')
+    parser.add_argument('-n', '--workers', type=int, default=4)
+    parser.add_argument('-p', '--port', type=int, default=8123)
+    parser.add_argument('--app', default='yawol-flask:app')
+    args = parser.parse_args()
+    for preload in (False, True):
+        run(args, preload)
+
+
+if __name__ == "__main__":
+    main()
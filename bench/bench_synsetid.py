@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+Micro-benchmarks for SynsetID parsing and conversions
+Latest version can be found at https://github.com/letuananh/yawlib
+
+Usage:
+    python3 -m bench.bench_synsetid
+
+@author: Le Tuan Anh <tuananh.ke@gmail.com>
+'''
+
+# Copyright (c) 2017, Le Tuan Anh <tuananh.ke@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+__author__ = "Le Tuan Anh <tuananh.ke@gmail.com>"
+__copyright__ = "Copyright 2017, yawlib"
+__credits__ = []
+__license__ = "MIT"
+__version__ = "0.1"
+__maintainer__ = "Le Tuan Anh"
+__email__ = "<tuananh.ke@gmail.com>"
+__status__ = "Prototype"
+
+########################################################################
+
+import re
+import timeit
+from yawlib.models import SynsetID, _parse_sid
+
+########################################################################
+
+NUMBER = 200000
+REPEAT = 5
+# regex parser used before SynsetID was packed (baseline)
+WNSQL_FORMAT = re.compile(r'(?P<pos>[123456nvarsx])(?P<offset>\d{8})')
+CANONICAL_FORMAT = re.compile(r'(?P<offset>\d{8})-?(?P<pos>[nvasrx])')
+
+
+def regex_parse(synsetid):
+    m = WNSQL_FORMAT.match(str(synsetid))
+    if m:
+        return m.group('offset'), m.group('pos')
+    m = CANONICAL_FORMAT.match(str(synsetid))
+    if m:
+        return m.group('offset'), m.group('pos')
+
+
+def bench(label, stmt, setup_globals):
+    times = timeit.repeat(stmt, globals=setup_globals, number=NUMBER, repeat=REPEAT)
+    best = min(times) / NUMBER * 1e9
+    print("{:<40} {:>10.1f} ns/op".format(label, best))
+    return best
+
+
+def main():
+    sid = SynsetID.from_string('01775164-v')
+    other = SynsetID.from_string('201775164')
+    d = {sid: 'love'}
+    env = {'SynsetID': SynsetID, 'parse': _parse_sid.__wrapped__, 'regex_parse': regex_parse,
+           'sid': sid, 'other': other, 'd': d}
+    print("SynsetID micro-benchmarks (best of {}, {} loops)".format(REPEAT, NUMBER))
+    print('-' * 60)
+    bench("regex parse (baseline, canonical)", "regex_parse('01775164-v')", env)
+    bench("regex parse (baseline, wnsql)", "regex_parse('201775164')", env)
+    bench("parse uncached (canonical)", "parse('01775164-v')", env)
+    bench("parse uncached (wnsql str)", "parse('201775164')", env)
+    bench("parse uncached (wnsql int)", "parse(201775164)", env)
+    bench("parse uncached (gwnsql)", "parse('v01775164')", env)
+    bench("from_string cached (canonical)", "SynsetID.from_string('01775164-v')", env)
+    bench("from_string cached (wnsql int)", "SynsetID.from_string(201775164)", env)
+    bench("from_string cached (gwnsql)", "SynsetID.from_string('v01775164')", env)
+    bench("to_canonical", "sid.to_canonical()", env)
+    bench("to_wnsql", "sid.to_wnsql()", env)
+    bench("to_gwnsql", "sid.to_gwnsql()", env)
+    bench("hash", "hash(sid)", env)
+    bench("eq (SynsetID)", "sid == other", env)
+    bench("eq (str)", "sid == '01775164-v'", env)
+    bench("dict lookup", "d[other]", env)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+Load test for yawol REST servers (yawol-flask.py, yawol-asgi.py)
+Latest version can be found at https://github.com/letuananh/yawlib
+
+Usage:
+    python3 yawol-flask.py                       # or: python3 yawol-asgi.py --port 5000
+    python3 -m bench.bench_yawol_load -u http://127.0.0.1:5000 -c 32 -n 5000
+
+Each client thread keeps one HTTP/1.1 connection open and sends requests
+for the given queries in a round robin. Throughput and latency percentiles
+are reported at the end.
+
+@author: Le Tuan Anh <tuananh.ke@gmail.com>
+'''
+
+# Copyright (c) 2017, Le Tuan Anh <tuananh.ke@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+__author__ = "Le Tuan Anh <tuananh.ke@gmail.com>"
+__copyright__ = "Copyright 2017, yawlib"
+__credits__ = []
+__license__ = "MIT"
+__version__ = "0.1"
+__maintainer__ = "Le Tuan Anh"
+__email__ = "<tuananh.ke@gmail.com>"
+__status__ = "Prototype"
+
+########################################################################
+
+import time
+import argparse
+import threading
+import http.client
+from urllib.parse import urlparse, quote
+
+########################################################################
+
+QUERIES = ['love', 'love%2:37:00::', '01775164-v', 'v01775164', 'able', 'passion', 'object', 'notaword']
+
+
+def percentile(values, p):
+    if not values:
+        return 0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def client(url, paths, count, latencies, errors):
+    conn = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=30)
+    for i in range(count):
+        path = paths[i % len(paths)]
+        start = time.perf_counter()
+        try:
+            conn.request('GET', path)
+            resp = conn.getresponse()
+            resp.read()
+            if resp.status >= 500:
+                errors.append(resp.status)
+        except (OSError, http.client.HTTPException) as e:
+            errors.append(str(e))
+            conn.close()
+            conn = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=30)
+        latencies.append(time.perf_counter() - start)
+    conn.close()
+
+
+def run(base_url, concurrency, total, queries, unique=False):
+    url = urlparse(base_url)
+    paths = ['/yawol/search/{}'.format(quote(q)) for q in queries]
+    if unique:
+        # different JSONP callbacks => different ETags, but the same cached lookups
+        paths = ['{}?callback=cb{}'.format(p, i) for i, p in enumerate(paths * 4)]
+    latencies = []
+    errors = []
+    per_client = total // concurrency
+    threads = [threading.Thread(target=client, args=(url, paths, per_client, latencies, errors)) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    print("{}: {} requests, {} clients, {:.2f}s".format(base_url, len(latencies), concurrency, elapsed))
+    print("  throughput: {:.0f} req/s".format(len(latencies) / elapsed))
+    print("  latency p50: {:.2f}ms | p90: {:.2f}ms | p99: {:.2f}ms".format(*(percentile(latencies, p) * 1000 for p in (50, 90, 99))))
+    print("  errors: {}".format(len(errors)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Yawol load test")
+    parser.add_argument('-u', '--url', nargs='+', default=['http://127.0.0.1:5000'], help='Base URL(s) of the servers to compare')
+    parser.add_argument('-c', '--concurrency', type=int, default=32)
+    parser.add_argument('-n', '--requests', type=int, default=5000)
+    parser.add_argument('-q', '--queries', nargs='*', default=QUERIES)
+    parser.add_argument('--unique', action='store_true', help='Vary JSONP callbacks')
+    args = parser.parse_args()
+    for base_url in args.url:
+        run(base_url, args.concurrency, args.requests, args.queries, args.unique)
+
+
+if __name__ == "__main__":
+    main()
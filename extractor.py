@@ -42,10 +42,14 @@ import os.path
 import argparse
 import itertools
 import logging
+import re
 import csv
+import sqlite3
+from multiprocessing import Pool, get_start_method
 from collections import defaultdict as dd
 from collections import namedtuple
-from difflib import ndiff, unified_diff
+from collections import Counter as CharCounter
+from difflib import ndiff, SequenceMatcher
 from operator import itemgetter
 
 from lxml import etree
@@ -60,15 +64,15 @@ from chirptext.leutile import FileHelper
 
 from yawlib import YLConfig
 from yawlib import SynsetID
+from yawlib.sidconv import wnsql_to_canonical, gwnsql_to_canonical, CODE2POS
 from yawlib.helpers import dump_synset
 from yawlib.helpers import dump_synsets
 from yawlib.helpers import get_gwn, get_wn, get_gwnxml
 from yawlib.helpers import config_logging, add_logging_config
 from yawlib.helpers import add_wordnet_config
 from yawlib.helpers import show_info
-from yawlib import XMLGWordNet
-from yawlib import SQLiteGWordNet
 from yawlib import WordnetSQL as WSQL
+from yawlib.glosswordnet.sqlitedao import SETUP_SCRIPT
 
 try:
     from fuzzywuzzy import fuzz
@@ -80,10 +84,10 @@ except Exception as e:
 #-----------------------------------------------------------------------
 # >>> WARNING: Do NOT change these values here. Change config.py instead!
 #
-WORDNET_30_PATH          = YLConfig.WORDNET_30_PATH
-WORDNET_30_GLOSSTAG_PATH = YLConfig.WORDNET_30_GLOSSTAG_PATH
-WORDNET_30_GLOSS_DB_PATH = YLConfig.WORDNET_30_GLOSS_DB_PATH
-DB_INIT_SCRIPT           = YLConfig.DB_INIT_SCRIPT
+WORDNET_30_PATH          = YLConfig.WNSQL30_PATH
+WORDNET_30_GLOSSTAG_PATH = YLConfig.GWN30_PATH
+WORDNET_30_GLOSS_DB_PATH = YLConfig.GWN30_DB
+DB_INIT_SCRIPT           = SETUP_SCRIPT
 MOCKUP_SYNSETS_DATA      = FileHelper.abspath('data/test.xml')
 GLOSSTAG_NTUMC_OUTPUT    = FileHelper.abspath('data/glosstag_ntumc')
 GLOSSTAG_PATCH           = FileHelper.abspath('data/glosstag_patch.xml')
@@ -96,6 +100,14 @@ glosstag_files = lambda x : [
 MERGED_FOLDER            = os.path.join(WORDNET_30_GLOSSTAG_PATH , 'merged')
 GLOSSTAG_XML_FILES       = glosstag_files(MERGED_FOLDER)
 MISALIGNED               = FileHelper.abspath('data/misaligned.xml')
+EXPORT_CHUNK_SIZE        = 10000      # rows fetched from the DB at a time
+EXPORT_BUFFER_SIZE       = 1 << 20    # output file buffer (bytes)
+# Canonical synset ID order (offset, then POS letter) of WNSQL synset IDs (POS number * 10^8 + offset)
+WNSQL_CANONICAL_ORDER    = 'synsetid % {base}, CASE synsetid / {base} {whens} END'.format(
+    base=SynsetID.WNSQL_BASE,
+    whens=' '.join('WHEN {} THEN {}'.format(code, rank) for rank, code in enumerate(sorted(CODE2POS, key=CODE2POS.get))))
+# ... of GWNSQL synset IDs (n12345678)
+GWNSQL_CANONICAL_ORDER   = 'substr({col}, 2), substr({col}, 1, 1)'
 
 #-----------------------------------------------------------------------
 
@@ -115,6 +127,20 @@ def export_wn_synsets(args):
         export_wnsql_synsets(args)
 
 
+def iter_chunks(conn, query, values=(), chunk_size=EXPORT_CHUNK_SIZE):
+    ''' Fetch the results of a query in chunks (lists of rows) '''
+    cursor = conn.execute(query, values)
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        yield rows
+
+
+def open_export_file(path):
+    return open(path, 'w', buffering=EXPORT_BUFFER_SIZE)
+
+
 def export_gwnsql_synsets(args):
     print("Exporting synsets' info (lemmas/defs/examples) from GlossWordNet (SQLite) to text file")
     show_info(args)
@@ -122,36 +148,79 @@ def export_gwnsql_synsets(args):
     output_without_sid_file = os.path.abspath('./data/glosstag_lemmas_noss.txt')
     output_defs = os.path.abspath('./data/glosstag_defs.txt')
     output_exes = os.path.abspath('./data/glosstag_exes.txt')
-    gwn = get_gwn(args)
 
     # Extract synsets' lemmas, definitions and examples
     if args.mockup:
         synsets = get_gwnxml(args).synsets
+        synsets.synsets.sort(key=lambda x: x.sid.to_canonical())
+        lemma_rows = ((ss.sid.to_canonical(), t) for ss in synsets for t in sorted(ss.lemmas))
+        gloss_rows = ((str(ss.sid), gloss.cat, gloss.text()) for ss in synsets for gloss in ss.glosses)
+        synset_count = len(synsets)
+        export_gloss_files(lemma_rows, gloss_rows, output_with_sid_file, output_without_sid_file, output_defs, output_exes)
     else:
-        synsets = gwn.all_synsets()
-
-    synsets.synsets.sort(key=lambda x: x.sid.to_canonical())
-    with open(output_defs, 'w') as def_file, open(output_exes, 'w') as ex_file, open(output_with_sid_file, 'w') as with_sid, open(output_without_sid_file, 'w') as without_sid:
-        # synsets = gwn.get_synsets_by_ids(['01828736-v', '00001740-r'])
-        for ss in synsets:
-            for t in sorted(ss.terms, key=lambda x: x.term):
-                with_sid.write('%s\t%s\n' % (ss.sid.to_canonical(), t.term))
-                without_sid.write('%s\n' % (t.term,))
-            for gloss in ss.glosses:
-                if gloss.cat == 'def':
-                    def_file.write('{sid}\t{d}\n'.format(sid=ss.sid, d=gloss.text()))
-                elif gloss.cat == 'ex':
-                    ex_file.write('{sid}\t{ex}\n'.format(sid=ss.sid, ex=gloss.text()))
+        conn = sqlite3.connect(get_gwn(args).db_path)
+        try:
+            synset_count = conn.execute('SELECT COUNT(*) FROM synset').fetchone()[0]
+            export_gloss_files(iter_gwnsql_lemmas(conn), iter_gwnsql_glosses(conn),
+                               output_with_sid_file, output_without_sid_file, output_defs, output_exes)
+        finally:
+            conn.close()
     # summary
     print("Data has been extracted to:")
     print("  + {}".format(output_with_sid_file))
     print("  + {}".format(output_without_sid_file))
     print("  + {}".format(output_defs))
     print("  + {}".format(output_exes))
-    print("Extracted synsets: {}".format(len(synsets)))
+    print("Extracted synsets: {}".format(synset_count))
     print("Done!")
 
 
+def export_gloss_files(lemma_rows, gloss_rows, output_with_sid_file, output_without_sid_file, output_defs, output_exes):
+    ''' Write (canonical sid, term) and (canonical sid, gloss cat, gloss text) rows (sorted by synset ID) '''
+    with open_export_file(output_with_sid_file) as with_sid, open_export_file(output_without_sid_file) as without_sid:
+        for sid, term in lemma_rows:
+            with_sid.write('%s\t%s\n' % (sid, term))
+            without_sid.write('%s\n' % (term,))
+    with open_export_file(output_defs) as def_file, open_export_file(output_exes) as ex_file:
+        for sid, cat, text in gloss_rows:
+            if cat == 'def':
+                def_file.write('{sid}\t{d}\n'.format(sid=sid, d=text))
+            elif cat == 'ex':
+                ex_file.write('{sid}\t{ex}\n'.format(sid=sid, ex=text))
+
+
+def iter_gwnsql_lemmas(conn):
+    ''' (canonical sid, term) of all synsets, ordered by synset ID and term '''
+    query = '''SELECT term.sid, term.term FROM term INNER JOIN synset ON synset.id = term.sid
+                 ORDER BY {}, term.term'''.format(GWNSQL_CANONICAL_ORDER.format(col='term.sid'))
+    for rows in iter_chunks(conn, query):
+        yield from zip(gwnsql_to_canonical([r[0] for r in rows]), (r[1] for r in rows))
+
+
+def iter_gwnsql_glosses(conn):
+    ''' (canonical sid, cat, text) of definitions and examples, ordered by synset ID and gloss ID
+    Gloss texts are built from gloss items the same way as Gloss.text()
+    '''
+    query = '''SELECT gloss.id, gloss.sid, gloss.cat, glossitem.text
+                 FROM gloss INNER JOIN synset ON synset.id = gloss.sid
+                 LEFT JOIN glossitem ON glossitem.gid = gloss.id
+                 WHERE gloss.cat IN ('def', 'ex')
+                 ORDER BY {}, gloss.id, glossitem.id'''.format(GWNSQL_CANONICAL_ORDER.format(col='gloss.sid'))
+    # glosses may span two chunks
+    gid, sid, cat, texts = None, None, None, []
+    for rows in iter_chunks(conn, query):
+        sids = gwnsql_to_canonical([r[1] for r in rows])
+        for row_sid, (row_gid, _, row_cat, text) in zip(sids, rows):
+            if row_gid != gid:
+                if gid is not None:
+                    yield sid, cat, ' '.join(texts).replace(' ;', ';')
+                gid, sid, cat, texts = row_gid, row_sid, row_cat, []
+            # a gloss without items is a single row with NULL text (the same as an empty text)
+            texts.append(text.strip() if text else '')
+    if gid is not None:
+        yield sid, cat, ' '.join(texts).replace(' ;', ';')
+
+
 def export_wnsql_synsets(args):
     print("Exporting synsets' info (lemmas/defs/examples) from WordnetSQL (Princeton Wordnet 3.0) to text file")
     show_info(args)
@@ -159,37 +228,22 @@ def export_wnsql_synsets(args):
     output_without_sid_file = os.path.abspath('./data/wn30_lemmas_noss.txt')
     output_defs = os.path.abspath('./data/wn30_defs.txt')
     output_exes = os.path.abspath('./data/wn30_exes.txt')
-    wn = get_wn(args)
+    conn = get_wn(args).get_local_conn()
     # Extract lemmas
-    records = wn.get_all_synsets()
-    synsets_lemmas = []
-    for r in records:
-        synsets_lemmas.append((SynsetID.from_string(str(r.synsetid)).to_canonical(), r.lemma))
-    synsets_lemmas.sort(key=itemgetter(0, 1))
-    with open(output_with_sid_file, 'w') as with_sid, open(output_without_sid_file, 'w') as without_sid:
-        for row in synsets_lemmas:
-            with_sid.write('%s\t%s\n' % row)
-            without_sid.write('%s\n' % (row[1],))  # just the lemma
+    query = 'SELECT synsetid, lemma FROM wordsXsensesXsynsets ORDER BY {}, lemma'.format(WNSQL_CANONICAL_ORDER)
+    with open_export_file(output_with_sid_file) as with_sid, open_export_file(output_without_sid_file) as without_sid:
+        for rows in iter_chunks(conn, query):
+            sids = wnsql_to_canonical([r[0] for r in rows])
+            with_sid.writelines('%s\t%s\n' % (sid, r[1]) for sid, r in zip(sids, rows))
+            without_sid.writelines('%s\n' % (r[1],) for r in rows)  # just the lemma
 
     # Extract synset definitions
-    records = wn.schema.ss.select(orderby='synsetid')
-    synsets_defs = []
-    for r in records:
-        synsets_defs.append((SynsetID.from_string(r.synsetid).to_canonical(), r.definition))
-    synsets_defs.sort(key=itemgetter(0))
-    with open(output_defs, 'w') as def_file:
-        for row in synsets_defs:
-            def_file.write('%s\t%s\n' % row)
-
-    # Extract examples
-    records = wn.schema.ex.select(orderby='synsetid')
-    synsets_examples = []
-    for r in records:
-        synsets_examples.append((SynsetID.from_string(r.synsetid).to_canonical(), r.sample))
-    synsets_examples.sort(key=itemgetter(0))
-    with open(output_exes, 'w') as ex_file:
-        for row in synsets_examples:
-            ex_file.write('%s\t%s\n' % row)
+    query = 'SELECT synsetid, definition FROM synsets ORDER BY {}'.format(WNSQL_CANONICAL_ORDER)
+    export_wnsql_rows(conn, query, output_defs)
+
+    # Extract examples (in their original order within a synset)
+    query = 'SELECT synsetid, sample FROM samples ORDER BY {}, sampleid'.format(WNSQL_CANONICAL_ORDER)
+    export_wnsql_rows(conn, query, output_exes)
 
     # summary
     print("Data has been extracted to:")
@@ -200,6 +254,14 @@ def export_wnsql_synsets(args):
     print("Done!")
 
 
+def export_wnsql_rows(conn, query, path):
+    ''' Write (WNSQL synset ID, text) rows as canonical synset ID<TAB>text lines '''
+    with open_export_file(path) as outfile:
+        for rows in iter_chunks(conn, query):
+            sids = wnsql_to_canonical([r[0] for r in rows])
+            outfile.writelines('%s\t%s\n' % (sid, r[1]) for sid, r in zip(sids, rows))
+
+
 # wordnet data
 class WNData:
     def __init__(self, profile, folder='./data/'):
@@ -248,6 +310,7 @@ class WNData:
 
     def get_sid(self, sid):
         if sid not in self.sids:
+            trysid = None
             if sid.endswith('r'):
                 trysid = sid[:-1] + 's'
             elif sid.endswith('s'):
@@ -258,7 +321,7 @@ class WNData:
             return sid
         return None
 
-    def compare_to(self, other_wn):
+    def compare_to(self, other_wn, processes=None):
         c = Counter()
         for sid in self.sids:
             other_sid = sid
@@ -275,34 +338,102 @@ class WNData:
                 c.count('Lemma diff')
                 print("{}: [{}] vs [{}]".format(sid, self.lemma_map[sid], other_wn.lemma_map[other_sid]))
         # compare defs
-        diffs = set()  # store all differences to see 
-        for sid in self.sids:
-            other_sid = other_wn.get_sid(sid)
-            if not other_sid:
-                print("Cannot find definition for {}".format(sid))
-            mydef = self.def_map[sid]
-            odef = other_wn.def_map[other_sid]
-            if fuzz.ratio(mydef, odef) < 100:
-                diff = simple_diff(mydef, odef)
-                if ''.join(set(diff)) not in '(-_ \'";.':
+        diffs = set()  # store all differences to see
+        with open(os.path.abspath('./data/diffs.txt'), 'w') as outfile:
+            for sid, other_sid, mydef, odef, diff in compare_defs(self.def_pairs(other_wn, c), c, processes):
+                if diff not in diffs:
                     diffs.add(diff)
-                    c.count("def diff")
-                    print("{prof} ({sid}): {mydef}\n{otherprof} ({osid}): {otherdef}\ndiff: {diff}--".format(prof=self.profile, sid=sid, mydef=mydef, otherprof=other_wn.profile, osid=other_sid, otherdef=odef, diff=diff))
-            else:
-                c.count("def same")
+                    outfile.write(diff + '\n')
+                c.count("def diff")
+                print("{prof} ({sid}): {mydef}\n{otherprof} ({osid}): {otherdef}\ndiff: {diff}--".format(prof=self.profile, sid=sid, mydef=mydef, otherprof=other_wn.profile, osid=other_sid, otherdef=odef, diff=diff))
         print('-' * 30)
-        with open(os.path.abspath('./data/diffs.txt'), 'w') as outfile:
-            outfile.write('\n'.join(diffs))
         print('\n'.join(sorted(diffs)))
         c.summarise()
 
+    def def_pairs(self, other_wn, c):
+        ''' (sid, other sid, definition, other definition) of synsets in both wordnets '''
+        for sid in self.sids:
+            other_sid = other_wn.get_sid(sid)
+            if not other_sid or other_sid not in other_wn.def_map or sid not in self.def_map:
+                print("Cannot find definition for {}".format(sid))
+                c.count("def missing")
+                continue
+            yield sid, other_sid, self.def_map[sid], other_wn.def_map[other_sid]
+
+
+# Definition comparison: identical definitions (after fix_def) are dropped in the main process,
+# the remaining pairs are scored and diffed in a process pool
+COMPARE_POOL_THRESHOLD = 2000  # smaller candidate sets are compared in-process
+COMPARE_SPAWN_THRESHOLD = 20000  # spawned workers import this script again before they start
+COMPARE_CHUNK_SIZE = 256
+TOKEN_PATTERN = re.compile(r'\w+|[^\w\s]')
+IGNORED_DIFF_CHARS = frozenset('(-_ \'";.')
+SAME_DEF_BOUND = 0.99  # fuzz.ratio() rounds ratios >= 0.995 to 100
+
+
+def compare_defs(pairs, c, processes=None):
+    ''' Compare (sid, other sid, definition, other definition) pairs
+    Yield (sid, other sid, definition, other definition, diff) of definitions which differ
+    '''
+    candidates = []
+    for pair in pairs:
+        if pair[2] == pair[3]:
+            c.count("def same")
+        else:
+            candidates.append(pair)
+    threshold = COMPARE_POOL_THRESHOLD if get_start_method() == 'fork' else COMPARE_SPAWN_THRESHOLD
+    if processes == 1 or len(candidates) < threshold:
+        yield from filter_diffs(candidates, map(compare_def_pair, candidates), c)
+    else:
+        with Pool(processes) as pool:
+            yield from filter_diffs(candidates, pool.imap(compare_def_pair, candidates, COMPARE_CHUNK_SIZE), c)
+
 
-def simple_diff(a, b):
-    '''Extract the difference between two strings'''
-    diffs = unified_diff(a, b)
+def filter_diffs(candidates, diffs, c):
+    ''' Yield candidate pairs with their diffs, unless only punctuation is different '''
+    for pair, diff in zip(candidates, diffs):
+        if diff is None:
+            c.count("def same")
+        elif not set(diff) <= IGNORED_DIFF_CHARS:
+            # not only punctuation is different
+            yield pair + (diff,)
+
+
+def compare_def_pair(pair):
+    ''' Return the diff of two definitions, or None if they are considered the same (fuzzy ratio 100) '''
+    _, _, mydef, odef = pair
+    # fuzz.ratio() is only needed for near-identical definitions
+    if quick_ratio(mydef, odef) >= SAME_DEF_BOUND and fuzz.ratio(mydef, odef) >= 100:
+        return None
+    return token_diff(mydef, odef)
+
+
+def quick_ratio(a, b):
+    ''' Upper bound of the similarity ratio of two strings (based on common characters) '''
+    total = len(a) + len(b)
+    if not total:
+        return 1.0
+    return 2.0 * sum((CharCounter(a) & CharCounter(b)).values()) / total
+
+
+def token_diff(a, b):
+    ''' Extract the difference between two strings
+    Tokens are diffed first, then characters of replaced tokens (whitespace is ignored)
+    '''
+    tokens_a, tokens_b = TOKEN_PATTERN.findall(a), TOKEN_PATTERN.findall(b)
     parts = []
-    for d in [x for x in diffs if x[0] in '-+?' and x.strip() not in ['---', '+++']]:
-        parts.append(d[1:].strip())
+    for tag, i1, i2, j1, j2 in SequenceMatcher(None, tokens_a, tokens_b, autojunk=False).get_opcodes():
+        if tag == 'equal':
+            continue
+        left, right = ''.join(tokens_a[i1:i2]), ''.join(tokens_b[j1:j2])
+        if tag == 'replace':
+            for ctag, ci1, ci2, cj1, cj2 in SequenceMatcher(None, left, right, autojunk=False).get_opcodes():
+                if ctag != 'equal':
+                    parts.append(left[ci1:ci2])
+                    parts.append(right[cj1:cj2])
+        else:
+            parts.append(left)
+            parts.append(right)
     return ''.join(parts)
 
 
@@ -310,7 +441,7 @@ def compare_wordnets(args):
     gwn = WNData('glosstag').read()
     wn30 = WNData('wn30').read()
     # compare wordnets
-    gwn.compare_to(wn30)
+    gwn.compare_to(wn30, processes=args.jobs)
 
 #----------------------------------------------------------------------
 
@@ -335,6 +466,7 @@ def main():
     cmd_extract.set_defaults(func=export_wn_synsets)
 
     cmd_compare = tasks.add_parser('compare', help='Compare extracted wordnets')
+    cmd_compare.add_argument('-j', '--jobs', type=int, help='Number of processes for comparing definitions (default: number of CPUs)')
     cmd_compare.set_defaults(func=compare_wordnets)
 
     cmd_info = tasks.add_parser('info', help='Show configuration information')
@@ -343,7 +475,7 @@ def main():
     # Parse input arguments
     if len(sys.argv) > 1:
         args = parser.parse_args()
-        config_logging(args)
+        config_logging(args, logging.getLogger())
         args.func(args)
     else:
         parser.print_help()
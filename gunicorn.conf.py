@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+
+'''
+gunicorn configuration for yawol REST servers
+Latest version can be found at https://github.com/letuananh/yawlib
+
+Usage:
+    gunicorn -c gunicorn.conf.py yawolsite.wsgi
+    gunicorn -c gunicorn.conf.py yawol-flask:app
+    gunicorn -c gunicorn.conf.py -k uvicorn.workers.UvicornWorker 'yawol-asgi:create_app()'
+
+The application is loaded once in the master process and yawol caches are
+warmed up there (YAWOL_PRELOAD) instead of in every worker. The lemma index
+pages stay shared after the fork (see yawlib.yawol.warmup), cached responses
+are copied by the workers which use them.
+
+@author: Le Tuan Anh <tuananh.ke@gmail.com>
+'''
+
+import os
+import multiprocessing
+
+bind = os.environ.get('YAWOL_BIND', '127.0.0.1:8000')
+workers = int(os.environ.get('YAWOL_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+# each worker thread uses its own read-only SQLite connection
+threads = int(os.environ.get('YAWOL_THREADS', 4))
+# set YAWOL_PRELOAD=0 to load the application in each worker instead
+os.environ.setdefault('YAWOL_PRELOAD', '1')
+preload_app = os.environ['YAWOL_PRELOAD'].lower() in ('1', 'true', 'yes')
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+Script for testing wntk lookup daemon
+Latest version can be found at https://github.com/letuananh/yawlib
+
+@author: Le Tuan Anh <tuananh.ke@gmail.com>
+'''
+
+# Copyright (c) 2017, Le Tuan Anh <tuananh.ke@gmail.com>
+#
+#Permission is hereby granted, free of charge, to any person obtaining a copy
+#of this software and associated documentation files (the "Software"), to deal
+#in the Software without restriction, including without limitation the rights
+#to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#copies of the Software, and to permit persons to whom the Software is
+#furnished to do so, subject to the following conditions:
+#
+#The above copyright notice and this permission notice shall be included in
+#all copies or substantial portions of the Software.
+#
+#THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+#THE SOFTWARE.
+
+__author__ = "Le Tuan Anh <tuananh.ke@gmail.com>"
+__copyright__ = "Copyright 2017, yawlib"
+__credits__ = []
+__license__ = "MIT"
+__version__ = "0.1"
+__maintainer__ = "Le Tuan Anh"
+__email__ = "<tuananh.ke@gmail.com>"
+__status__ = "Prototype"
+
+__author__ = "Le Tuan Anh <tuananh.ke@gmail.com>"
+__copyright__ = "Copyright 2017, yawlib"
+__credits__ = []
+__license__ = "MIT"
+__version__ = "0.1"
+__maintainer__ = "Le Tuan Anh"
+__email__ = "<tuananh.ke@gmail.com>"
+__status__ = "Prototype"
+
+########################################################################
+
+import io
+import os
+import json
+import stat
+import shutil
+import tempfile
+import threading
+import unittest
+from contextlib import redirect_stdout
+from yawlib import Synset, SynsetCollection
+from yawlib.glosswordnet import GWordnetXML, GWordnetSQLite
+from yawlib.helpers import get_synset_by_id, get_synsets_by_term
+from yawlib.daemon import WntkDaemon, DaemonServer, DaemonError, connect, forward
+from yawlib.wntk_client import parse_lookup
+
+########################################################################
+
+TEST_DIR = os.path.dirname(os.path.realpath(__file__))
+MOCKUP_SYNSETS_DATA = os.path.join(TEST_DIR, 'data', 'test.xml')
+
+
+class MockWSQL(object):
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.calls = []
+        love = Synset('01775164-v')
+        love.add_lemma('love')
+        love.add_key('love%2:37:00::')
+        self.synsets = SynsetCollection([love])
+
+    def complete(self, prefix, limit=10, pos=None):
+        self.calls.append(('complete', prefix, limit, pos))
+        return [x for x in ('love', 'lovely') if x.startswith(prefix)][:limit]
+
+    def get_synsets_by_lemma(self, lemma):
+        self.calls.append(('lemma', lemma))
+        return SynsetCollection(self.synsets.by_lemma(lemma))
+
+    def get_lemma_index(self):
+        self.calls.append(('index',))
+
+
+class TestDaemon(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpdir = tempfile.mkdtemp()
+        cls.db_path = os.path.join(cls.tmpdir, 'glosstag.db')
+        cls.gwn = GWordnetSQLite(cls.db_path)
+        cls.gwn.insert_synsets(GWordnetXML([MOCKUP_SYNSETS_DATA]).synsets)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmpdir)
+
+    def setUp(self):
+        self.socket = os.path.join(self.tmpdir, 'wntk.sock')
+        self.wsql = MockWSQL(self.db_path)
+        self.daemon = WntkDaemon(self.gwn, self.wsql)
+        self.server = DaemonServer(self.socket, self.daemon)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def local(self, func, *args, **kwargs):
+        buf = io.StringIO()
+        with redirect_stdout(buf):
+            func(*args, **kwargs)
+        return buf.getvalue()
+
+    def test_lookup(self):
+        with connect(self.socket) as client:
+            self.assertEqual(client.request('ping'), 'pong')
+            # same output as wntk synset/lemma
+            self.assertEqual(client.request('synset', '00022401-r', ''), self.local(get_synset_by_id, self.gwn, '00022401-r'))
+            self.assertEqual(client.request('synset', '00022401-r', '1'), self.local(get_synset_by_id, self.gwn, '00022401-r', compact=False))
+            self.assertEqual(client.request('lemma', 'long ago', 'r'), self.local(get_synsets_by_term, self.gwn, 'long ago', 'r'))
+            self.assertEqual(client.request('complete', 'lov', '', 1), 'love\n')
+            self.assertEqual(client.request('query', 'love'), '[{}]'.format(self.daemon.service.serializer.synset(self.wsql.synsets[0]).decode('utf-8')))
+            self.assertRaises(DaemonError, client.request, 'omw', '01775164-v')
+            self.assertRaises(DaemonError, client.request, 'unknown')
+            self.assertRaises(DaemonError, client.request, 'lemma', 'long\tago')
+            # the connection is still usable after errors
+            self.assertEqual(client.request('ping'), 'pong')
+
+    def test_cache(self):
+        with connect(self.socket) as client:
+            for _ in range(3):
+                client.request('complete', 'lov')
+            self.assertEqual(len([c for c in self.wsql.calls if c[0] == 'complete']), 1)
+            # database changed
+            os.utime(self.db_path, ns=(0, 0))
+            client.request('complete', 'lov')
+            self.assertEqual(len([c for c in self.wsql.calls if c[0] == 'complete']), 2)
+
+    def test_stats(self):
+        def ping():
+            with connect(self.socket) as client:
+                for _ in range(50):
+                    client.request('ping')
+        threads = [threading.Thread(target=ping) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        with connect(self.socket) as client:
+            self.assertEqual(json.loads(client.request('stats'))['requests'], 401)
+
+    def test_forward(self):
+        self.assertEqual(forward(('synset', '00022401-r', ''), self.socket), self.local(get_synset_by_id, self.gwn, '00022401-r'))
+        # not running or cannot answer (no OMW DB), wntk looks it up locally
+        self.assertIsNone(forward(('ping',), os.path.join(self.tmpdir, 'missing.sock')))
+        self.assertIsNone(forward(('omw', '01775164-v'), self.socket))
+
+    def test_parse_lookup(self):
+        sock = self.socket
+        self.assertEqual(parse_lookup(['-D', '--daemon-socket', sock, 'synset', '00022401-r']), (sock, ('synset', '00022401-r', '')))
+        self.assertEqual(parse_lookup(['-g', 'gwn.db', '--daemon', '--daemon-socket={}'.format(sock), 'key', 'love%2:37:00::', '-d']),
+                         (sock, ('key', 'love%2:37:00::', '1')))
+        self.assertEqual(parse_lookup(['-D', 'lemma', 'long ago', 'r'])[1], ('lemma', 'long ago', 'r', ''))
+        self.assertEqual(parse_lookup(['-D', 'complete', 'lov', '-n', '3'])[1], ('complete', 'lov', '', 3))
+        self.assertEqual(parse_lookup(['-D', 'complete', 'lov'])[1], ('complete', 'lov', '', 10))
+        # run by wntk
+        self.assertIsNone(parse_lookup(['synset', '00022401-r']))
+        self.assertIsNone(parse_lookup(['-D', 'info']))
+        self.assertIsNone(parse_lookup(['-D', '-h']))
+        self.assertIsNone(parse_lookup(['-D', 'synset']))
+        self.assertIsNone(parse_lookup(['-D', 'synset', 'a', 'b']))
+        self.assertIsNone(parse_lookup(['-D', 'complete', 'lov', '-n', 'x']))
+
+    def test_connect(self):
+        self.assertIsNone(connect(os.path.join(self.tmpdir, 'missing.sock')))
+        # other users cannot connect
+        self.assertEqual(stat.S_IMODE(os.stat(self.socket).st_mode) & 0o077, 0)
+        # only one daemon per socket
+        self.assertRaises(DaemonError, DaemonServer, self.socket, self.daemon)
+
+
+########################################################################
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+Script for testing definition comparison in extractor.py
+Latest version can be found at https://github.com/letuananh/yawlib
+
+@author: Le Tuan Anh <tuananh.ke@gmail.com>
+'''
+
+# Copyright (c) 2017, Le Tuan Anh <tuananh.ke@gmail.com>
+#
+#Permission is hereby granted, free of charge, to any person obtaining a copy
+#of this software and associated documentation files (the "Software"), to deal
+#in the Software without restriction, including without limitation the rights
+#to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#copies of the Software, and to permit persons to whom the Software is
+#furnished to do so, subject to the following conditions:
+#
+#The above copyright notice and this permission notice shall be included in
+#all copies or substantial portions of the Software.
+#
+#THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+#THE SOFTWARE.
+
+__author__ = "Le Tuan Anh <tuananh.ke@gmail.com>"
+__copyright__ = "Copyright 2017, yawlib"
+__credits__ = []
+__license__ = "MIT"
+__version__ = "0.1"
+__maintainer__ = "Le Tuan Anh"
+__email__ = "<tuananh.ke@gmail.com>"
+__status__ = "Prototype"
+
+########################################################################
+
+########################################################################
+
+import unittest
+from chirptext.leutile import Counter
+
+import extractor
+from extractor import compare_defs, compare_def_pair, token_diff
+
+########################################################################
+
+LONG_DEF = 'a domesticated carnivorous mammal that typically has a long snout, an acute sense of smell, and a barking voice'
+PAIRS = [('02084071-n', '02084071-n', LONG_DEF, LONG_DEF),
+         ('02084071-n', '02084071-n', LONG_DEF, LONG_DEF + '.'),
+         ('02121620-n', '02121620-n', 'feline mammal; "cat"', 'feline mammal cat'),
+         ('02121620-n', '02121620-n', 'feline mammal', 'canine mammal')]
+
+
+class TestCompareDefs(unittest.TestCase):
+
+    def test_token_diff(self):
+        self.assertEqual(token_diff('a dog, barking', 'a dog barking'), ',')
+        self.assertEqual(token_diff('feline mammal; "cat"', 'feline mammal cat'), ';""')
+        self.assertEqual(token_diff('feline mammal', 'canine mammal'), 'felcan')
+        self.assertEqual(token_diff('barking  dog', 'barking dog'), '')
+
+    def test_compare_def_pair(self):
+        # near-identical (fuzzy ratio 100)
+        self.assertIsNone(compare_def_pair(PAIRS[1]))
+        # punctuation-only diff
+        self.assertEqual(compare_def_pair(PAIRS[2]), ';""')
+        self.assertEqual(compare_def_pair(PAIRS[3]), 'felcan')
+
+    def compare(self, processes):
+        c = Counter()
+        diffs = list(compare_defs(PAIRS, c, processes))
+        # punctuation-only diffs are dropped
+        self.assertEqual(diffs, [PAIRS[3] + ('felcan',)])
+        self.assertEqual(c['def same'], 2)
+        return diffs
+
+    def test_compare_defs(self):
+        self.compare(1)
+
+    def test_compare_defs_pool(self):
+        thresholds = extractor.COMPARE_POOL_THRESHOLD, extractor.COMPARE_SPAWN_THRESHOLD
+        extractor.COMPARE_POOL_THRESHOLD = extractor.COMPARE_SPAWN_THRESHOLD = 0
+        try:
+            self.compare(2)
+        finally:
+            extractor.COMPARE_POOL_THRESHOLD, extractor.COMPARE_SPAWN_THRESHOLD = thresholds
+
+
+########################################################################
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+Script for testing metrics
+Latest version can be found at https://github.com/letuananh/yawlib
+
+@author: Le Tuan Anh <tuananh.ke@gmail.com>
+'''
+
+# Copyright (c) 2017, Le Tuan Anh <tuananh.ke@gmail.com>
+#
+#Permission is hereby granted, free of charge, to any person obtaining a copy
+#of this software and associated documentation files (the "Software"), to deal
+#in the Software without restriction, including without limitation the rights
+#to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#copies of the Software, and to permit persons to whom the Software is
+#furnished to do so, subject to the following conditions:
+#
+#The above copyright notice and this permission notice shall be included in
+#all copies or substantial portions of the Software.
+#
+#THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+#THE SOFTWARE.
+
+__author__ = "Le Tuan Anh <tuananh.ke@gmail.com>"
+__copyright__ = "Copyright 2017, yawlib"
+__credits__ = []
+__license__ = "MIT"
+__version__ = "0.1"
+__maintainer__ = "Le Tuan Anh"
+__email__ = "<tuananh.ke@gmail.com>"
+__status__ = "Prototype"
+
+########################################################################
+
+########################################################################
+
+import os
+import shutil
+import tempfile
+import unittest
+from yawlib.caching import LRUCache, DictCache
+from yawlib.glosswordnet import GWordnetSQLite
+from yawlib.metrics import Registry, REGISTRY, instrument
+
+########################################################################
+
+
+class MockDAO(object):
+
+    def __init__(self):
+        self.open_connections = 3
+        REGISTRY.track_connections(self, 'mockdao')
+
+    @instrument('mockdao')
+    def get_thing(self, value):
+        if value is None:
+            raise Exception("Invalid value")
+        return value
+
+
+class TestMetrics(unittest.TestCase):
+
+    def test_counter_gauge(self):
+        reg = Registry()
+        c = reg.counter('test_calls_total', 'Test calls', ('route',))
+        c.labels('search').inc()
+        c.labels('search').inc(2)
+        g = reg.gauge('test_size', 'Test size')
+        g.set(5)
+        g.dec()
+        # registering twice returns the same metric
+        self.assertIs(reg.counter('test_calls_total', 'Test calls', ('route',)), c)
+        text = reg.render()
+        self.assertIn('# TYPE test_calls_total counter', text)
+        self.assertIn('test_calls_total{route="search"} 3', text)
+        self.assertIn('test_size 4', text)
+        g.set_function(lambda: 42)
+        self.assertIn('test_size 42', reg.render())
+        self.assertRaises(Exception, lambda: c.labels('a', 'b'))
+
+    def test_escape(self):
+        reg = Registry()
+        reg.counter('test_total', 'Test', ('q',)).labels('a"b\\c\nd').inc()
+        self.assertIn(r'test_total{q="a\"b\\c\nd"} 1', reg.render())
+
+    def test_histogram(self):
+        reg = Registry()
+        h = reg.histogram('test_seconds', 'Test latency', ('route',), buckets=(0.1, 1))
+        h.labels('a').observe(0.05)
+        h.labels('a').observe(0.5)
+        h.labels('a').observe(5)
+        lines = reg.render().splitlines()
+        self.assertIn('test_seconds_bucket{route="a",le="0.1"} 1', lines)
+        self.assertIn('test_seconds_bucket{route="a",le="1.0"} 2', lines)
+        self.assertIn('test_seconds_bucket{route="a",le="+Inf"} 3', lines)
+        self.assertIn('test_seconds_sum{route="a"} 5.55', lines)
+        self.assertIn('test_seconds_count{route="a"} 3', lines)
+        with h.labels('b').time():
+            pass
+        self.assertIn('test_seconds_count{route="b"} 1', reg.render())
+
+    def test_caches(self):
+        reg = Registry()
+        cache = reg.track_cache(LRUCache(10), 'test')
+        cache.put('a', 1)
+        cache.get('a')
+        cache.get('b')
+        text = reg.render()
+        self.assertIn('yawlib_cache_hits_total{cache="test"} 1', text)
+        self.assertIn('yawlib_cache_misses_total{cache="test"} 1', text)
+        self.assertIn('yawlib_cache_entries{cache="test"} 1', text)
+        # counters do not go backwards when a cache is cleared
+        cache.clear()
+        cache.get('a')
+        text = reg.render()
+        self.assertIn('yawlib_cache_misses_total{cache="test"} 2', text)
+        self.assertIn('yawlib_cache_entries{cache="test"} 0', text)
+        cache.reset_stats()
+        self.assertEqual((cache.hits, cache.misses), (0, 0))
+        # tracked objects are not kept alive
+        del cache
+        self.assertNotIn('cache="test"', reg.render())
+
+    def test_named_cache(self):
+        cache = LRUCache(10, name='test_named')
+        cache.get('a')
+        self.assertIn('yawlib_cache_misses_total{cache="test_named"} 1', REGISTRY.render())
+
+    def test_dict_cache(self):
+        cache = DictCache('test_dict')
+        cache['a'] = None
+        cache.setdefault('b', []).append(1)
+        self.assertIsNone(cache.get('a', 'missing'))
+        self.assertEqual(cache.get('b'), [1])
+        self.assertEqual(cache.get('c', 'missing'), 'missing')
+        text = REGISTRY.render()
+        self.assertIn('yawlib_cache_hits_total{cache="test_dict"} 2', text)
+        self.assertIn('yawlib_cache_misses_total{cache="test_dict"} 1', text)
+        self.assertIn('yawlib_cache_entries{cache="test_dict"} 2', text)
+        cache.clear()
+        self.assertEqual((len(cache), cache.hits, cache.misses), (0, 2, 1))
+        cache.reset_stats()
+        self.assertEqual((cache.hits, cache.misses), (0, 0))
+
+    def test_gwnsql_connections(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            gwn = GWordnetSQLite(os.path.join(tmpdir, 'gwn.db'))
+            self.assertEqual(gwn.open_connections, 0)
+            with gwn.execution():
+                self.assertEqual(gwn.open_connections, 1)
+                self.assertIn('yawlib_open_connections{dao="gwnsql"} 1', REGISTRY.render())
+            self.assertEqual(gwn.open_connections, 0)
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_instrument(self):
+        dao = MockDAO()
+        self.assertEqual(dao.get_thing(1), 1)
+        self.assertRaises(Exception, lambda: dao.get_thing(None))
+        self.assertEqual(dao.get_thing.__name__, 'get_thing')
+        text = REGISTRY.render()
+        self.assertIn('yawlib_dao_call_duration_seconds_count{dao="mockdao",method="get_thing"} 2', text)
+        self.assertIn('yawlib_dao_call_errors_total{dao="mockdao",method="get_thing"} 1', text)
+        self.assertIn('yawlib_open_connections{dao="mockdao"} 3', text)
+
+
+########################################################################
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == "__main__":
+    main()
@@ -41,9 +41,14 @@ __status__ = "Prototype"
 
 ########################################################################
 
+import os
+import sys
 import unittest
 import logging
+import subprocess
+from array import array
 from yawlib import SynsetID, Synset, SynsetCollection
+from yawlib.models import merge_sids
 from yawlib.glosswordnet.models import GlossedSynset, GlossGroup
 
 ########################################################################
@@ -82,6 +87,39 @@ class TestSynsetIDWrapper(unittest.TestCase):
         d['12345678-n'] = 'abc'
         self.assertEqual(d[s], 'abc')
         self.assertIn(s2, d)
+        # SynsetID keys can be looked up with canonical strings
+        self.assertIn('12345678-n', {s: 1})
+        self.assertEqual(hash(s), hash('12345678-n'))
+        # other formats are equal but only the canonical string hashes the same
+        self.assertEqual(s, '112345678')
+        self.assertEqual(s, 'n12345678')
+        self.assertEqual(s, 112345678)
+        self.assertNotEqual(s, 'abc')
+
+    def test_packed_sid(self):
+        sid = SynsetID.from_string('n12345678')
+        self.assertEqual(sid.packed, 12345678 * 8 + 1)
+        self.assertIs(SynsetID.from_packed(sid.packed), sid)
+        # interned
+        self.assertIs(SynsetID.from_string('112345678'), sid)
+        self.assertIs(SynsetID.from_string(112345678), sid)
+        self.assertIs(SynsetID.from_string(sid), sid)
+        # conversions
+        self.assertEqual(sid.to_gwnsql(), 'n12345678')
+        self.assertEqual(SynsetID.from_string('00001740-s').to_wnsql(), '500001740')
+        self.assertEqual(SynsetID('1740', 'a').to_canonical(), '00001740-a')
+        # immutable
+        with self.assertRaises(AttributeError):
+            sid.offset = '00001740'
+        # not a synset ID
+        self.assertNotEqual(sid, 'love')
+        self.assertNotEqual(sid, None)
+        self.assertNotEqual(sid, 12345678)
+        # parse without exceptions
+        self.assertIs(SynsetID.parse('12345678-n'), sid)
+        self.assertIsNone(SynsetID.parse('love'))
+        self.assertIsNone(SynsetID.parse('love%2:37:00::'))
+        self.assertIsNone(SynsetID.parse(None))
 
     def test_unusual_sid(self):
         s = SynsetID.from_string('80000683-x')
@@ -114,6 +152,10 @@ class TestSynsetIDWrapper(unittest.TestCase):
         self.assertRaises(Exception, lambda: SynsetID.from_string('k12345678'))
         # no POS
         self.assertRaises(Exception, lambda: SynsetID.from_string('12345678'))
+        self.assertRaises(Exception, lambda: SynsetID.from_string(12345678))
+        # POS number in canonical format
+        self.assertRaises(Exception, lambda: SynsetID.from_string('12345678-1'))
+        self.assertRaises(Exception, lambda: SynsetID('12345678', 'k'))
 
     def test_synset(self):
         s = Synset('12345678n', lemma='foo')
@@ -123,6 +165,45 @@ class TestSynsetIDWrapper(unittest.TestCase):
         self.assertEqual(s.sid, '12345678-n')
         self.assertEqual(s.lemma, 'foo')
 
+    def test_synset_collection(self):
+        s1 = Synset('01775164-v', keys=['love%2:37:00::'], lemmas=['love'], lexfile=37)
+        s2 = Synset('07543288-n', keys=['love%1:12:00::'], lemmas=['love', 'Passion'], lexfile=12)
+        s3 = Synset('00001740-a', keys=['able%3:00:00::'], lemmas=['able'], lexfile=0)
+        ss = SynsetCollection().add(s1)
+        self.assertIs(ss.by_sid('01775164-v'), s1)
+        self.assertIs(ss.by_sid('v01775164'), s1)
+        self.assertIs(ss.by_sid(201775164), s1)
+        self.assertIsNone(ss.by_sid('love'))
+        self.assertIn('201775164', ss)
+        # indexes are built lazily and updated after that
+        self.assertEqual(ss.by_lemma('love'), [s1])
+        ss.extend([s2, s3])
+        self.assertEqual(ss.by_lemma('LOVE'), [s1, s2])
+        self.assertEqual(ss.by_lemma('passion'), [s2])
+        self.assertEqual(ss.by_pos('n'), [s2])
+        self.assertEqual(ss.by_lexfile(0), [s3])
+        self.assertIs(ss.by_sk('able%3:00:00::'), s3)
+        # set operations by synset ID
+        other = SynsetCollection([Synset('107543288'), Synset('00002098-a')])
+        self.assertEqual(list(ss.sids), sorted(x.sid.packed for x in ss))
+        self.assertEqual([x.sid for x in ss.intersection(other)], ['07543288-n'])
+        self.assertEqual([x.sid for x in ss.difference(other)], ['01775164-v', '00001740-a'])
+        self.assertEqual(len(ss.union(other)), 4)
+        self.assertEqual(len(SynsetCollection().merge(ss)), 3)
+        # one synset per ID, also within one collection
+        dup = SynsetCollection([Synset('107543288'), Synset('07543288-n'), Synset('00002098-a')])
+        self.assertEqual([x.sid for x in dup.union(SynsetCollection())], ['07543288-n', '00002098-a'])
+        self.assertEqual([x.sid for x in dup.intersection(ss)], ['07543288-n'])
+        self.assertEqual(list(dup.union(ss).sids), sorted(x.packed for x in dup.union(ss).sid_map))
+
+    def test_merge_sids(self):
+        a, b = array('q', [1, 3, 5, 7]), array('q', [2, 3, 7, 9])
+        self.assertEqual(list(merge_sids(a, b, 'intersection')), [3, 7])
+        self.assertEqual(list(merge_sids(a, b, 'union')), [1, 2, 3, 5, 7, 9])
+        self.assertEqual(list(merge_sids(a, b, 'difference')), [1, 5])
+        self.assertEqual(list(merge_sids(b, array('q'), 'difference')), [2, 3, 7, 9])
+        self.assertRaises(ValueError, merge_sids, a, b, 'xor')
+
     def test_gsynset(self):
         gs = GlossedSynset(112345678)
         self.assertIsNotNone(gs)
@@ -141,6 +222,38 @@ class TestSynsetIDWrapper(unittest.TestCase):
         # gloss group
         self.assertIsNotNone(GlossGroup())
 
+
+
+class TestLazyImport(unittest.TestCase):
+
+    def loaded_modules(self, stmt):
+        ''' Modules loaded by stmt in a fresh interpreter '''
+        code = "import sys; before = set(sys.modules); {}; print(' '.join(set(sys.modules) - before))".format(stmt)
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        return subprocess.check_output([sys.executable, '-c', code], cwd=root, universal_newlines=True).split()
+
+    def test_light_import(self):
+        loaded = self.loaded_modules("from yawlib import SynsetID, YLConfig")
+        self.assertIn('yawlib.models', loaded)
+        for heavy in ('lxml', 'chirptext', 'puchikarui', 'fuzzywuzzy', 'yawlib.helpers', 'yawlib.glosswordnet'):
+            self.assertFalse([m for m in loaded if m == heavy or m.startswith(heavy + '.')], heavy)
+        # wntk imports its dependencies in the subcommands which use them
+        loaded = self.loaded_modules("import yawlib.wntk")
+        for heavy in ('lxml', 'chirptext', 'puchikarui', 'fuzzywuzzy', 'multiprocessing', 'yawlib.yawol', 'yawlib.daemon'):
+            self.assertFalse([m for m in loaded if m == heavy or m.startswith(heavy + '.')], heavy)
+
+    def test_lazy_names(self):
+        import yawlib
+        from yawlib import glosswordnet
+        for name in yawlib.__all__:
+            self.assertIsNotNone(getattr(yawlib, name))
+            self.assertIn(name, dir(yawlib))
+        for name in glosswordnet.__all__:
+            self.assertIsNotNone(getattr(glosswordnet, name))
+        self.assertIs(yawlib.GWordnetXML, glosswordnet.xmldao.GWordnetXML)
+        self.assertRaises(AttributeError, getattr, yawlib, 'no_such_name')
+
+
 ######################################################################
 
 
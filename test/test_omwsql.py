@@ -43,14 +43,179 @@ __status__ = "Prototype"
 
 import sys
 import os
+import shutil
+import sqlite3
 import argparse
+import tempfile
 import unittest
+import threading
 from chirptext.leutile import FileHelper
 from yawlib.omwsql import OMWSQL
+from yawlib.models import SynsetID
 from yawlib.config import YLConfig
 
 ########################################################################
 
+MOCK_OMW_SCRIPT = '''
+CREATE TABLE synset (synset TEXT, pos TEXT, name TEXT, src TEXT);
+CREATE TABLE word (wordid INTEGER PRIMARY KEY, lang TEXT, lemma TEXT, pron TEXT, pos TEXT);
+CREATE TABLE synlink (synset1 TEXT, synset2 TEXT, link TEXT, src TEXT);
+CREATE TABLE sense (synset TEXT, wordid INTEGER, lang TEXT, rank TEXT, lexid INTEGER, freq INTEGER, src TEXT);
+CREATE TABLE synset_def (synset TEXT, lang TEXT, def TEXT, sid INTEGER);
+CREATE TABLE synset_ex (synset TEXT, lang TEXT, def TEXT, sid INTEGER);
+'''
+MOCK_WORDS = [(1, 'eng', 'dog', 'n'), (2, 'eng', 'domestic dog', 'n'), (3, 'jpn', '犬', 'n'),
+              (4, 'eng', 'cat', 'n'), (5, 'fra', 'chat', 'n'), (6, 'eng', 'search', 'n'),
+              (7, 'eng', 'hunt', 'n'), (8, 'vie', 'chó', 'n')]
+MOCK_SENSES = [('02084071-n', 1, 'eng'), ('02084071-n', 2, 'eng'), ('02084071-n', 3, 'jpn'),
+               ('02084071-n', 8, 'vie'), ('02121620-n', 4, 'eng'), ('02121620-n', 5, 'fra'),
+               ('05797597-n', 6, 'eng'), ('00636888-n', 6, 'eng'), ('00636888-n', 7, 'eng'),
+               ('77000001-n', 3, 'jpn')]
+MOCK_DEFS = [('02084071-n', 'eng', 'a member of the genus Canis', 0),
+             ('02084071-n', 'eng', 'has been domesticated since prehistoric times', 1),
+             ('02084071-n', 'jpn', 'イヌ科の哺乳類', 0),
+             ('05797597-n', 'eng', 'a search for knowledge', 0)]
+MOCK_EXES = [('02084071-n', 'eng', 'the dog barked all night', 0)]
+# dog > canine > carnivore < feline < cat, 77000001-n (NTU-MC) > dog
+MOCK_HYPERNYMS = [('02084071-n', '02083346-n'), ('02083346-n', '02075296-n'), ('02121620-n', '02120997-n'),
+                  ('02120997-n', '02075296-n'), ('77000001-n', '02084071-n')]
+MOCK_SYNLINKS = ([(s1, s2, 'hype', 'eng30') for s1, s2 in MOCK_HYPERNYMS] +
+                 [(s2, s1, 'hypo', 'eng30') for s1, s2 in MOCK_HYPERNYMS] +
+                 [('02084071-n', '02121620-n', 'also', 'test')])
+
+
+def build_mock_omw(db_path):
+    with sqlite3.connect(db_path) as conn:
+        conn.executescript(MOCK_OMW_SCRIPT)
+        conn.executemany('INSERT INTO word (wordid, lang, lemma, pos) VALUES (?, ?, ?, ?)', MOCK_WORDS)
+        conn.executemany('INSERT INTO sense (synset, wordid, lang) VALUES (?, ?, ?)', MOCK_SENSES)
+        conn.executemany('INSERT INTO synset_def VALUES (?, ?, ?, ?)', MOCK_DEFS)
+        conn.executemany('INSERT INTO synset_ex VALUES (?, ?, ?, ?)', MOCK_EXES)
+        conn.executemany('INSERT INTO synlink VALUES (?, ?, ?, ?)', MOCK_SYNLINKS)
+
+
+class TestOMWBatch(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpdir = tempfile.mkdtemp()
+        cls.db_path = os.path.join(cls.tmpdir, 'omw.db')
+        build_mock_omw(cls.db_path)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmpdir)
+
+    def setUp(self):
+        self.omw = OMWSQL(self.db_path)
+        self.queries = []
+        self.omw.get_local_conn().set_trace_callback(self.queries.append)
+
+    def tearDown(self):
+        self.omw.close()
+
+    def test_local_conns(self):
+        conn = self.omw.get_local_conn()
+        self.assertIs(conn, self.omw.get_local_conn())
+        # one connection per thread, closed when the thread exits
+        conns = []
+        threads = [threading.Thread(target=lambda: conns.append(self.omw.get_local_conn())) for _ in range(5)]
+        for t in threads:
+            t.start()
+            t.join()
+        self.assertEqual(len(set(conns)), 5)
+        self.assertEqual(self.omw.open_connections, 1)
+        self.assertRaises(sqlite3.ProgrammingError, conns[0].execute, 'SELECT 1')
+        self.omw.close()
+        self.assertEqual(self.omw.open_connections, 0)
+        self.assertRaises(sqlite3.ProgrammingError, conn.execute, 'SELECT 1')
+
+    def test_get_lemmas(self):
+        dog, cat, search = (SynsetID.from_string(x) for x in ('02084071-n', '102121620', '05797597-n'))
+        langs = ['eng', 'jpn', 'fra', 'vie', 'ind']
+        lemmas = self.omw.get_lemmas([dog, '102121620', '05797597-n', '77000001-n', '99999999-n'], langs)
+        self.assertEqual(lemmas[dog], {'eng': ['dog', 'domestic dog'], 'jpn': ['犬'], 'vie': ['chó']})
+        self.assertEqual(lemmas[cat], {'eng': ['cat'], 'fra': ['chat']})
+        self.assertEqual(lemmas[search], {'eng': ['search']})
+        self.assertEqual(lemmas[SynsetID.from_string('77000001-n')], {'jpn': ['犬']})
+        self.assertEqual(len(lemmas), 4)
+        self.assertEqual(len(self.queries), 1)
+        # all cached (including missing synsets and languages)
+        self.assertEqual(self.omw.get_lemmas(['99999999-n', dog], langs)[dog]['jpn'], ['犬'])
+        self.assertEqual(len(self.queries), 1)
+        # only the new language is queried
+        self.assertEqual(self.omw.get_lemmas([dog], ['eng', 'cmn']), {dog: {'eng': ['dog', 'domestic dog']}})
+        self.assertEqual(len(self.queries), 2)
+
+    def test_many_synsets(self):
+        sids = ['{:08d}-n'.format(x) for x in range(1, 1200)] + ['02084071-n']
+        lemmas = self.omw.get_lemmas(sids, ['eng', 'jpn'])
+        self.assertEqual(list(lemmas.keys()), ['02084071-n'])
+        # a few queries for many synsets (MAX_PARAMS host parameters each)
+        self.assertEqual(len(self.queries), 3)
+
+    def test_get_synsets_by_lemmas(self):
+        synsets = self.omw.get_synsets_by_lemmas(['dog', 'search', 'chat', 'missing'])
+        self.assertEqual(synsets, {'dog': ['02084071-n'], 'search': ['05797597-n', '00636888-n']})
+        self.assertEqual(self.omw.get_synsets_by_lemmas(['犬'], 'jpn'), {'犬': ['02084071-n', '77000001-n']})
+        self.assertEqual(self.omw.get_synsets_by_lemmas(['dog', 'missing']), {'dog': ['02084071-n']})
+        self.assertEqual(len(self.queries), 2)
+
+    def test_defs_and_exes(self):
+        dog, search = SynsetID.from_string('02084071-n'), SynsetID.from_string('05797597-n')
+        defs = self.omw.get_synset_defs([dog, search, '02121620-n'], ['eng', 'jpn'])
+        self.assertEqual(defs[dog], {'eng': ['a member of the genus Canis',
+                                             'has been domesticated since prehistoric times'],
+                                     'jpn': ['イヌ科の哺乳類']})
+        self.assertEqual(defs[search], {'eng': ['a search for knowledge']})
+        self.assertEqual(len(defs), 2)
+        exes = self.omw.get_synset_exes([dog, search])
+        self.assertEqual(exes, {dog: {'eng': ['the dog barked all night']}})
+        self.assertEqual(len(self.queries), 2)
+        # single lookup goes through the caches
+        self.assertEqual(self.omw.get_synset_def('105797597'), 'a search for knowledge')
+        self.assertIsNone(self.omw.get_synset_def('02121620-n'))
+        self.assertEqual(len(self.queries), 2)
+        self.omw.clear_caches()
+        self.assertEqual(self.omw.get_synset_def('105797597'), 'a search for knowledge')
+        self.assertEqual(len(self.queries), 3)
+
+    def test_synlink_graph(self):
+        graph = self.omw.get_synlink_graph()
+        self.assertIs(self.omw.get_synlink_graph(), graph)
+        self.assertEqual(len(self.queries), 1)
+        self.assertEqual(len(graph), 6)
+        self.assertEqual(graph.edge_count, 11)
+        self.assertEqual(graph.link_types, ['also', 'hype', 'hypo'])
+        self.assertIn('77000001-n', graph)
+        self.assertIn('102084071', graph)
+        self.assertNotIn('02084071-v', graph)
+        self.assertNotIn('not a synset', graph)
+        # neighbours
+        dog = SynsetID.from_string('02084071-n')
+        self.assertEqual(graph.neighbours(dog),
+                         [('02083346-n', 'hype'), ('77000001-n', 'hypo'), ('02121620-n', 'also')])
+        self.assertEqual(graph.neighbours(dog, 'hypo'), [('77000001-n', 'hypo')])
+        self.assertEqual(graph.neighbours(dog, ['hype', 'unknown']), [('02083346-n', 'hype')])
+        self.assertEqual(graph.neighbours('99999999-n'), [])
+        # transitive closure
+        self.assertEqual(graph.closure('77000001-n'), [('02084071-n', 1), ('02083346-n', 2), ('02075296-n', 3)])
+        self.assertEqual(graph.closure('77000001-n', max_depth=2), [('02084071-n', 1), ('02083346-n', 2)])
+        self.assertEqual(graph.closure('02075296-n', 'hypo', max_depth=1), [('02083346-n', 1), ('02120997-n', 1)])
+        self.assertEqual(graph.closure('02075296-n'), [])
+        # paths
+        self.assertEqual(graph.path('77000001-n', '02121620-n'), ['77000001-n', '02084071-n', '02121620-n'])
+        self.assertEqual(graph.path('77000001-n', '02121620-n', ['hype', 'hypo']),
+                         ['77000001-n', '02084071-n', '02083346-n', '02075296-n', '02120997-n', '02121620-n'])
+        self.assertEqual(graph.path(dog, dog), [dog])
+        self.assertIsNone(graph.path(dog, '02121620-n', 'hype'))
+        self.assertIsNone(graph.path('77000001-n', '02121620-n', ['hype', 'hypo'], max_depth=4))
+        self.assertEqual(len(self.queries), 1)
+        # multilingual hypernyms
+        hypernyms = [sid for sid, depth in graph.closure('77000001-n')]
+        lemmas = self.omw.get_lemmas(hypernyms, ['eng', 'jpn'])
+        self.assertEqual(lemmas[dog], {'eng': ['dog', 'domestic dog'], 'jpn': ['犬']})
+
 
 class TestOMWSQL(unittest.TestCase):
 
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+Script for testing JSON serialization
+Latest version can be found at https://github.com/letuananh/yawlib
+
+@author: Le Tuan Anh <tuananh.ke@gmail.com>
+'''
+
+# Copyright (c) 2017, Le Tuan Anh <tuananh.ke@gmail.com>
+#
+#Permission is hereby granted, free of charge, to any person obtaining a copy
+#of this software and associated documentation files (the "Software"), to deal
+#in the Software without restriction, including without limitation the rights
+#to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#copies of the Software, and to permit persons to whom the Software is
+#furnished to do so, subject to the following conditions:
+#
+#The above copyright notice and this permission notice shall be included in
+#all copies or substantial portions of the Software.
+#
+#THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+#THE SOFTWARE.
+
+__author__ = "Le Tuan Anh <tuananh.ke@gmail.com>"
+__copyright__ = "Copyright 2017, yawlib"
+__credits__ = []
+__license__ = "MIT"
+__version__ = "0.1"
+__maintainer__ = "Le Tuan Anh"
+__email__ = "<tuananh.ke@gmail.com>"
+__status__ = "Prototype"
+
+########################################################################
+
+########################################################################
+
+import json
+import unittest
+from yawlib import Synset
+from yawlib.caching import LRUCache
+from yawlib.serializer import SynsetSerializer, get_encoder
+
+########################################################################
+
+
+def build_synset(sid, lemma):
+    ss = Synset(sid)
+    ss.add_lemma(lemma)
+    ss.add_key('{}%2:37:00::'.format(lemma))
+    return ss
+
+
+class TestSerializer(unittest.TestCase):
+
+    def test_lru_cache(self):
+        cache = LRUCache(2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        self.assertEqual(cache.get('a'), 1)
+        cache.put('c', 3)  # b is evicted
+        self.assertNotIn('b', cache)
+        self.assertEqual(len(cache), 2)
+        self.assertEqual((cache.hits, cache.misses), (1, 0))
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.misses, 1)
+
+    def test_encoders(self):
+        obj = {'lemma': 'café', 'ids': [1, 2]}
+        self.assertEqual(json.loads(get_encoder('json')(obj).decode('utf-8')), obj)
+        self.assertEqual(json.loads(get_encoder('auto')(obj).decode('utf-8')), obj)
+
+    def test_synset(self):
+        ss = build_synset('01775164-v', 'love')
+        serializer = SynsetSerializer()
+        data = json.loads(serializer.synset(ss).decode('utf-8'))
+        self.assertEqual(data, ss.to_json())
+        # fragments are cached
+        self.assertIs(serializer.synset(ss), serializer.synset(ss))
+        # same synset with different senses
+        ss2 = build_synset('01775164-v', 'adore')
+        self.assertEqual(json.loads(serializer.synset(ss2).decode('utf-8'))['lemmas'], ['adore'])
+        # compact mode drops empty values
+        compact = json.loads(SynsetSerializer(compact=True).synset(ss).decode('utf-8'))
+        self.assertEqual(set(compact.keys()), {'synsetid', 'lemmas', 'sensekeys', 'tagcount'})
+
+    def test_collection(self):
+        synsets = [build_synset('{:08d}-n'.format(i), 'word{}'.format(i)) for i in range(50)]
+        serializer = SynsetSerializer(chunk_size=512)
+        chunks = list(serializer.iter_collection(synsets))
+        self.assertGreater(len(chunks), 1)
+        data = json.loads(b''.join(chunks).decode('utf-8'))
+        self.assertEqual(data, [ss.to_json() for ss in synsets])
+        self.assertEqual(json.loads(serializer.collection([]).decode('utf-8')), [])
+
+    def test_mapping(self):
+        synsets = [build_synset('{:08d}-n'.format(i), 'word{}'.format(i)) for i in range(50)]
+        serializer = SynsetSerializer(chunk_size=512)
+        items = [('q{}'.format(i), synsets[i:i + 2]) for i in range(0, 50, 2)] + [('none', [])]
+        chunks = list(serializer.iter_mapping(items))
+        self.assertGreater(len(chunks), 1)
+        data = json.loads(b''.join(chunks).decode('utf-8'))
+        self.assertEqual(list(data.keys()), [k for k, _ in items])
+        self.assertEqual(data['q2'], [ss.to_json() for ss in synsets[2:4]])
+        self.assertEqual(data['none'], [])
+
+    def test_lines(self):
+        synsets = [build_synset('{:08d}-n'.format(i), 'word{}'.format(i)) for i in range(50)]
+        serializer = SynsetSerializer(chunk_size=512)
+        chunks = list(serializer.iter_lines(synsets))
+        self.assertGreater(len(chunks), 1)
+        self.assertTrue(all(c.endswith(b'\n') for c in chunks))
+        lines = b''.join(chunks).splitlines()
+        self.assertEqual([json.loads(x.decode('utf-8')) for x in lines], [ss.to_json() for ss in synsets])
+        # lines are not cached
+        self.assertEqual(len(serializer.cache), 0)
+        lines = b''.join(serializer.iter_lines(synsets[:1], ['synsetid', 'lemmas'])).splitlines()
+        self.assertEqual(json.loads(lines[0].decode('utf-8')), {'synsetid': '00000000-n', 'lemmas': ['word0']})
+
+
+########################################################################
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+Script for testing bulk synset ID conversion
+Latest version can be found at https://github.com/letuananh/yawlib
+
+@author: Le Tuan Anh <tuananh.ke@gmail.com>
+'''
+
+# Copyright (c) 2017, Le Tuan Anh <tuananh.ke@gmail.com>
+#
+#Permission is hereby granted, free of charge, to any person obtaining a copy
+#of this software and associated documentation files (the "Software"), to deal
+#in the Software without restriction, including without limitation the rights
+#to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#copies of the Software, and to permit persons to whom the Software is
+#furnished to do so, subject to the following conditions:
+#
+#The above copyright notice and this permission notice shall be included in
+#all copies or substantial portions of the Software.
+#
+#THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+#THE SOFTWARE.
+
+__author__ = "Le Tuan Anh <tuananh.ke@gmail.com>"
+__copyright__ = "Copyright 2017, yawlib"
+__credits__ = []
+__license__ = "MIT"
+__version__ = "0.1"
+__maintainer__ = "Le Tuan Anh"
+__email__ = "<tuananh.ke@gmail.com>"
+__status__ = "Prototype"
+
+########################################################################
+
+import unittest
+from yawlib import SynsetID
+from yawlib.sidconv import wnsql_to_canonical, wnsql_to_gwnsql, wnsql_to_sids, sids_to_wnsql
+from yawlib.sidconv import canonical_to_wnsql, canonical_to_gwnsql
+from yawlib.sidconv import gwnsql_to_wnsql, gwnsql_to_canonical
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+########################################################################
+
+WNSQL = [112345678, 300001740, 500000001, 401775164]
+CANONICAL = ['12345678-n', '00001740-a', '00000001-s', '01775164-r']
+GWNSQL = ['n12345678', 'a00001740', 's00000001', 'r01775164']
+
+
+class TestSynsetIDConversion(unittest.TestCase):
+
+    def test_list_conversion(self):
+        self.assertEqual(wnsql_to_canonical(WNSQL), CANONICAL)
+        self.assertEqual(wnsql_to_canonical([str(x) for x in WNSQL]), CANONICAL)
+        self.assertEqual(wnsql_to_gwnsql(WNSQL), GWNSQL)
+        self.assertEqual(canonical_to_wnsql(CANONICAL), WNSQL)
+        self.assertEqual(canonical_to_wnsql(['12345678n']), [112345678])
+        self.assertEqual(canonical_to_gwnsql(CANONICAL), GWNSQL)
+        self.assertEqual(gwnsql_to_wnsql(GWNSQL), WNSQL)
+        self.assertEqual(gwnsql_to_canonical(GWNSQL), CANONICAL)
+        sids = wnsql_to_sids(WNSQL)
+        self.assertEqual(sids, [SynsetID.from_string(x) for x in CANONICAL])
+        self.assertEqual(sids_to_wnsql(sids), WNSQL)
+        self.assertEqual(wnsql_to_canonical([]), [])
+
+    def test_invalid_ids(self):
+        self.assertRaises(Exception, lambda: wnsql_to_canonical([712345678]))
+        self.assertRaises(Exception, lambda: canonical_to_wnsql(['12345678-k']))
+        self.assertRaises(Exception, lambda: gwnsql_to_wnsql(['k12345678']))
+        # wrong length or format
+        for func, sid in ((canonical_to_wnsql, '123456789-n'), (canonical_to_wnsql, '1234567-n'), (canonical_to_wnsql, '12345678xn'),
+                          (canonical_to_gwnsql, '12345678-n '), (canonical_to_gwnsql, 'n12345678'), (canonical_to_gwnsql, ''),
+                          (gwnsql_to_wnsql, 'n123456789'), (gwnsql_to_canonical, 'n1234567'), (gwnsql_to_canonical, '12345678-n'),
+                          (gwnsql_to_canonical, None)):
+            self.assertRaises(ValueError, func, [sid])
+        self.assertRaises(ValueError, wnsql_to_gwnsql, [712345678])
+
+    @unittest.skipIf(np is None, "NumPy is not installed")
+    def test_ndarray_conversion(self):
+        ids = np.array(WNSQL)
+        self.assertEqual(wnsql_to_canonical(ids).tolist(), CANONICAL)
+        self.assertEqual(wnsql_to_gwnsql(ids).tolist(), GWNSQL)
+        self.assertEqual(wnsql_to_sids(ids), [SynsetID.from_string(x) for x in CANONICAL])
+        self.assertEqual(canonical_to_wnsql(np.array(CANONICAL)).tolist(), WNSQL)
+        self.assertEqual(canonical_to_wnsql(np.array(['12345678n', '00001740-a'])).tolist(), WNSQL[:2])
+        self.assertEqual(canonical_to_gwnsql(np.array(CANONICAL)).tolist(), GWNSQL)
+        self.assertEqual(gwnsql_to_wnsql(np.array(GWNSQL)).tolist(), WNSQL)
+        self.assertEqual(gwnsql_to_canonical(np.array(GWNSQL)).tolist(), CANONICAL)
+        self.assertRaises(Exception, lambda: wnsql_to_canonical(np.array([712345678])))
+        self.assertRaises(Exception, lambda: canonical_to_wnsql(np.array(['1234x678-n'])))
+        # no silent truncation
+        self.assertRaises(ValueError, canonical_to_wnsql, np.array(['12345678-n', '123456789-n']))
+        self.assertRaises(ValueError, canonical_to_gwnsql, np.array(['12345678-nn']))
+        self.assertRaises(ValueError, canonical_to_wnsql, np.array(['12345678xn']))
+        self.assertRaises(ValueError, gwnsql_to_wnsql, np.array(['n123456789']))
+        self.assertRaises(ValueError, gwnsql_to_canonical, np.array(['12345678-n']))
+        self.assertRaises(ValueError, gwnsql_to_wnsql, np.array([[GWNSQL[0]]]))
+        self.assertEqual(canonical_to_wnsql(np.array([], dtype='U10')).tolist(), [])
+
+########################################################################
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+Script for testing single-flight call coalescing
+Latest version can be found at https://github.com/letuananh/yawlib
+
+@author: Le Tuan Anh <tuananh.ke@gmail.com>
+'''
+
+# Copyright (c) 2017, Le Tuan Anh <tuananh.ke@gmail.com>
+#
+#Permission is hereby granted, free of charge, to any person obtaining a copy
+#of this software and associated documentation files (the "Software"), to deal
+#in the Software without restriction, including without limitation the rights
+#to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#copies of the Software, and to permit persons to whom the Software is
+#furnished to do so, subject to the following conditions:
+#
+#The above copyright notice and this permission notice shall be included in
+#all copies or substantial portions of the Software.
+#
+#THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+#THE SOFTWARE.
+
+__author__ = "Le Tuan Anh <tuananh.ke@gmail.com>"
+__copyright__ = "Copyright 2017, yawlib"
+__credits__ = []
+__license__ = "MIT"
+__version__ = "0.1"
+__maintainer__ = "Le Tuan Anh"
+__email__ = "<tuananh.ke@gmail.com>"
+__status__ = "Prototype"
+
+########################################################################
+
+########################################################################
+
+import asyncio
+import threading
+import unittest
+from yawlib.metrics import REGISTRY
+from yawlib.singleflight import SingleFlight, AsyncSingleFlight, single_flight, follower_error
+
+########################################################################
+
+
+class SlowDAO(object):
+
+    def __init__(self):
+        self.calls = []
+        self.release = threading.Event()
+
+    @single_flight('test_slowdao')
+    def lookup(self, key):
+        self.calls.append(key)
+        self.release.wait(5)
+        if key == 'bad':
+            raise Exception("Invalid key")
+        return [key]
+
+
+def run_threads(func, count):
+    results = [None] * count
+
+    def worker(idx):
+        try:
+            results[idx] = func()
+        except Exception as e:
+            results[idx] = e
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+    for t in threads:
+        t.start()
+    return threads, results
+
+
+class TestSingleFlight(unittest.TestCase):
+
+    def wait_for_waiters(self, flight, count):
+        # all threads are either running the call or waiting for it
+        for _ in range(500):
+            if flight._coalesced.get() >= count:
+                return
+            threading.Event().wait(0.01)
+
+    def test_coalesce_threads(self):
+        dao = SlowDAO()
+        flight = dao.lookup.flight
+        before = flight._coalesced.get()
+        threads, results = run_threads(lambda: dao.lookup('love'), 8)
+        self.wait_for_waiters(flight, before + 7)
+        dao.release.set()
+        for t in threads:
+            t.join()
+        self.assertEqual(dao.calls, ['love'])
+        # waiting callers get their own copy
+        self.assertTrue(all(r == ['love'] for r in results))
+        self.assertEqual(len({id(r) for r in results}), 8)
+        self.assertEqual(flight._coalesced.get() - before, 7)
+        self.assertEqual(len(flight), 0)
+        # finished calls are not cached
+        dao.lookup('love')
+        self.assertEqual(dao.calls, ['love', 'love'])
+        self.assertIn('yawlib_singleflight_coalesced_total{group="test_slowdao"}', REGISTRY.render())
+
+    def test_errors(self):
+        dao = SlowDAO()
+        flight = dao.lookup.flight
+        before = flight._coalesced.get()
+        threads, results = run_threads(lambda: dao.lookup('bad'), 4)
+        self.wait_for_waiters(flight, before + 3)
+        dao.release.set()
+        for t in threads:
+            t.join()
+        self.assertEqual(dao.calls, ['bad'])
+        self.assertTrue(all(isinstance(r, Exception) for r in results))
+        # one exception per caller, the waiting ones are chained from the leader's
+        self.assertEqual(len({id(r) for r in results}), 4)
+        leader = [r for r in results if r.__cause__ is None]
+        self.assertEqual(len(leader), 1)
+        self.assertTrue(all(r.__cause__ is leader[0] and type(r) is type(leader[0]) for r in results if r is not leader[0]))
+        self.assertTrue(all(r.args == leader[0].args for r in results))
+
+    def test_follower_error(self):
+        error = KeyError('love')
+        self.assertIsNot(follower_error(error), error)
+        self.assertEqual(type(follower_error(error)), KeyError)
+
+        class StrictError(Exception):
+            def __init__(self, a, b):
+                Exception.__init__(self, a)
+        self.assertEqual(type(follower_error(StrictError(1, 2))), RuntimeError)
+
+    def test_unhashable_args(self):
+        dao = SlowDAO()
+        dao.release.set()
+        self.assertEqual(dao.lookup(['love', 'hate']), [['love', 'hate']])
+        self.assertEqual(dao.lookup({'love'}), [{'love'}])
+        self.assertEqual(len(dao.calls), 2)
+        self.assertEqual(len(dao.lookup.flight), 0)
+
+    def test_different_keys(self):
+        flight = SingleFlight('test_keys')
+        self.assertEqual(flight.do('a', str.upper, 'a'), 'A')
+        self.assertEqual(flight.do('b', str.upper, 'b'), 'B')
+        self.assertEqual(flight._coalesced.get(), 0)
+
+    def test_async(self):
+        calls = []
+
+        async def lookup(key):
+            calls.append(key)
+            await asyncio.sleep(0.01)
+            return [key]
+
+        async def run():
+            flight = AsyncSingleFlight('test_async')
+            results = await asyncio.gather(*[flight.do(k, lookup, k) for k in ('a', 'a', 'a', 'b')])
+            self.assertEqual(len(flight), 0)
+            # a cancelled caller does not cancel the shared call
+            first = asyncio.ensure_future(flight.do('c', lookup, 'c'))
+            second = asyncio.ensure_future(flight.do('c', lookup, 'c'))
+            await asyncio.sleep(0)
+            first.cancel()
+            return results, await second, flight._coalesced.get()
+        results, second, coalesced = asyncio.run(run())
+        self.assertEqual(calls, ['a', 'b', 'c'])
+        self.assertEqual(results[0], results[1])
+        self.assertIsNot(results[0], results[1])
+        self.assertEqual(results[3], ['b'])
+        self.assertEqual(second, ['c'])
+        self.assertEqual(coalesced, 3)
+
+
+########################################################################
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == "__main__":
+    main()
@@ -41,9 +41,12 @@ __status__ = "Prototype"
 
 ########################################################################
 
+import sqlite3
 import unittest
-from yawlib import YLConfig
+import threading
+from yawlib import YLConfig, SynsetID
 from yawlib.wordnetsql import WordnetSQL as WSQL
+from yawlib.wordnetsql import LemmaIndex
 
 ########################################################################
 
@@ -104,6 +107,95 @@ class TestWordnetSQL(unittest.TestCase):
         hypehypos = db.get_hypehypo(sinfo.synsetid)
         self.assertEqual(1, len(hypehypos))
 
+    def test_batch_lookups(self):
+        db = self.get_wn()
+        synsets = db.get_synsets_by_ids(['01775164-v', 'v01775164', '300001740'])
+        self.assertEqual(len(synsets), 2)
+        ss = synsets[SynsetID.from_string('01775164-v')]
+        self.assertEqual(ss.lemmas, ['love'])
+        self.assertEqual(ss.tagcount, 43)
+        self.assertEqual(ss.exes, ['I love French food', 'She loves her boss and works hard for him'])
+        synsets = db.get_synsets_by_sks(['love%2:37:00::', 'not%a:sensekey'])
+        self.assertEqual(list(synsets.keys()), ['love%2:37:00::'])
+        self.assertEqual(synsets['love%2:37:00::'].synsetid, '01775164-v')
+        synsets = db.get_synsets_by_lemmas(['love', 'notaword'])
+        self.assertEqual(list(synsets.keys()), ['love'])
+        self.assertIn('07543288-n', synsets['love'])
+
+    def test_iter_synsets(self):
+        db = self.get_wn()
+        synsets = list(db.iter_synsets(page_size=3))
+        self.assertTrue(synsets)
+        ids = [int(ss.sid.to_wnsql()) for ss in synsets]
+        self.assertEqual(ids, sorted(set(ids)))
+        # pages are resumable
+        page = db.get_synsets_after(synsets[1].sid, limit=2)
+        self.assertEqual([ss.sid for ss in page], [ss.sid for ss in synsets[2:4]])
+        verbs = list(db.iter_synsets(pos='v'))
+        self.assertTrue(verbs)
+        self.assertTrue(all(ss.sid.pos == 'v' for ss in verbs))
+        love = [ss for ss in synsets if ss.synsetid == '01775164-v'][0]
+        self.assertEqual(love.to_json(), db.get_synset_by_id('01775164-v').to_json())
+
+    def test_complete(self):
+        db = self.get_wn()
+        lemmas = db.complete('lov', 5)
+        self.assertEqual(lemmas[0], 'love')
+        self.assertTrue(all(x.startswith('lov') for x in lemmas))
+        self.assertEqual(db.complete('love', 1, pos='v'), ['love'])
+
+    def test_local_conn(self):
+        db = self.get_wn()
+        conn = db.get_local_conn()
+        self.assertIs(conn, db.get_local_conn())
+        # connections are read-only
+        self.assertRaises(sqlite3.OperationalError, lambda: conn.execute('CREATE TABLE dummy (id INTEGER)'))
+        # each thread has its own connection
+        conns = []
+        t = threading.Thread(target=lambda: conns.append(db.get_local_conn()))
+        t.start()
+        t.join()
+        self.assertIsNot(conns[0], conn)
+        # the connection of a thread is closed when it exits
+        self.assertEqual(db.open_connections, 1)
+        self.assertRaises(sqlite3.ProgrammingError, conns[0].execute, 'SELECT 1')
+        db.close()
+        self.assertEqual(db.open_connections, 0)
+
+class TestLemmaIndex(unittest.TestCase):
+
+    ROWS = [('love', 'n', 47), ('love', 'v', 43), ('lovely', 's', 2), ('lover', 'n', 5),
+            ('lovage', 'n', 0), ('able', 'a', 12), ('abaxial', 's', 0), ('lovesick', 's', None)]
+
+    def test_complete(self):
+        index = LemmaIndex(self.ROWS)
+        self.assertEqual(len(index), 7)
+        self.assertEqual(index.complete('lov'), ['love', 'lover', 'lovely', 'lovage', 'lovesick'])
+        self.assertEqual(index.complete('LOV', 2), ['love', 'lover'])
+        self.assertEqual(index.complete('lov', pos='n'), ['love', 'lover', 'lovage'])
+        self.assertEqual(index.complete('lov', pos='a'), ['lovely', 'lovesick'])
+        self.assertEqual(index.complete('lov', pos='s'), ['lovely', 'lovesick'])
+        self.assertEqual(index.complete('ab'), ['able', 'abaxial'])
+        self.assertEqual(index.complete('xyz'), [])
+        self.assertEqual(index.complete('lov', pos='x'), [])
+        self.assertEqual(list(index), ['abaxial', 'able', 'lovage', 'love', 'lovely', 'lover', 'lovesick'])
+
+    def test_unicode(self):
+        index = LemmaIndex([('café', 'n', 3), ('cafe', 'n', 1), ('caféine', 'n', 5), ('cafés', 'n', 0), ('cb', 'n', 9)])
+        self.assertEqual(index.complete('caf'), ['caféine', 'café', 'cafe', 'cafés'])
+        self.assertEqual(index.complete('café'), ['caféine', 'café', 'cafés'])
+        self.assertEqual(index.complete('CAFÉ', 1), ['caféine'])
+
+    def test_large_range(self):
+        rows = [('w{:05d}'.format(i), 'n', i % 97) for i in range(2000)]
+        index = LemmaIndex(rows)
+        expected = [lemma for lemma, _, _ in sorted(rows, key=lambda r: (-r[2], r[0]))][:20]
+        self.assertEqual(index.complete('w', 20), expected)
+        # memoized
+        self.assertIn(('w', ''), index.memo)
+        self.assertEqual(index.complete('w', 20), expected)
+        self.assertEqual(index.complete('w', 5), expected[:5])
+
 ########################################################################
 
 
@@ -0,0 +1,398 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+Script for testing gloss sentence alignment (NTU-MC preparation)
+Latest version can be found at https://github.com/letuananh/yawlib
+
+@author: Le Tuan Anh <tuananh.ke@gmail.com>
+'''
+
+# Copyright (c) 2017, Le Tuan Anh <tuananh.ke@gmail.com>
+#
+#Permission is hereby granted, free of charge, to any person obtaining a copy
+#of this software and associated documentation files (the "Software"), to deal
+#in the Software without restriction, including without limitation the rights
+#to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#copies of the Software, and to permit persons to whom the Software is
+#furnished to do so, subject to the following conditions:
+#
+#The above copyright notice and this permission notice shall be included in
+#all copies or substantial portions of the Software.
+#
+#THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+#THE SOFTWARE.
+
+__author__ = "Le Tuan Anh <tuananh.ke@gmail.com>"
+__copyright__ = "Copyright 2017, yawlib"
+__credits__ = []
+__license__ = "MIT"
+__version__ = "0.1"
+__maintainer__ = "Le Tuan Anh"
+__email__ = "<tuananh.ke@gmail.com>"
+__status__ = "Prototype"
+
+########################################################################
+
+########################################################################
+
+import os
+import io
+import json
+import shutil
+import sqlite3
+import tempfile
+import unittest
+import logging
+from lxml import etree
+from chirptext.leutile import Counter
+from yawlib.glosswordnet import GWordnetXML, GWordnetSQLite
+from yawlib.wntk import align_sents, align_synsets, prepare_for_ntumc, to_split_data, ratio_bound, alignment_report
+from yawlib.wntk import iter_ntumc_rows, write_ntumc_sqlite, write_ntumc_script, write_ntumc_csv, NTUMC_COLUMNS
+from yawlib.wntk import build_splits, iter_stored_ntumc_rows, iter_gwn_synsets, GlossTagPatch
+from yawlib.wntk import apply_patch, patch_applied, build_gwn
+from yawlib.wntk import read_batch_queries, run_batch
+from yawlib.models import Synset, SynsetCollection
+from yawlib.yawol import YawolService
+
+########################################################################
+
+TEST_DIR = os.path.dirname(__file__)
+TEST_DATA = os.path.join(TEST_DIR, 'data')
+MOCKUP_SYNSETS_DATA = os.path.join(TEST_DATA, 'test.xml')
+
+########################################################################
+
+logger = logging.getLogger()
+
+
+class TestAlignment(unittest.TestCase):
+
+    def test_ratio_bound(self):
+        self.assertEqual(ratio_bound('', ''), 100)
+        self.assertEqual(ratio_bound('abc', 'abc'), 100)
+        self.assertEqual(ratio_bound('abc', 'cba'), 100)
+        self.assertLessEqual(ratio_bound('a', 'a much longer sentence'), 80)
+
+    def test_align_sents(self):
+        sents = ['in or at or to some place', '"she must be somewhere"', "(`someplace' is used informally for `somewhere')"]
+        gltexts = ['in or at or to some place ', '( someplace is used informally for somewhere ) ', 'she must be somewhere ']
+        # glosses are not in the same order as sentences
+        self.assertEqual([(i, j) for i, j, _ in align_sents(sents, gltexts)], [(0, 0), (1, 2), (2, 1)])
+        self.assertEqual([(i, j) for i, j, _ in align_sents(sents, gltexts[:2])], [(0, 0), (2, 1)])
+        # each gloss is used once
+        self.assertEqual([(i, j) for i, j, _ in align_sents(sents[:1] * 2, gltexts[:1])], [(0, 0)])
+        self.assertEqual(align_sents(['something else'], gltexts), [])
+        self.assertTrue(all(score > 80 for _, _, score in align_sents(sents, gltexts)))
+
+    def test_align_synsets(self):
+        synsets = GWordnetXML([MOCKUP_SYNSETS_DATA]).synsets
+        expected = [[(sent, gl.text()) for sent, gl in prepare_for_ntumc(ss).aligned] for ss in synsets]
+        for processes in (1, 2):
+            c = Counter()
+            # generators are always aligned by a process pool (unless processes == 1)
+            actual = [[(sent, gl.text()) for sent, gl in data.aligned] for data in align_synsets(iter(synsets), processes=processes, c=c)]
+            self.assertEqual(actual, expected)
+            self.assertEqual(c["synsets"], len(synsets))
+            self.assertEqual(c["aligned"], c["sentences"])
+            self.assertEqual(c["misaligned synsets"], 0)
+        self.assertIn("misaligned: 0 (0.00%)", alignment_report(c, 1.0))
+
+    def test_sent_ids(self):
+        ss = GWordnetXML([MOCKUP_SYNSETS_DATA]).synsets[0]
+        # equal (and identical) sentences are told apart by their index
+        sent = 'same sentence'
+        data = to_split_data(ss, [sent, sent], ss.glosses[:1], [(1, 0, 100)])
+        self.assertEqual(data.sent_ids, [1])
+        self.assertEqual(data.aligned, [(sent, ss.glosses[0])])
+        for data in align_synsets(GWordnetXML([MOCKUP_SYNSETS_DATA]).synsets, processes=1):
+            self.assertEqual([data.sents[i] for i in data.sent_ids], [sent for sent, _ in data.aligned])
+
+
+class TestNTUMCExport(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        synsets = GWordnetXML([MOCKUP_SYNSETS_DATA]).synsets
+        cls.data = list(align_synsets(synsets, processes=1))
+        cls.sk_map = {key: str(ss.sid) for ss in synsets for key in ss.keys}
+
+    def rows(self):
+        return iter_ntumc_rows(self.data, self.sk_map)
+
+    def test_rows(self):
+        rows = list(self.rows())
+        self.assertEqual(rows[:2], [('corpus', rows[0][1]), ('doc', rows[1][1])])
+        self.assertEqual(rows[2], ('sent', (1000000, 1000, '', 'without musical accompaniment', '[WNSID=00001740-r]', 'letuananh')))
+        self.assertEqual(len([r for t, r in rows if t == 'sent']), sum(len(d.aligned) for d in self.data))
+        self.assertTrue(all(len(r) == len(NTUMC_COLUMNS[t]) for t, r in rows))
+        # concept-word links point to existing concepts and words
+        concepts = {(r[0], r[1]) for t, r in rows if t == 'concept'}
+        words = {(r[0], r[1]) for t, r in rows if t == 'word'}
+        links = [r for t, r in rows if t == 'cwl']
+        self.assertTrue(links)
+        self.assertTrue(all((sid, cid) in concepts and (sid, wid) in words for sid, wid, cid, _ in links))
+
+    def test_sqlite_script_csv(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            db_path = os.path.join(tmpdir, 'ntumc.db')
+            counts = write_ntumc_sqlite(self.rows(), db_path, batch_size=100)
+            # script is replayed into an identical DB
+            script_path = os.path.join(tmpdir, 'ntumc.sql')
+            write_ntumc_script(self.rows(), script_path)
+            replay = sqlite3.connect(os.path.join(tmpdir, 'replay.db'))
+            for table, columns in NTUMC_COLUMNS.items():
+                replay.execute('CREATE TABLE %s (%s)' % (table, ','.join(columns)))
+            with open(script_path) as script:
+                replay.executescript(script.read())
+            conn = sqlite3.connect(db_path)
+            csv_files = write_ntumc_csv(self.rows(), os.path.join(tmpdir, 'ntumc'))
+            for table, path in zip(NTUMC_COLUMNS, csv_files):
+                rows = conn.execute('SELECT * FROM %s' % (table,)).fetchall()
+                self.assertEqual(len(rows), counts[table])
+                self.assertEqual(rows, replay.execute('SELECT * FROM %s' % (table,)).fetchall())
+                with open(path) as csv_file:
+                    self.assertEqual(len(csv_file.readlines()), counts[table])
+            conn.close()
+            replay.close()
+
+
+class TestStoredSplits(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpdir = tempfile.mkdtemp()
+        cls.db_path = os.path.join(cls.tmpdir, 'glosstag.db')
+        GWordnetSQLite(cls.db_path).insert_synsets(GWordnetXML([MOCKUP_SYNSETS_DATA]).synsets)
+        # patch = 00022401-r with a changed raw gloss
+        root = etree.parse(MOCKUP_SYNSETS_DATA).getroot()
+        cls.patch = etree.tostring(root.find("synset[@id='r00022401']")).decode('utf-8')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmpdir)
+
+    def write_patch(self, old='', new='', name='patch.xml'):
+        path = os.path.join(self.tmpdir, name)
+        with open(path, 'w') as outfile:
+            outfile.write('<wordnet>%s</wordnet>' % (self.patch.replace(old, new),))
+        return path
+
+    def stored(self):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            sents = conn.execute('SELECT sid, ord, sent, aligned FROM gloss_sent ORDER BY sid, ord').fetchall()
+            patched = conn.execute('SELECT sid FROM synset_patch').fetchall()
+            return sents, patched
+        finally:
+            conn.close()
+
+    def test_build_splits(self):
+        gwn = GWordnetSQLite(self.db_path)
+        patch_path = self.write_patch()
+        self.assertEqual(build_splits(gwn, patch_path, processes=1, force=True), 218)
+        self.assertEqual(build_splits(gwn, patch_path, processes=1), 0)
+        sents, patched = self.stored()
+        self.assertEqual(patched, [('00022401-r',)])
+        # stored rows == computed rows
+        sk_map = {key: str(ss.sid) for ss in gwn.all_synsets() for key in ss.keys}
+        data = sorted(align_synsets(list(iter_gwn_synsets(gwn)), GlossTagPatch(patch_path), 1), key=lambda d: str(d.ss.sid))
+        expected = list(iter_ntumc_rows(data, sk_map))
+        conn = sqlite3.connect(self.db_path)
+        self.assertEqual(list(iter_stored_ntumc_rows(conn, sk_map)), expected)
+        conn.close()
+        # only the changed patch is rebuilt
+        patch_path = self.write_patch('distant past', 'distant past (patched)')
+        self.assertEqual(build_splits(gwn, patch_path, processes=1), 1)
+        new_sents, _ = self.stored()
+        self.assertEqual({x[0] for x in set(sents) ^ set(new_sents)}, {'r00022401'})
+        # patch removed
+        self.assertEqual(build_splits(gwn, os.path.join(self.tmpdir, 'missing.xml'), processes=1), 1)
+        self.assertEqual(self.stored()[1], [])
+
+    def test_apply_patch(self):
+        gwn = GWordnetSQLite(self.db_path)
+        build_splits(gwn, None, processes=1, force=True)
+        patch_path = self.write_patch('distant past', 'distant past (patched)')
+        self.assertFalse(patch_applied(self.db_path, patch_path))
+        self.assertEqual(apply_patch(gwn, [patch_path]), ['00022401-r'])
+        self.assertTrue(patch_applied(self.db_path, patch_path))
+        ss = gwn.get_synset_by_id('00022401-r')
+        self.assertTrue(all('distant past (patched)' in g.gloss for g in ss.raw_glosses))
+        self.assertEqual(len(gwn.get_synsets_by_ids(['r00022401'])), 1)
+        # patched synsets are reloaded from DB and re-split
+        self.assertEqual(build_splits(gwn, None, processes=1), 1)
+        self.assertEqual(build_splits(gwn, None, processes=1), 0)
+        self.assertIn('distant past (patched)', ' '.join(x[2] for x in self.stored()[0] if x[0] == 'r00022401'))
+        # idempotent
+        self.assertEqual(apply_patch(gwn, [patch_path]), [])
+        orig_path = self.write_patch(name='orig.xml')
+        self.assertEqual(apply_patch(gwn, [orig_path, patch_path]), [])
+        self.assertEqual(apply_patch(gwn, [orig_path]), ['00022401-r'])
+        self.assertFalse(patch_applied(self.db_path, patch_path))
+        # synsets which are not overridden by GlossTagPatch are skipped
+        root = etree.parse(MOCKUP_SYNSETS_DATA).getroot()
+        other_path = os.path.join(self.tmpdir, 'other.xml')
+        with open(other_path, 'w') as outfile:
+            outfile.write('<wordnet>%s</wordnet>' % (etree.tostring(root.find("synset[@id='r00001740']")).decode('utf-8'),))
+        self.assertEqual(apply_patch(gwn, [other_path]), [])
+        self.assertEqual(apply_patch(gwn, [other_path], patched=None), ['00001740-r'])
+        conn = sqlite3.connect(self.db_path)
+        try:
+            self.assertEqual(conn.execute('SELECT sid FROM patch_log ORDER BY id').fetchall(), [('r00022401',), ('r00022401',), ('r00001740',)])
+            # no leftover rows
+            self.assertEqual(conn.execute('SELECT COUNT(*) FROM gloss_raw WHERE sid = ?', ('r00022401',)).fetchone()[0], len(ss.raw_glosses))
+            self.assertEqual(conn.execute('SELECT COUNT(*) FROM glossitem WHERE gid NOT IN (SELECT id FROM gloss)').fetchone()[0], 0)
+            self.assertEqual(conn.execute('SELECT COUNT(*) FROM sensetag WHERE gid NOT IN (SELECT id FROM gloss)').fetchone()[0], 0)
+        finally:
+            conn.close()
+
+
+class FailingGWordnetSQLite(GWordnetSQLite):
+    ''' Fail after some batches (interrupted build) '''
+
+    def __init__(self, db_path, batches):
+        GWordnetSQLite.__init__(self, db_path)
+        self.batches = batches
+
+    def replace_synsets(self, conn, synsets):
+        if not self.batches:
+            raise Exception("Interrupted")
+        self.batches -= 1
+        GWordnetSQLite.replace_synsets(self, conn, synsets)
+
+
+class TestBuild(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.tmpdir, 'glosstag.db')
+        self.xml_path = os.path.join(self.tmpdir, 'test.xml')
+        shutil.copyfile(MOCKUP_SYNSETS_DATA, self.xml_path)
+        self.total = len(GWordnetXML([MOCKUP_SYNSETS_DATA]).synsets)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def edit_xml(self, old, new):
+        with open(self.xml_path) as infile:
+            content = infile.read()
+        self.assertIn(old, content)
+        with open(self.xml_path, 'w') as outfile:
+            outfile.write(content.replace(old, new, 1))
+
+    def count(self, query, *values):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            return conn.execute(query, values).fetchone()[0]
+        finally:
+            conn.close()
+
+    def test_incremental_build(self):
+        gwn = GWordnetSQLite(self.db_path)
+        self.assertEqual(build_gwn(gwn, [self.xml_path]), (1, self.total))
+        self.assertEqual(self.count('SELECT COUNT(*) FROM synset'), self.total)
+        # same rows as insert_synsets()
+        ref_path = os.path.join(self.tmpdir, 'ref.db')
+        GWordnetSQLite(ref_path).insert_synsets(GWordnetXML([MOCKUP_SYNSETS_DATA]).synsets)
+        conn = sqlite3.connect(self.db_path)
+        conn.execute('ATTACH DATABASE ? AS ref', (ref_path,))
+        for table, columns in (('synset', '*'), ('term', '*'), ('gloss_raw', '*'), ('glossitem', 'ord, tag, lemma, text, origid'), ('sensetag', 'sk, lemma, origid')):
+            query = 'SELECT {1} FROM {0} EXCEPT SELECT {1} FROM ref.{0}'.format(table, columns)
+            self.assertEqual(conn.execute(query).fetchall(), [])
+        conn.close()
+        # nothing changed
+        self.assertEqual(build_gwn(gwn, [self.xml_path]), (0, 0))
+        # one synset changed
+        self.edit_xml('distant past', 'distant past (changed)')
+        self.assertEqual(build_gwn(gwn, [self.xml_path]), (1, 1))
+        self.assertTrue(any('(changed)' in g.gloss for g in gwn.get_synset_by_id('00022401-r').raw_glosses))
+        self.assertEqual(self.count('SELECT COUNT(*) FROM synset'), self.total)
+        # one synset removed
+        tree = etree.parse(self.xml_path)
+        element = tree.getroot().find("synset[@id='r00022401']")
+        element.getparent().remove(element)
+        tree.write(self.xml_path)
+        self.assertEqual(build_gwn(gwn, [self.xml_path]), (1, 1))
+        self.assertEqual(self.count('SELECT COUNT(*) FROM synset'), self.total - 1)
+        self.assertEqual(self.count("SELECT COUNT(*) FROM gloss WHERE sid = 'r00022401'"), 0)
+        # force
+        self.assertEqual(build_gwn(gwn, [self.xml_path], force=True), (1, self.total - 1))
+
+    def test_resume(self):
+        self.assertRaises(Exception, build_gwn, FailingGWordnetSQLite(self.db_path, 2), [self.xml_path], batch_size=50)
+        self.assertEqual(self.count('SELECT COUNT(*) FROM synset'), 100)
+        self.assertEqual(self.count('SELECT COUNT(*) FROM build_file'), 0)
+        # only the remaining synsets are imported
+        self.assertEqual(build_gwn(GWordnetSQLite(self.db_path), [self.xml_path], batch_size=50), (1, self.total - 100))
+        self.assertEqual(self.count('SELECT COUNT(*) FROM synset'), self.total)
+        self.assertEqual(self.count('SELECT COUNT(*) FROM build_log WHERE finished IS NOT NULL'), 1)
+
+
+class MockBatchWSQL(object):
+    ''' Batched DAO APIs of WordnetSQL (records calls) '''
+
+    def __init__(self):
+        self.calls = []
+        self.synsets = SynsetCollection()
+        for sid, lemma, key in (('01775164-v', 'love', 'love%2:37:00::'), ('07543288-n', 'love', 'love%1:12:00::')):
+            ss = Synset(sid)
+            ss.add_lemma(lemma)
+            ss.add_key(key)
+            ss.definition = 'definition\tof %s' % (sid,)
+            self.synsets.add(ss)
+
+    def get_synsets_by_ids(self, sids):
+        self.calls.append(('sid', sorted(sids)))
+        return {sid: self.synsets.by_sid(sid) for sid in sids if self.synsets.by_sid(sid)}
+
+    def get_synsets_by_sks(self, sks):
+        self.calls.append(('sk', sorted(sks)))
+        return {sk: self.synsets.by_sk(sk) for sk in sks if self.synsets.by_sk(sk)}
+
+    def get_synsets_by_lemmas(self, lemmas):
+        self.calls.append(('lemma', sorted(lemmas)))
+        return {lemma: SynsetCollection(self.synsets.by_lemma(lemma)) for lemma in lemmas if self.synsets.by_lemma(lemma)}
+
+
+class TestBatch(unittest.TestCase):
+
+    def test_read_queries(self):
+        lines = ['love\n', '# comment\n', '\n', 'love\tv\n', 'love/n\n', ' 01775164-v \n', 'love%2:37:00::']
+        self.assertEqual(list(read_batch_queries(lines)), ['love', 'love/v', 'love/n', '01775164-v', 'love%2:37:00::'])
+
+    def test_jsonl(self):
+        wsql = MockBatchWSQL()
+        queries = ['love', 'love/v', '01775164-v', 'love%1:12:00::', 'hate', 'love', '12345678-n']
+        outfile = io.BytesIO()
+        self.assertEqual(run_batch(YawolService(wsql), queries, outfile, chunk_size=4), (7, 5))
+        lines = [json.loads(line.decode('utf-8')) for line in outfile.getvalue().splitlines()]
+        self.assertEqual([line['query'] for line in lines], queries)
+        self.assertEqual([[ss['synsetid'] for ss in line['synsets']] for line in lines],
+                         [['01775164-v', '07543288-n'], ['01775164-v'], ['01775164-v'], ['07543288-n'], [], ['01775164-v', '07543288-n'], []])
+        # one bulk call per query kind and chunk
+        self.assertEqual(len(wsql.calls), 5)
+
+    def test_tsv(self):
+        outfile = io.BytesIO()
+        run_batch(YawolService(MockBatchWSQL()), ['love', 'hate'], outfile, fmt='tsv')
+        rows = [line.split('\t') for line in outfile.getvalue().decode('utf-8').splitlines()]
+        self.assertEqual(rows, [['love', '01775164-v', 'love', 'definition of 01775164-v'],
+                                ['love', '07543288-n', 'love', 'definition of 07543288-n'],
+                                ['hate', '', '', '']])
+
+
+########################################################################
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == "__main__":
+    main()
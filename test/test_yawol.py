@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+Script for testing yawol REST building blocks
+Latest version can be found at https://github.com/letuananh/yawlib
+
+@author: Le Tuan Anh <tuananh.ke@gmail.com>
+'''
+
+# Copyright (c) 2017, Le Tuan Anh <tuananh.ke@gmail.com>
+#
+#Permission is hereby granted, free of charge, to any person obtaining a copy
+#of this software and associated documentation files (the "Software"), to deal
+#in the Software without restriction, including without limitation the rights
+#to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#copies of the Software, and to permit persons to whom the Software is
+#furnished to do so, subject to the following conditions:
+#
+#The above copyright notice and this permission notice shall be included in
+#all copies or substantial portions of the Software.
+#
+#THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+#THE SOFTWARE.
+
+__author__ = "Le Tuan Anh <tuananh.ke@gmail.com>"
+__copyright__ = "Copyright 2017, yawlib"
+__credits__ = []
+__license__ = "MIT"
+__version__ = "0.1"
+__maintainer__ = "Le Tuan Anh"
+__email__ = "<tuananh.ke@gmail.com>"
+__status__ = "Prototype"
+
+########################################################################
+
+########################################################################
+
+import os
+import json
+import time
+import sqlite3
+import unittest
+from yawlib.yawol import ResponseCache, YawolService, ServiceError, BatchError, normalize_query, warmup
+from yawlib.wordnetsql import LemmaIndex, WordnetSQL
+from yawlib.models import Synset, SynsetID, SynsetCollection
+from yawlib.yawol.service import split_pos, classify_query
+
+########################################################################
+
+TEST_DIR = os.path.dirname(os.path.realpath(__file__))
+TEST_DB = os.path.join(TEST_DIR, 'data', 'yawol_cache_test.db')
+SWAP_DB = os.path.join(TEST_DIR, 'data', 'yawol_swap_test.db')
+
+
+def make_wnsql_db(db_path, rows):
+    ''' Create a minimal WNSQL database and move it to db_path (replaces the file like a deployment would)
+    rows -- (synsetid, lemma, sensekey, tagcount, definition)
+    '''
+    tmp_path = db_path + '.tmp'
+    conn = sqlite3.connect(tmp_path)
+    conn.executescript('''CREATE TABLE words (wordid INTEGER PRIMARY KEY, lemma TEXT);
+                          CREATE TABLE synsets (synsetid INTEGER PRIMARY KEY, pos TEXT, lexdomainid INTEGER, definition TEXT);
+                          CREATE TABLE senses (wordid INTEGER, synsetid INTEGER, sensekey TEXT, tagcount INTEGER);
+                          CREATE TABLE samples (synsetid INTEGER, sampleid INTEGER, sample TEXT);
+                          CREATE VIEW wordsXsensesXsynsets AS SELECT * FROM words
+                            INNER JOIN senses USING (wordid) INNER JOIN synsets USING (synsetid);''')
+    for wordid, (synsetid, lemma, sensekey, tagcount, definition) in enumerate(rows, 1):
+        conn.execute('INSERT INTO words VALUES (?, ?)', (wordid, lemma))
+        conn.execute('INSERT INTO synsets VALUES (?, ?, 0, ?)', (synsetid, SynsetID.from_string(synsetid).pos, definition))
+        conn.execute('INSERT INTO senses VALUES (?, ?, ?, ?)', (wordid, synsetid, sensekey, tagcount))
+    conn.commit()
+    conn.close()
+    os.replace(tmp_path, db_path)
+
+
+class TestResponseCache(unittest.TestCase):
+
+    def setUp(self):
+        with open(TEST_DB, 'w') as dbfile:
+            dbfile.write('v1')
+
+    def tearDown(self):
+        os.unlink(TEST_DB)
+
+    def test_normalize_query(self):
+        self.assertEqual(normalize_query('01775164v'), '01775164-v')
+        self.assertEqual(normalize_query('v01775164'), '01775164-v')
+        self.assertEqual(normalize_query(' love '), 'love')
+
+    def test_etag(self):
+        rcache = ResponseCache(TEST_DB, check_interval=None)
+        key = rcache.make_key('search', 'love')
+        etag = rcache.etag(key)
+        self.assertEqual(etag, ResponseCache(TEST_DB).etag(key))
+        self.assertNotEqual(etag, rcache.etag(key, 'callback'))
+        self.assertNotEqual(etag, rcache.etag(rcache.make_key('search', 'hate')))
+        self.assertTrue(rcache.not_modified(etag, etag))
+        self.assertTrue(rcache.not_modified(etag, '"abc", W/{}'.format(etag)))
+        self.assertTrue(rcache.not_modified(etag, '*'))
+        self.assertFalse(rcache.not_modified(etag, None))
+        self.assertFalse(rcache.not_modified(etag, '"abc"'))
+        # database changed
+        with open(TEST_DB, 'w') as dbfile:
+            dbfile.write('version 2')
+        self.assertTrue(rcache.refresh())
+        self.assertNotEqual(etag, rcache.etag(key))
+        self.assertFalse(rcache.refresh())
+
+    def test_get(self):
+        rcache = ResponseCache(TEST_DB, maxsize=2)
+        calls = []
+
+        def compute(data):
+            calls.append(data)
+            return data
+        resp = rcache.get('a', lambda: compute(b'[1]'))
+        self.assertEqual((resp.status, resp.body), (200, b'[1]'))
+        self.assertIs(rcache.get('a', lambda: compute(b'[1]')), resp)
+        self.assertEqual(rcache.get('b', lambda: compute(iter([b'[', b'2]']))).body, b'[2]')
+        # not found responses are cached too
+        self.assertEqual(rcache.get('c', lambda: compute(None)).status, 404)
+        self.assertEqual(rcache.get('c', lambda: compute(None)).status, 404)
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(len(rcache.cache), 2)
+
+    def test_check(self):
+        rcache = ResponseCache(TEST_DB, check_interval=0)
+        key = rcache.make_key('search', 'love')
+        etag = rcache.etag(key)
+        rcache.get(key, lambda: b'[1]')
+        self.assertEqual(rcache.get(key, lambda: b'[2]').body, b'[1]')
+        # database changed, noticed by the next request
+        with open(TEST_DB, 'w') as dbfile:
+            dbfile.write('version 2')
+        self.assertNotEqual(rcache.etag(key), etag)
+        self.assertEqual(rcache.get(key, lambda: b'[2]').body, b'[2]')
+        # not checked again within check_interval
+        rcache.check_interval = 3600
+        with open(TEST_DB, 'w') as dbfile:
+            dbfile.write('version 3')
+        self.assertFalse(rcache.check())
+        self.assertTrue(rcache.refresh())
+
+    def test_on_change(self):
+        wsql = MockWSQL()
+        service = YawolService(wsql)
+        rcache = ResponseCache(TEST_DB, on_change=service.invalidate)
+        self.assertIsNone(service.search('zzzz'))
+        self.assertFalse(rcache.refresh())
+        self.assertEqual(len(service.misses), 1)
+        with open(TEST_DB, 'w') as dbfile:
+            dbfile.write('version 2')
+        self.assertTrue(rcache.refresh())
+        self.assertEqual(len(service.misses), 0)
+        self.assertEqual(wsql.calls[-1], ('clear_caches',))
+
+
+class MockWSQL(object):
+    ''' Records DAO calls '''
+
+    def __init__(self):
+        self.calls = []
+        love = Synset('01775164-v')
+        love.add_lemma('love')
+        love.add_key('love%2:37:00::')
+        self.synsets = SynsetCollection([love])
+
+    def get_synset_by_id(self, sid):
+        self.calls.append(('sid', sid))
+        return self.synsets.by_sid(sid)
+
+    def get_synset_by_sk(self, sk):
+        self.calls.append(('sk', sk))
+        return self.synsets.by_sk(sk)
+
+    def get_synsets_by_lemma(self, lemma):
+        self.calls.append(('lemma', lemma))
+        return SynsetCollection(self.synsets.by_lemma(lemma))
+
+    def iter_synsets(self, since_id=None, pos=None):
+        self.calls.append(('export', since_id, pos))
+        return iter(self.synsets)
+
+    def get_lemma_index(self):
+        return LemmaIndex([('love', 'v', 43), ('lovely', 's', 2)])
+
+    def clear_caches(self):
+        self.calls.append(('clear_caches',))
+
+    def close(self):
+        self.calls.append(('close',))
+
+
+class TestSearch(unittest.TestCase):
+
+    def test_classify_query(self):
+        self.assertEqual(classify_query('01775164-v'), ('sid', '01775164-v'))
+        self.assertEqual(classify_query(' 201775164 '), ('sid', '01775164-v'))
+        self.assertEqual(classify_query('love%2:37:00::'), ('sk', 'love%2:37:00::'))
+        self.assertEqual(classify_query('love'), ('lemma', ('love', None)))
+        self.assertEqual(classify_query('love/v'), ('lemma', ('love', 'v')))
+
+    def test_single_lookup(self):
+        wsql = MockWSQL()
+        service = YawolService(wsql)
+        self.assertIsNotNone(service.search('love%2:37:00::'))
+        self.assertEqual(wsql.calls, [('sk', 'love%2:37:00::')])
+        self.assertIsNotNone(service.search('v01775164'))
+        self.assertIsNotNone(service.search('love/v'))
+        self.assertIsNone(service.search('love/n'))
+        self.assertIsNotNone(service.get_synset('01775164v'))
+        self.assertIsNone(service.get_synset('not-an-id'))
+        self.assertEqual(len(wsql.calls), 5)
+
+    def test_negative_cache(self):
+        wsql = MockWSQL()
+        service = YawolService(wsql)
+        for _ in range(3):
+            self.assertIsNone(service.search('zzzz'))
+            self.assertIsNone(service.search('zzzz%1:00:00::'))
+            self.assertIsNone(service.search('12345678-n'))
+        self.assertEqual(len(wsql.calls), 3)
+        self.assertEqual(service.misses.hits, 6)
+
+    def test_negative_cache_ttl(self):
+        wsql = MockWSQL()
+        service = YawolService(wsql, negative_ttl=0.05)
+        self.assertIsNone(service.search('hate'))
+        # added to the database later
+        hate = Synset('01776952-v')
+        hate.add_lemma('hate')
+        wsql.synsets.add(hate)
+        self.assertIsNone(service.search('hate'))
+        self.assertEqual(len(wsql.calls), 1)
+        time.sleep(0.1)
+        self.assertIsNotNone(service.search('hate'))
+        self.assertEqual(len(wsql.calls), 2)
+        self.assertNotIn(('lemma', ('hate', None)), service.misses)
+        # misses are dropped when the database changes
+        self.assertIsNone(service.search('zzzz'))
+        service.invalidate()
+        self.assertEqual(len(service.misses), 0)
+
+
+class TestInvalidate(unittest.TestCase):
+
+    def tearDown(self):
+        os.unlink(SWAP_DB)
+
+    def test_database_swap(self):
+        make_wnsql_db(SWAP_DB, [(201775164, 'love', 'love%2:37:00::', 43, 'have a great affection or liking for')])
+        wsql = WordnetSQL(SWAP_DB)
+        service = YawolService(wsql)
+        rcache = ResponseCache(SWAP_DB, check_interval=0, on_change=service.invalidate)
+
+        def search(query):
+            return rcache.get(rcache.make_key('search', query), lambda: service.search(query))
+        self.assertEqual(search('love').status, 200)
+        self.assertEqual(search('hate').status, 404)
+        self.assertIsNone(service.get_synset('01776952-v'))
+        self.assertIn(('sid', SynsetID.from_string('01776952-v')), service.misses)
+        self.assertEqual(len(wsql.get_lemma_index()), 1)
+        # a new database file is deployed
+        make_wnsql_db(SWAP_DB, [(201775164, 'love', 'love%2:37:00::', 43, 'have a great affection or liking for'),
+                                (201776952, 'hate', 'hate%2:37:00::', 9, 'dislike intensely')])
+        self.assertEqual(search('hate').status, 200)
+        self.assertEqual(len(service.misses), 0)
+        self.assertIsNotNone(service.get_synset('01776952-v'))
+        self.assertEqual(len(wsql.get_lemma_index()), 2)
+        wsql.close()
+
+
+class TestWarmup(unittest.TestCase):
+
+    def setUp(self):
+        with open(TEST_DB, 'w') as dbfile:
+            dbfile.write('v1')
+
+    def tearDown(self):
+        os.unlink(TEST_DB)
+
+    def test_warmup(self):
+        wsql = MockWSQL()
+        service = YawolService(wsql)
+        rcache = ResponseCache(TEST_DB)
+        stats = warmup(service, rcache, freeze=False)
+        self.assertEqual((stats['lemmas'], stats['responses']), (2, 2))
+        self.assertEqual(rcache.cached(rcache.make_key('search', 'love')).status, 200)
+        self.assertEqual(rcache.cached(rcache.make_key('search', 'lovely')).status, 404)
+        # connections are closed before workers are forked
+        self.assertEqual(wsql.calls[-1], ('close',))
+
+
+class TestBatch(unittest.TestCase):
+
+    def test_split_pos(self):
+        self.assertEqual(split_pos('love/n'), ('love', 'n'))
+        self.assertEqual(split_pos('love'), ('love', None))
+        self.assertEqual(split_pos('20/20'), ('20/20', None))
+        self.assertEqual(split_pos('/n'), ('/n', None))
+
+    def test_read_batch(self):
+        service = YawolService(None, max_batch_size=3)
+        self.assertEqual(service.read_batch(b'{"queries": ["love", "01775164-v"]}'), ['love', '01775164-v'])
+        self.assertEqual(service.read_batch('["love/n"]'), ['love/n'])
+        for body in (b'{', b'{"queries": "love"}', b'[1, 2]'):
+            with self.assertRaises(BatchError) as cm:
+                service.read_batch(body)
+            self.assertEqual(cm.exception.status, 400)
+        with self.assertRaises(BatchError) as cm:
+            service.read_batch(b'["a", "b", "c", "d"]')
+        self.assertEqual(cm.exception.status, 413)
+        # body size is checked before parsing
+        service = YawolService(None, max_batch_bytes=16)
+        self.assertEqual(service.read_batch(b'["love", "hate"]'), ['love', 'hate'])
+        for body in (b'["love", "hate", "like"]', b'{' * 17):
+            with self.assertRaises(BatchError) as cm:
+                service.read_batch(body)
+            self.assertEqual(cm.exception.status, 413)
+
+
+class TestExport(unittest.TestCase):
+
+    def test_export(self):
+        wsql = MockWSQL()
+        service = YawolService(wsql)
+        lines = b''.join(service.export()).splitlines()
+        self.assertEqual([json.loads(x) for x in lines], [ss.to_json() for ss in wsql.synsets])
+        lines = b''.join(service.export('a', 'lemmas, tagcount', 'v01775164')).splitlines()
+        self.assertEqual(json.loads(lines[0]), {'synsetid': '01775164-v', 'lemmas': ['love'], 'tagcount': 0})
+        self.assertEqual(wsql.calls, [('export', None, None), ('export', SynsetID.from_string('01775164-v'), 'as')])
+
+    def test_invalid_export(self):
+        service = YawolService(MockWSQL())
+        for args in (('q',), (None, 'lemmas,bogus'), (None, None, 'notasynset')):
+            with self.assertRaises(ServiceError) as cm:
+                service.export(*args)
+            self.assertEqual(cm.exception.status, 400)
+
+
+########################################################################
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == "__main__":
+    main()
@@ -39,12 +39,29 @@ __maintainer__ = "Le Tuan Anh"
 __email__ = "<tuananh.ke@gmail.com>"
 __status__ = "Prototype"
 
-from .config import YLConfig
-from .models import SynsetID, POS, Synset, SynsetCollection
-from .glosswordnet import GWordnetXML, GWordnetSQLite
-from .wordnetsql import WordnetSQL
-from .helpers import get_synset_by_id, get_synset_by_sk, get_synsets_by_term
-from .helpers import dump_synsets, dump_synset
+# Public names are imported from their modules on first use (see __getattr__),
+# so that `from yawlib import SynsetID` does not load lxml, chirptext, puchikarui, etc.
+_LAZY_NAMES = {'YLConfig': 'config',
+               'SynsetID': 'models', 'POS': 'models', 'Synset': 'models', 'SynsetCollection': 'models',
+               'GWordnetXML': 'glosswordnet', 'GWordnetSQLite': 'glosswordnet',
+               'WordnetSQL': 'wordnetsql',
+               'get_synset_by_id': 'helpers', 'get_synset_by_sk': 'helpers', 'get_synsets_by_term': 'helpers',
+               'dump_synsets': 'helpers', 'dump_synset': 'helpers'}
+
+
+def __getattr__(name):
+    module = _LAZY_NAMES.get(name)
+    if module is None:
+        raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+    # __import__ (rather than importlib) so that the import shows up in python -X importtime
+    value = getattr(__import__(module, globals(), level=1, fromlist=[name]), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_NAMES))
+
 
 __all__ = ['YLConfig', 'GWordnetXML', 'GWordnetSQLite', 'WordnetSQL',
            'POS', 'SynsetID', 'Synset', 'SynsetCollection',
@@ -49,7 +49,7 @@ def full_path(a_path):
 class YLConfig:
     # WordNet SQLite can be downloaded from:
     #       http://sourceforge.net/projects/wnsql/files/wnsql3/sqlite/3.0/
-    WNSQL30_PATH = full_path('~/wordnet/sqlite-30.db')
+    WNSQL30_PATH = full_path(os.environ.get('YAWLIB_WNSQL30_PATH', '~/wordnet/sqlite-30.db'))
     # Gloss WordNet can be downloaded from:
     #       http://wordnet.princeton.edu/glosstag.shtml
     GWN30_PATH = full_path('~/wordnet/glosstag')
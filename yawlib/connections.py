@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+Read-only SQLite connections, one per thread
+Latest version can be found at https://github.com/letuananh/yawlib
+
+Usage:
+    conns = LocalConnections('/path/to/db.sqlite')
+    conns.get().execute(...)  # the connection of the current thread (closed when the thread exits)
+    conns.close()             # close all connections
+
+@author: Le Tuan Anh <tuananh.ke@gmail.com>
+'''
+
+# Copyright (c) 2017, Le Tuan Anh <tuananh.ke@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+__author__ = "Le Tuan Anh <tuananh.ke@gmail.com>"
+__copyright__ = "Copyright 2017, yawlib"
+__credits__ = []
+__license__ = "MIT"
+__version__ = "0.1"
+__maintainer__ = "Le Tuan Anh"
+__email__ = "<tuananh.ke@gmail.com>"
+__status__ = "Prototype"
+
+########################################################################
+
+import sqlite3
+import weakref
+import threading
+
+########################################################################
+
+
+class _Holder(object):
+    ''' Per-thread holder of a connection (sqlite3 connections cannot be weakly referenced) '''
+
+    __slots__ = ('conn', 'generation', '__weakref__')
+
+    def __init__(self, conn, generation):
+        self.conn = conn
+        self.generation = generation
+
+
+def _release(conns, lock, conn):
+    ''' Close a connection when the thread which owns it exits '''
+    conn.close()
+    with lock:
+        conns.discard(conn)
+
+
+class LocalConnections(object):
+    ''' Read-only SQLite connections, one per thread
+
+    A connection is kept open and reused by its thread and closed when the thread exits,
+    so servers which start a thread per request do not leak connections.
+    '''
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._conns = set()
+        self._lock = threading.Lock()
+        self._generation = 0
+
+    def get(self):
+        ''' Get the connection of the current thread (do not close it) '''
+        holder = getattr(self._local, 'holder', None)
+        if holder is None or holder.generation != self._generation:
+            from urllib.request import pathname2url
+            uri = 'file:{}?mode=ro'.format(pathname2url(self.db_path))
+            conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+            # a replaced holder is finalized here, its connection is closed by its own thread
+            holder = self._local.holder = _Holder(conn, self._generation)
+            with self._lock:
+                self._conns.add(conn)
+            # the thread-local holder is dropped when the thread exits
+            weakref.finalize(holder, _release, self._conns, self._lock, conn)
+        return holder.conn
+
+    def close(self):
+        ''' Close all connections '''
+        with self._lock:
+            conns = list(self._conns)
+            self._conns.clear()
+            # holders are finalized when the old thread-local is dropped, outside of the lock
+            local, self._local = self._local, threading.local()
+        for conn in conns:
+            conn.close()
+        del local
+
+    def reset(self):
+        ''' Reopen connections (e.g. after the database file has been replaced)
+        Connections in use are not closed, each thread reconnects on its next get()
+        '''
+        with self._lock:
+            self._generation += 1
+
+    def __len__(self):
+        return len(self._conns)
@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+Local lookup daemon for wntk (Unix domain socket, line protocol)
+Latest version can be found at https://github.com/letuananh/yawlib
+
+Usage:
+    wntk serve --socket /tmp/wntk.sock          # keep DAOs open with warm caches
+    wntk --daemon synset 01775164-v             # forwarded to the daemon if it is running
+
+    with connect('/tmp/wntk.sock') as client:  # None if no daemon is running
+        print(client.request('lemma', 'love', 'v'))
+
+Protocol (UTF-8, many requests per connection):
+    request  -- one line of tab-separated fields: COMMAND<TAB>ARG...
+    response -- "OK <length>" line followed by <length> bytes of payload, or an "ERR <message>" line
+
+Commands:
+    synset SID [detail] | key SK [detail] | lemma LEMMA [POS] [detail]
+                       -- the text printed by wntk synset/key/lemma (Gloss WordNet)
+    complete PREFIX [POS] [LIMIT] -- one lemma per line (WordNet SQL)
+    query QUERY        -- JSON array of synsets (synset ID, sensekey or lemma[/POS], WordNet SQL)
+    omw SID [LANG]     -- definition from OMW
+    ping | stats
+
+The client side only needs the standard library, DAOs are imported by the server.
+
+@author: Le Tuan Anh <tuananh.ke@gmail.com>
+'''
+
+# Copyright (c) 2017, Le Tuan Anh <tuananh.ke@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+__author__ = "Le Tuan Anh <tuananh.ke@gmail.com>"
+__copyright__ = "Copyright 2017, yawlib"
+__credits__ = []
+__license__ = "MIT"
+__version__ = "0.1"
+__maintainer__ = "Le Tuan Anh"
+__email__ = "<tuananh.ke@gmail.com>"
+__status__ = "Prototype"
+
+########################################################################
+
+import io
+import os
+import json
+import time
+import socket
+import logging
+import tempfile
+import threading
+import socketserver
+from contextlib import redirect_stdout
+
+########################################################################
+
+logger = logging.getLogger(__name__)
+SOCKET_ENV = 'WNTK_SOCKET'
+DEFAULT_SOCKET = os.environ.get(SOCKET_ENV) or os.path.join(tempfile.gettempdir(), 'wntk-{}.sock'.format(os.getuid()))
+DEFAULT_TIMEOUT = 30
+RESPONSE_CACHE_SIZE = 4096
+
+########################################################################
+
+
+class DaemonError(Exception):
+    pass
+
+
+class DaemonClient(object):
+
+    def __init__(self, path=DEFAULT_SOCKET, timeout=DEFAULT_TIMEOUT):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            self.sock.settimeout(timeout)
+            self.sock.connect(path)
+        except Exception:
+            self.sock.close()
+            raise
+        self.rfile = self.sock.makefile('rb')
+
+    def request(self, *fields):
+        ''' Send a request and return its payload (str) '''
+        line = '\t'.join(str(f) for f in fields)
+        if '\n' in line or any('\t' in str(f) for f in fields):
+            raise DaemonError("Request fields must not contain tabs or newlines")
+        self.sock.sendall(line.encode('utf-8') + b'\n')
+        status = self.rfile.readline().decode('utf-8').rstrip('\n')
+        if status.startswith('OK '):
+            return self.rfile.read(int(status[3:])).decode('utf-8')
+        raise DaemonError(status[4:] if status.startswith('ERR ') else "Connection closed by daemon")
+
+    def close(self):
+        self.rfile.close()
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def connect(path=DEFAULT_SOCKET, timeout=DEFAULT_TIMEOUT):
+    ''' Connect to a running daemon (None if it is not running) '''
+    try:
+        return DaemonClient(path, timeout)
+    except (FileNotFoundError, ConnectionRefusedError, socket.timeout):
+        return None
+
+
+def forward(request, path=DEFAULT_SOCKET, timeout=DEFAULT_TIMEOUT):
+    ''' Payload of a request (tuple of fields) answered by a running daemon
+    None if the daemon is not running or cannot answer it (the caller should look it up locally)
+    '''
+    client = connect(path, timeout)
+    if client is None:
+        logger.info("wntk daemon is not running on %s" % (path,))
+        return None
+    try:
+        with client:
+            return client.request(*request)
+    except (DaemonError, OSError) as e:
+        logger.info("wntk daemon cannot answer %s: %s" % (request[0], e))
+        return None
+
+
+########################################################################
+
+
+class WntkDaemon(object):
+    ''' Answer daemon requests with long-lived DAOs
+
+    gwn  -- GWordnetSQLite (synset, key, lemma)
+    wsql -- WordnetSQL (complete, query)
+    omw  -- OMWSQL (omw)
+    Responses are cached and dropped when a database file changes.
+    '''
+
+    def __init__(self, gwn=None, wsql=None, omw=None, cache_size=RESPONSE_CACHE_SIZE):
+        from .caching import LRUCache
+        from .yawol import YawolService, db_fingerprint
+        self.gwn = gwn
+        self.wsql = wsql
+        self.omw = omw
+        self.service = YawolService(wsql) if wsql is not None else None
+        self.cache = LRUCache(cache_size, name='daemon')
+        self._db_fingerprint = db_fingerprint
+        self.db_paths = [dao.db_path for dao in (gwn, wsql, omw) if dao is not None]
+        self.fingerprints = self.fingerprint()
+        self.started = time.time()
+        self.requests = 0
+        # requests are handled by one thread per connection
+        self._requests_lock = threading.Lock()
+        # wntk output is printed to stdout, it is captured one request at a time
+        self._render_lock = threading.Lock()
+        self.commands = {'synset': self.synset, 'key': self.key, 'lemma': self.lemma,
+                         'complete': self.complete, 'query': self.query, 'omw': self.omw_def}
+
+    def fingerprint(self):
+        return [self._db_fingerprint(path) for path in self.db_paths]
+
+    def warmup(self):
+        ''' Load the lemma index of WordNet SQL (autocomplete) '''
+        if self.wsql is not None:
+            self.wsql.get_lemma_index()
+
+    def handle(self, fields):
+        ''' Answer a request (list of fields) with a str payload '''
+        with self._requests_lock:
+            self.requests += 1
+        command, args = fields[0], fields[1:]
+        if command == 'ping':
+            return 'pong'
+        elif command == 'stats':
+            return json.dumps({'requests': self.requests, 'uptime': round(time.time() - self.started, 3),
+                               'cached': len(self.cache), 'hits': self.cache.hits, 'misses': self.cache.misses})
+        func = self.commands.get(command)
+        if func is None:
+            raise DaemonError("Unknown command: {}".format(command))
+        fingerprints = self.fingerprint()
+        if fingerprints != self.fingerprints:
+            self.fingerprints = fingerprints
+            self.cache.clear()
+        key = '\t'.join(fields)
+        payload = self.cache.get(key)
+        if payload is None:
+            payload = self.cache.put(key, func(*args))
+        return payload
+
+    def _dao(self, name):
+        dao = getattr(self, name)
+        if dao is None:
+            raise DaemonError("{} is not available".format(name))
+        return dao
+
+    def render(self, func, *args, **kwargs):
+        buf = io.StringIO()
+        with self._render_lock, redirect_stdout(buf):
+            func(*args, **kwargs)
+        return buf.getvalue()
+
+    def synset(self, synsetid, detail=''):
+        from .helpers import get_synset_by_id
+        return self.render(get_synset_by_id, self._dao('gwn'), synsetid, compact=not detail)
+
+    def key(self, sensekey, detail=''):
+        from .helpers import get_synset_by_sk
+        return self.render(get_synset_by_sk, self._dao('gwn'), sensekey, compact=not detail)
+
+    def lemma(self, lemma, pos='', detail=''):
+        from .helpers import get_synsets_by_term
+        return self.render(get_synsets_by_term, self._dao('gwn'), lemma, pos or None, compact=not detail)
+
+    def complete(self, prefix, pos='', limit='10'):
+        return ''.join(lemma + '\n' for lemma in self._dao('wsql').complete(prefix, int(limit), pos or None))
+
+    def query(self, query):
+        self._dao('wsql')
+        chunks = self.service.search(query)
+        return b''.join(chunks).decode('utf-8') if chunks is not None else '[]'
+
+    def omw_def(self, synsetid, lang='eng'):
+        return self._dao('omw').get_synset_def(synsetid, lang) or ''
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        for line in self.rfile:
+            fields = line.decode('utf-8').rstrip('\n').split('\t')
+            try:
+                data = self.server.wntk.handle(fields).encode('utf-8')
+                self.wfile.write(b'OK ' + str(len(data)).encode('ascii') + b'\n' + data)
+            except Exception as e:
+                if not isinstance(e, DaemonError):
+                    logger.exception("Request failed: {}".format(fields))
+                self.wfile.write('ERR {}\n'.format(' '.join(str(e).split()) or type(e).__name__).encode('utf-8'))
+
+
+class DaemonServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+
+    daemon_threads = True
+
+    def __init__(self, path, wntk):
+        if os.path.exists(path):
+            client = connect(path, timeout=1)
+            if client is not None:
+                client.close()
+                raise DaemonError("A daemon is already running on {}".format(path))
+            os.unlink(path)  # stale socket
+        socketserver.UnixStreamServer.__init__(self, path, _RequestHandler)
+        self.path = path
+        self.wntk = wntk
+
+    def server_bind(self):
+        # the socket file is created accessible to the owner only (no window before a chmod)
+        umask = os.umask(0o077)
+        try:
+            socketserver.UnixStreamServer.server_bind(self)
+        finally:
+            os.umask(umask)
+
+    def server_close(self):
+        socketserver.UnixStreamServer.server_close(self)
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+
+def serve(wntk, path=DEFAULT_SOCKET):
+    ''' Serve daemon requests until interrupted (the socket file is removed afterwards) '''
+    server = DaemonServer(path, wntk)
+    logger.info("wntk daemon listening on {}".format(path))
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
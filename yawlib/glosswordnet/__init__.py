@@ -48,9 +48,25 @@ __version__ = "0.1"
 __maintainer__ = "Le Tuan Anh"
 __email__ = "<tuananh.ke@gmail.com>"
 __status__ = "Prototype"
-from .models import GlossedSynset, GlossRaw, Gloss, GlossGroup, SenseTag, GlossItem
-from .xmldao import GWordnetXML
-from .sqlitedao import GWordnetSQLite
+
+# imported on first use (xmldao requires lxml, sqlitedao requires puchikarui)
+_LAZY_NAMES = {'GlossedSynset': 'models', 'GlossRaw': 'models', 'Gloss': 'models',
+               'GlossGroup': 'models', 'SenseTag': 'models', 'GlossItem': 'models',
+               'GWordnetXML': 'xmldao', 'GWordnetSQLite': 'sqlitedao'}
+
+
+def __getattr__(name):
+    module = _LAZY_NAMES.get(name)
+    if module is None:
+        raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+    # __import__ (rather than importlib) so that the import shows up in python -X importtime
+    value = getattr(__import__(module, globals(), level=1, fromlist=[name]), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_NAMES))
 
 
 __all__ = ['GlossedSynset', 'GWordnetXML', 'GWordnetSQLite']
@@ -0,0 +1,26 @@
+-- Build manifest of Gloss WordNet DB (imported by wntk create)
+
+CREATE TABLE IF NOT EXISTS build_log (
+       id INTEGER PRIMARY KEY
+       ,started TEXT DEFAULT CURRENT_TIMESTAMP
+       ,finished TEXT    -- NULL if the build was interrupted
+       ,files INTEGER    -- number of parsed files
+       ,synsets INTEGER  -- number of inserted, replaced or removed synsets
+);
+
+CREATE TABLE IF NOT EXISTS build_file (
+       path TEXT PRIMARY KEY
+       ,digest TEXT  -- SHA-1 of file content (set once all synsets of the file are imported)
+);
+
+CREATE TABLE IF NOT EXISTS build_synset (
+       sid TEXT PRIMARY KEY -- Synset ID
+       ,file TEXT           -- fkey to build_file path
+       ,digest TEXT         -- SHA-1 of the synset element (NULL if the synset was removed)
+       ,build INTEGER       -- fkey to build_log id (last build which changed this synset)
+       ,FOREIGN KEY (file) REFERENCES build_file(path)
+       ,FOREIGN KEY (build) REFERENCES build_log(id)
+);
+
+CREATE INDEX IF NOT EXISTS build_synset_file ON build_synset (file);
+CREATE INDEX IF NOT EXISTS build_synset_build ON build_synset (build);
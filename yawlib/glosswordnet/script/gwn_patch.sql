@@ -0,0 +1,12 @@
+-- GlossTag patches applied to Gloss WordNet DB (by wntk patch)
+
+CREATE TABLE IF NOT EXISTS patch_log (
+       id INTEGER PRIMARY KEY
+       ,sid TEXT     -- Synset ID
+       ,digest TEXT  -- SHA-1 of the synset element in the patch file
+       ,source TEXT  -- path to patch file
+       ,applied TEXT DEFAULT CURRENT_TIMESTAMP
+       ,FOREIGN KEY (sid) REFERENCES synset(id)
+);
+
+CREATE INDEX IF NOT EXISTS patch_log_sid ON patch_log (sid);
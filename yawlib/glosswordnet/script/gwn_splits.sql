@@ -0,0 +1,47 @@
+-- Gloss sentence splits and token offsets (NTU-MC preparation, built by wntk splits)
+
+CREATE TABLE IF NOT EXISTS gloss_build (
+       name TEXT PRIMARY KEY
+       ,value TEXT
+);
+
+CREATE TABLE IF NOT EXISTS synset_patch (
+       sid TEXT PRIMARY KEY -- Synset ID (patched from GlossTag patch file)
+       ,digest TEXT         -- SHA-1 of the synset element in the patch file
+);
+
+CREATE TABLE IF NOT EXISTS gloss_sent (
+       id INTEGER PRIMARY KEY
+       ,sid TEXT        -- Synset ID
+       ,ord INTEGER     -- sentence order in raw gloss
+       ,sent TEXT
+       ,aligned INTEGER -- 1 if a gloss is aligned to this sentence
+       ,FOREIGN KEY (sid) REFERENCES synset(id)
+);
+
+CREATE TABLE IF NOT EXISTS glossitem_offset (
+       sentid INTEGER   -- fkey to gloss_sent id
+       ,wid INTEGER     -- word order in sentence
+       ,itemid INTEGER  -- ref to glossitem id (NULL for patched synsets)
+       ,origid TEXT     -- Original ID
+       ,text TEXT
+       ,pos TEXT
+       ,lemma TEXT
+       ,coll TEXT
+       ,cfrom INTEGER
+       ,cto INTEGER
+       ,FOREIGN KEY (sentid) REFERENCES gloss_sent(id)
+);
+
+CREATE TABLE IF NOT EXISTS gloss_sent_tag (
+       sentid INTEGER      -- fkey to gloss_sent id
+       ,sk TEXT
+       ,lemma TEXT
+       ,coll TEXT
+       ,item_origid TEXT   -- Original ID of tagged glossitem
+       ,FOREIGN KEY (sentid) REFERENCES gloss_sent(id)
+);
+
+CREATE INDEX IF NOT EXISTS gloss_sent_sid ON gloss_sent (sid);
+CREATE INDEX IF NOT EXISTS glossitem_offset_sentid ON glossitem_offset (sentid);
+CREATE INDEX IF NOT EXISTS gloss_sent_tag_sentid ON gloss_sent_tag (sentid);
@@ -43,9 +43,12 @@ __status__ = "Prototype"
 
 import os
 import logging
+import threading
+from contextlib import contextmanager
 
 from puchikarui import Schema, Execution  # , DataSource, Table
 
+from yawlib.metrics import REGISTRY, instrument
 from yawlib.models import SynsetCollection, SynsetID
 
 from .models import GlossedSynset
@@ -79,10 +82,29 @@ class GWordnetSQLite:
     def __init__(self, db_path, verbose=False):
         self.db_path = db_path
         self.schema = GWordnetSchema(self.db_path)
+        self._executions = 0
+        self._executions_lock = threading.Lock()
         if verbose:
             logger.setLevel(logging.INFO)
         else:
             logger.setLevel(logging.WARNING)
+        REGISTRY.track_connections(self, 'gwnsql')
+
+    @contextmanager
+    def execution(self):
+        ''' puchikarui Execution (each one opens a connection, counted in open_connections) '''
+        with self._executions_lock:
+            self._executions += 1
+        try:
+            with Execution(self.schema) as exe:
+                yield exe
+        finally:
+            with self._executions_lock:
+                self._executions -= 1
+
+    @property
+    def open_connections(self):
+        return self._executions
 
     def insert_synset(self, synset):
         ''' Helper method for storing a single synset
@@ -92,7 +114,7 @@ class GWordnetSQLite:
     def insert_synsets(self, synsets):
         ''' Store synsets with related information (sensekeys, terms, gloss, etc.)
         '''
-        with Execution(self.schema) as exe:
+        with self.execution() as exe:
             # synset;
             for synset in synsets:
                 sid = synset.sid.to_gwnsql()
@@ -126,6 +148,37 @@ class GWordnetSQLite:
             exe.ds.commit()
         pass
 
+    def replace_synsets(self, conn, synsets):
+        ''' Replace all rows of synsets (new synsets are inserted) through an open sqlite3 connection
+        The caller is responsible for the transaction (see wntk.apply_patch())
+        '''
+        for synset in synsets:
+            sid = synset.sid.to_gwnsql()
+            self.delete_synsets(conn, [sid])
+            # same rows as insert_synsets()
+            conn.execute('INSERT INTO synset (id, offset, pos) VALUES (?, ?, ?)', (sid, synset.sid.offset, synset.sid.pos))
+            conn.executemany('INSERT INTO term (sid, term) VALUES (?, ?)', [(sid, term) for term in synset.lemmas])
+            conn.executemany('INSERT INTO sensekey (sid, sensekey) VALUES (?, ?)', [(sid, sk) for sk in synset.keys])
+            conn.executemany('INSERT INTO gloss_raw (sid, cat, gloss) VALUES (?, ?, ?)', [(sid, gr.cat, gr.gloss) for gr in synset.raw_glosses])
+            for gloss in synset.glosses:
+                gloss.gid = conn.execute('INSERT INTO gloss (origid, sid, cat) VALUES (?, ?, ?)', (gloss.origid, sid, gloss.cat)).lastrowid
+                for item in gloss.items:
+                    item.itemid = conn.execute('INSERT INTO glossitem (ord, gid, tag, lemma, pos, cat, coll, rdf, sep, text, origid) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                                               (item.order, gloss.gid, item.tag, item.lemma, item.pos, item.cat, item.coll, item.rdf, item.sep, item.text, item.origid)).lastrowid
+                conn.executemany('INSERT INTO sensetag (cat, tag, glob, glob_lemma, glob_id, coll, sid, gid, sk, origid, lemma, itemid) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                                 [(tag.cat, tag.tag, tag.glob, tag.glemma, tag.glob_id, tag.coll, '', gloss.gid, tag.sk, tag.origid, tag.lemma, tag.item.itemid)
+                                  for tag in gloss.tags])
+
+    def delete_synsets(self, conn, sids):
+        ''' Delete all rows of synsets (GWNSQL IDs, e.g. n12345678) through an open sqlite3 connection '''
+        for sid in sids:
+            gids = 'SELECT id FROM gloss WHERE sid = ?'
+            conn.execute('DELETE FROM sensetag WHERE gid IN (%s)' % (gids,), (sid,))
+            conn.execute('DELETE FROM glossitem WHERE gid IN (%s)' % (gids,), (sid,))
+            for table in ('gloss', 'gloss_raw', 'sensekey', 'term'):
+                conn.execute('DELETE FROM %s WHERE sid = ?' % (table,), (sid,))
+            conn.execute('DELETE FROM synset WHERE id = ?', (sid,))
+
     def results_to_synsets(self, results, exe, synsets=None):
         if synsets is None:
             synsets = SynsetCollection()
@@ -166,11 +219,12 @@ class GWordnetSQLite:
             synsets.add(ss)
         return synsets
 
+    @instrument('gwordnetsqlite')
     def get_synset_by_id(self, synsetid):
         # ensure that synsetid is an instance of SynsetID
         sid = SynsetID.from_string(synsetid)
 
-        with Execution(self.schema) as exe:
+        with self.execution() as exe:
             # synset;
             results = exe.schema.synset.select(where='id=?', values=[sid.to_gwnsql()])
             if results:
@@ -179,10 +233,11 @@ class GWordnetSQLite:
                     return synsets[0]
         return None
 
+    @instrument('gwordnetsqlite')
     def get_synsets_by_ids(self, synsetids):
         sids = [str(SynsetID.from_string(x).to_gwnsql()) for x in synsetids]
         synsets = SynsetCollection()
-        with Execution(self.schema) as exe:
+        with self.execution() as exe:
             # synset;
             wherecon = 'id IN (%s)' % (','.join(['?'] * len(sids)))
             results = exe.schema.synset.select(where=wherecon, values=sids)
@@ -190,9 +245,10 @@ class GWordnetSQLite:
                 return self.results_to_synsets(results, exe, synsets)
         return synsets
 
+    @instrument('gwordnetsqlite')
     def all_synsets(self, synsets=None, deep_select=True):
         synsets = SynsetCollection()
-        with Execution(self.schema) as exe:
+        with self.execution() as exe:
             # synset;
             results = exe.schema.synset.select()
             if results:
@@ -202,8 +258,9 @@ class GWordnetSQLite:
                     return results
         return synsets
 
+    @instrument('gwordnetsqlite')
     def get_synset_by_sk(self, sensekey):
-        with Execution(self.schema) as exe:
+        with self.execution() as exe:
             # synset;
             results = exe.schema.synset.select(where='id IN (SELECT sid FROM sensekey where sensekey=?)', values=[sensekey])
             if results:
@@ -212,9 +269,10 @@ class GWordnetSQLite:
                     return synsets[0]
         raise Exception("Could not find any synset with provided key {}".format(sensekey))
 
+    @instrument('gwordnetsqlite')
     def get_synset_by_sks(self, sensekeys):
         synsets = SynsetCollection()
-        with Execution(self.schema) as exe:
+        with self.execution() as exe:
             # synset;
             where = 'id IN (SELECT sid FROM sensekey where sensekey IN (%s))' % ','.join(['?'] * len(sensekeys))
             results = exe.schema.synset.select(where=where, values=sensekeys)
@@ -222,9 +280,10 @@ class GWordnetSQLite:
                 return self.results_to_synsets(results, exe, synsets)
         return synsets
 
+    @instrument('gwordnetsqlite')
     def get_synsets_by_term(self, term, pos=None, synsets=None, sid_only=False):
         synsets = SynsetCollection()
-        with Execution(self.schema) as exe:
+        with self.execution() as exe:
             # synset;
             if pos:
                 results = exe.schema.synset.select(where='pos = ? AND id IN (SELECT sid FROM term where lower(term)=?)', values=[pos, term.lower()])
@@ -238,13 +297,13 @@ class GWordnetSQLite:
         return synsets
 
     def get_all_sensekeys(self):
-        with Execution(self.schema) as exe:
+        with self.execution() as exe:
             # synset;
             results = exe.schema.sensekey.select()
             return results
 
     def get_all_sensekeys_tagged(self):
-        with Execution(self.schema) as exe:
+        with self.execution() as exe:
             # synset;
             results = exe.schema.sensetag.select(columns=['sk'])
             sensekeys = set()
@@ -252,9 +311,10 @@ class GWordnetSQLite:
                 sensekeys.add(result.sk)
             return sensekeys
 
+    @instrument('gwordnetsqlite')
     def get_glossitems_text(self, synsetid):
         sid = SynsetID.from_string(synsetid).to_gwnsql()
-        with Execution(self.schema) as exe:
+        with self.execution() as exe:
             where = 'gid IN (SELECT id FROM gloss WHERE sid = ?)'
             results = exe.schema.glossitem.select(where=where, values=[sid],
                                                   columns=['id', 'lemma', 'pos', 'text'])
@@ -265,9 +325,10 @@ class GWordnetSQLite:
                 items.append(g)
             return items
 
+    @instrument('gwordnetsqlite')
     def get_sensetags(self, synsetid):
         sid = SynsetID.from_string(synsetid).to_gwnsql()
-        with Execution(self.schema) as exe:
+        with self.execution() as exe:
             results = exe.schema.sensetag.select(where='gid IN (SELECT id FROM gloss WHERE sid = ?)', values=[sid],
                                                  columns=['id', 'lemma', 'sk'])
             return results
@@ -48,29 +48,31 @@ import itertools
 import logging
 
 # from puchikarui import Schema, Execution#, DataSource, Table
-from chirptext.leutile import jilog, TextReport, FileHelper
+# chirptext and the DAOs are imported on first use (see yawlib.__init__)
 
 from .models import SynsetID
-from yawlib import YLConfig
-from yawlib import GWordnetXML as GWNXML
-from yawlib import GWordnetSQLite as GWNSQL
-from yawlib import WordnetSQL as WSQL
+from .config import YLConfig
 
 ########################################################################
 # CONFIGURATION
 ########################################################################
 
-MOCKUP_SYNSETS_DATA = (FileHelper.abspath('data/test.xml'),)
+MOCKUP_SYNSETS_DATA = (os.path.abspath(os.path.expanduser('data/test.xml')),)
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
 ########################################################################
 
 
+def stdout_report():
+    from chirptext.leutile import TextReport
+    return TextReport()  # Default to stdout
+
+
 def get_synset_by_id(gwn, synsetid_str, report_file=None, compact=True):
     ''' Search synset in WordNet Gloss Corpus by synset ID'''
     if report_file is None:
-        report_file = TextReport()  # Default to stdout
+        report_file = stdout_report()
     report_file.print("Looking for synsets by synsetid (Provided: %s)\n" % synsetid_str)
 
     # Get synset infro from GlossWordnet
@@ -87,7 +89,7 @@ def get_synset_by_id(gwn, synsetid_str, report_file=None, compact=True):
 def get_synset_by_sk(gwn, sk, report_file=None, compact=True):
     ''' Search synset in WordNet Gloss Corpus by sensekey'''
     if report_file is None:
-        report_file = TextReport()  # Default to stdout
+        report_file = stdout_report()
     report_file.print("Looking for synsets by sensekey (Provided: %s)\n" % sk)
 
     synset = gwn.get_synset_by_sk(sk)
@@ -98,7 +100,7 @@ def get_synset_by_sk(gwn, sk, report_file=None, compact=True):
 def get_synsets_by_term(gwn, t, pos=None, report_file=None, compact=True):
     ''' Search synset in WordNet Gloss Corpus by term'''
     if report_file is None:
-        report_file = TextReport()  # Default to stdout
+        report_file = stdout_report()
     report_file.print("Looking for synsets by term (Provided: %s | pos = %s)\n" % (t, pos))
 
     synsets = gwn.get_synsets_by_term(t, pos)
@@ -116,7 +118,7 @@ def dump_synsets(synsets, report_file=None, compact=True):
         report_file -- An instance of TextReport
     '''
     if report_file is None:
-        report_file = TextReport()  # Default to stdout
+        report_file = stdout_report()
 
     if synsets is not None:
         for synset in synsets:
@@ -138,7 +140,7 @@ def dump_synset(ss, compact_gloss=False, compact_tags=False, more_compact=True,
 
     '''
     if report_file is None:
-        report_file = TextReport()  # Default to stdout
+        report_file = stdout_report()
 
     if more_compact:
         report_file.header("Synset: %s (lemmas=%s | keys=%s)" % (ss.sid.to_canonical(), ss.lemmas, ss.keys), 'h0')
@@ -188,6 +190,7 @@ def glosstag_files(merged_folder):
 
 
 def get_gwnxml(args):
+    from .glosswordnet import GWordnetXML as GWNXML
     if args.mockup:
         return GWNXML(args.mockup_files)
     else:
@@ -197,12 +200,14 @@ def get_gwnxml(args):
 
 
 def get_gwn(args=None):
+    from .glosswordnet import GWordnetSQLite as GWNSQL
     gdb = args.glossdb if args else YLConfig.GWN30_DB
     gwn = GWNSQL(gdb)
     return gwn
 
 
 def get_wn(args=None):
+    from .wordnetsql import WordnetSQL as WSQL
     wnsql = args.wnsql if args else YLConfig.WNSQL30_PATH
     wn = WSQL(wnsql)
     return wn
@@ -248,6 +253,7 @@ def show_info(args):
 #--------------------------------------------------------
 
 def main():
+    from chirptext.leutile import jilog
     jilog("This is a library, not a tool")
 
 
@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+In-process metrics (counters, gauges, histograms) in Prometheus text format
+Latest version can be found at https://github.com/letuananh/yawlib
+
+Usage:
+    from yawlib.metrics import REGISTRY, instrument
+    REQUESTS = REGISTRY.counter('myapp_requests_total', 'Number of requests', ('route',))
+    REQUESTS.labels('search').inc()
+
+    class MyDAO:
+        @instrument('mydao')
+        def get_something(self): ...
+
+    print(REGISTRY.render())
+
+Caches (anything with hits/misses counters or cache_info()) and objects with
+an open_connections property can be tracked, they are read at render time.
+
+@author: Le Tuan Anh <tuananh.ke@gmail.com>
+'''
+
+# Copyright (c) 2017, Le Tuan Anh <tuananh.ke@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+__author__ = "Le Tuan Anh <tuananh.ke@gmail.com>"
+__copyright__ = "Copyright 2017, yawlib"
+__credits__ = []
+__license__ = "MIT"
+__version__ = "0.1"
+__maintainer__ = "Le Tuan Anh"
+__email__ = "<tuananh.ke@gmail.com>"
+__status__ = "Prototype"
+
+########################################################################
+
+import time
+import weakref
+import threading
+from functools import wraps
+from collections import OrderedDict
+
+########################################################################
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+########################################################################
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join('{}="{}"'.format(k, _escape(v)) for k, v in pairs) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return repr(value)
+    return str(value)
+
+
+class Metric(object):
+
+    TYPE = None
+
+    def __init__(self, name, doc, labelnames=()):
+        self.name = name
+        self.doc = doc
+        self.labelnames = tuple(labelnames)
+        self._children = OrderedDict()
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        values = tuple(str(v) for v in values)
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise Exception("Expected {} label values for {}".format(len(self.labelnames), self.name))
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def samples(self):
+        ''' (suffix, label values, extra label, value) '''
+        raise NotImplementedError
+
+    def render(self):
+        lines = ['# HELP {} {}'.format(self.name, self.doc), '# TYPE {} {}'.format(self.name, self.TYPE)]
+        for suffix, values, extra, value in self.samples():
+            lines.append('{}{}{} {}'.format(self.name, suffix, _format_labels(self.labelnames, values, extra), _format_value(value)))
+        return '\n'.join(lines)
+
+    # metrics without labels
+    def __getattr__(self, name):
+        if name in ('inc', 'dec', 'set', 'observe', 'set_function', 'value', 'time'):
+            return getattr(self.labels(), name)
+        raise AttributeError(name)
+
+
+class _Value(object):
+
+    def __init__(self):
+        self.value = 0
+        self._func = None
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value):
+        self.value = value
+
+    def set_function(self, func):
+        ''' Read the value from func() at render time '''
+        self._func = func
+
+    def get(self):
+        return self._func() if self._func is not None else self.value
+
+
+class Counter(Metric):
+
+    TYPE = 'counter'
+
+    def _new_child(self):
+        return _Value()
+
+    def samples(self):
+        for values, child in list(self._children.items()):
+            yield '', values, None, child.get()
+
+
+class Gauge(Counter):
+
+    TYPE = 'gauge'
+
+
+class _Histogram(object):
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        with self._lock:
+            self.count += 1
+            self.sum += value
+            for idx, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self.counts[idx] += 1
+                    break
+
+    def time(self):
+        return _Timer(self)
+
+
+class _Timer(object):
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start)
+
+
+class Histogram(Metric):
+
+    TYPE = 'histogram'
+
+    def __init__(self, name, doc, labelnames=(), buckets=DEFAULT_BUCKETS):
+        Metric.__init__(self, name, doc, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _Histogram(self.buckets)
+
+    def samples(self):
+        for values, child in list(self._children.items()):
+            with child._lock:
+                counts, total, count = list(child.counts), child.sum, child.count
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                yield '_bucket', values, ('le', _format_value(float(bound))), cumulative
+            yield '_bucket', values, ('le', '+Inf'), count
+            yield '_sum', values, None, total
+            yield '_count', values, None, count
+
+
+class Registry(object):
+
+    def __init__(self):
+        self.metrics = OrderedDict()
+        self._lock = threading.Lock()
+        self._caches = weakref.WeakKeyDictionary()
+        self._connections = weakref.WeakKeyDictionary()
+
+    def _add(self, metric):
+        with self._lock:
+            existing = self.metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self.metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, doc, labelnames=()):
+        return self._add(Counter(name, doc, labelnames))
+
+    def gauge(self, name, doc, labelnames=()):
+        return self._add(Gauge(name, doc, labelnames))
+
+    def histogram(self, name, doc, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._add(Histogram(name, doc, labelnames, buckets))
+
+    def track_cache(self, cache, name):
+        ''' Track a cache (LRUCache or a functools.lru_cache function) '''
+        self._caches[cache] = name
+        return cache
+
+    def track_connections(self, obj, name):
+        ''' Track the open_connections of a DAO '''
+        self._connections[obj] = name
+        return obj
+
+    def _cache_stats(self):
+        stats = OrderedDict()
+        for cache, name in list(self._caches.items()):
+            if hasattr(cache, 'cache_info'):
+                info = cache.cache_info()
+                hits, misses, size = info.hits, info.misses, info.currsize
+            else:
+                hits, misses, size = cache.hits, cache.misses, len(cache)
+            total = stats.setdefault(name, [0, 0, 0])
+            total[0] += hits
+            total[1] += misses
+            total[2] += size
+        return stats
+
+    def _tracked_metrics(self):
+        cache_hits = Counter('yawlib_cache_hits_total', 'Cache hits', ('cache',))
+        cache_misses = Counter('yawlib_cache_misses_total', 'Cache misses', ('cache',))
+        cache_size = Gauge('yawlib_cache_entries', 'Number of cached entries', ('cache',))
+        for name, (hits, misses, size) in self._cache_stats().items():
+            cache_hits.labels(name).set(hits)
+            cache_misses.labels(name).set(misses)
+            cache_size.labels(name).set(size)
+        conns = Gauge('yawlib_open_connections', 'Open database connections', ('dao',))
+        totals = OrderedDict()
+        for obj, name in list(self._connections.items()):
+            totals[name] = totals.get(name, 0) + obj.open_connections
+        for name, count in totals.items():
+            conns.labels(name).set(count)
+        return (cache_hits, cache_misses, cache_size, conns)
+
+    def render(self):
+        ''' All metrics in Prometheus text exposition format '''
+        metrics = list(self.metrics.values()) + list(self._tracked_metrics())
+        return '\n'.join(m.render() for m in metrics) + '\n'
+
+
+REGISTRY = Registry()
+DAO_SECONDS = REGISTRY.histogram('yawlib_dao_call_duration_seconds', 'Duration of DAO method calls', ('dao', 'method'))
+DAO_ERRORS = REGISTRY.counter('yawlib_dao_call_errors_total', 'DAO method calls which raised an exception', ('dao', 'method'))
+REQUEST_SECONDS = REGISTRY.histogram('yawol_request_duration_seconds', 'Duration of yawol HTTP requests', ('route', 'status'))
+
+
+def instrument(dao):
+    ''' Decorator which records call counts and durations of a DAO method '''
+    def decorator(func):
+        method = func.__name__
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            except Exception:
+                DAO_ERRORS.labels(dao, method).inc()
+                raise
+            finally:
+                DAO_SECONDS.labels(dao, method).observe(time.perf_counter() - start)
+        return wrapper
+    return decorator
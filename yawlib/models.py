@@ -42,8 +42,11 @@ __status__ = "Prototype"
 ########################################################################
 
 import json
-import re
-from chirptext.leutile import uniquify
+from array import array
+from bisect import bisect_left
+from collections import defaultdict as dd
+from functools import lru_cache
+from .metrics import REGISTRY
 
 ########################################################################
 
@@ -74,75 +77,175 @@ class POS(object):
 
 
 class SynsetID(object):
+    ''' Synset identifier, packed into a single integer (offset * 8 + POS code)
 
-    WNSQL_FORMAT = re.compile(r'(?P<pos>[123456nvarsx])(?P<offset>\d{8})')
-    CANONICAL_FORMAT = re.compile(r'(?P<offset>\d{8})-?(?P<pos>[nvasrx])')
+    SynsetID objects are immutable and interned, so they are cheap to hash,
+    compare and share between synsets, collections and cache keys.
+    Accepted formats: canonical (12345678-n or 12345678n), WordNet SQLite
+    (112345678) and Gloss WordNet SQLite (n12345678).
+    '''
+
+    __slots__ = ('_packed', '_hash')
+
+    POS_BITS = 3
+    POS_MASK = 7
+    WNSQL_BASE = 100000000  # WNSQL ID = POS number * WNSQL_BASE + offset
 
     def __init__(self, offset, pos):
-        self.offset = offset
-        self.pos = pos
+        self._set_packed(SynsetID.pack(offset, pos))
+
+    def _set_packed(self, packed):
+        object.__setattr__(self, '_packed', packed)
+        # SynsetIDs hash like their canonical string (they can be looked up in str-keyed dicts)
+        object.__setattr__(self, '_hash', hash(self.to_canonical()))
+
+    @staticmethod
+    def pack(offset, pos):
+        ''' Pack an offset and a POS (letter or number) into an integer '''
+        code = _POS_CODES.get(str(pos))
+        if code is None:
+            raise Exception('Invalid POS (provided: {})'.format(pos))
+        offset = int(offset)
+        if not 0 <= offset < SynsetID.WNSQL_BASE:
+            raise Exception('Invalid synset offset (provided: {})'.format(offset))
+        return (offset << SynsetID.POS_BITS) | code
+
+    @staticmethod
+    def from_packed(packed):
+        ''' Get the (interned) SynsetID object of a packed integer '''
+        return _intern_sid(packed)
 
     @staticmethod
     def from_string(synsetid):
         if synsetid is None:
             raise Exception("synsetid cannot be None")
-        m = SynsetID.WNSQL_FORMAT.match(str(synsetid))
-        if m:
-            # WNSQL_FORMAT
-            offset = m.group('offset')
-            pos = m.group('pos')
-            if pos in POS.NUMS:
-                pos = POS.num2pos(pos)
-            return SynsetID(offset, pos)
-        else:
-            # try canonical format
-            m = SynsetID.CANONICAL_FORMAT.match(str(synsetid))
-            if m:
-                offset = m.group('offset')
-                pos = m.group('pos')
-                return SynsetID(offset, pos)
-            else:
-                raise Exception("Invalid synsetid format (provided: {})".format(synsetid))
+        if isinstance(synsetid, SynsetID):
+            return synsetid
+        if not isinstance(synsetid, int):
+            synsetid = str(synsetid)
+        packed = _parse_sid(synsetid)
+        if packed is None:
+            raise Exception("Invalid synsetid format (provided: {})".format(synsetid))
+        return _intern_sid(packed)
+
+    @staticmethod
+    def parse(synsetid):
+        ''' Same as from_string but None is returned for invalid synset IDs '''
+        if synsetid is None or isinstance(synsetid, SynsetID):
+            return synsetid
+        if not isinstance(synsetid, int):
+            synsetid = str(synsetid)
+        packed = _parse_sid(synsetid)
+        return _intern_sid(packed) if packed is not None else None
+
+    @property
+    def packed(self):
+        return self._packed
+
+    @property
+    def offset(self):
+        return '%08d' % (self._packed >> SynsetID.POS_BITS)
+
+    @property
+    def pos(self):
+        return POS.POSES[(self._packed & SynsetID.POS_MASK) - 1]
 
     def to_canonical(self):
         ''' Wordnet synset ID (canonical format: 12345678-x)
         '''
-        return "{offset}-{pos}".format(offset=self.offset, pos=self.pos)
+        packed = self._packed
+        return '%08d-%s' % (packed >> SynsetID.POS_BITS, POS.POSES[(packed & SynsetID.POS_MASK) - 1])
 
     def to_wnsql(self):
         '''WordNet SQLite synsetID format (112345678)
            Reference: https://sourceforge.net/projects/wnsql/'''
-        return "{posnum}{offset}".format(offset=self.offset, posnum=POS.pos2num(self.pos))
+        packed = self._packed
+        return str((packed & SynsetID.POS_MASK) * SynsetID.WNSQL_BASE + (packed >> SynsetID.POS_BITS))
 
     def to_gwnsql(self):
         '''Gloss WordNet SQLite synsetID format (x12345678)'''
-        return "{pos}{offset}".format(offset=self.offset, pos=self.pos)
+        packed = self._packed
+        return '%s%08d' % (POS.POSES[(packed & SynsetID.POS_MASK) - 1], packed >> SynsetID.POS_BITS)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("SynsetID objects are immutable")
+
+    def __reduce__(self):
+        return (SynsetID.from_packed, (self._packed,))
 
     def __hash__(self):
-        return hash(self.to_canonical())
+        return self._hash
 
     def __eq__(self, other):
-        # make sure that the other instance is a SynsetID object
-        if other and not isinstance(other, SynsetID):
-            other = SynsetID.from_string(str(other))
-        return other is not None and self.offset == other.offset and self.pos == other.pos
+        if isinstance(other, SynsetID):
+            return self._packed == other._packed
+        if isinstance(other, (str, int)) and not isinstance(other, bool):
+            # any synset ID format (112345678, n12345678, 12345678n, ...)
+            return _parse_sid(other) == self._packed
+        return NotImplemented
 
     def __repr__(self):
         return self.to_canonical()
 
     def __str__(self):
-        return repr(self)
+        return self.to_canonical()
+
+
+SYNSETID_CACHE_SIZE = 131072  # WordNet 3.0 has 117,659 synsets
+# POS letters (and POS numbers) => POS code (1-6)
+_POS_LETTER_CODES = {p: int(n) for p, n in POS.pos2num_map.items()}
+_POS_CODES = dict(_POS_LETTER_CODES, **{n: int(n) for n in POS.NUMS})
+
+
+@lru_cache(maxsize=SYNSETID_CACHE_SIZE)
+def _parse_sid(synsetid):
+    ''' Parse a synset ID (str or WNSQL int) into a packed integer, return None if it's invalid '''
+    if isinstance(synsetid, int):
+        code, offset = divmod(synsetid, SynsetID.WNSQL_BASE)
+        if 1 <= code <= 6:
+            return (offset << SynsetID.POS_BITS) | code
+        return None
+    length = len(synsetid)
+    if length == 9:
+        if synsetid[1:].isdecimal():
+            # WNSQL (112345678) or GWNSQL (n12345678)
+            code = _POS_CODES.get(synsetid[0])
+            if code:
+                return (int(synsetid[1:]) << SynsetID.POS_BITS) | code
+        elif synsetid[:8].isdecimal():
+            # canonical without dash (12345678n)
+            code = _POS_LETTER_CODES.get(synsetid[8])
+            if code:
+                return (int(synsetid[:8]) << SynsetID.POS_BITS) | code
+    elif length == 10 and synsetid[8] == '-' and synsetid[:8].isdecimal():
+        # canonical (12345678-n)
+        code = _POS_LETTER_CODES.get(synsetid[9])
+        if code:
+            return (int(synsetid[:8]) << SynsetID.POS_BITS) | code
+    return None
+
+
+@lru_cache(maxsize=SYNSETID_CACHE_SIZE)
+def _intern_sid(packed):
+    sid = object.__new__(SynsetID)
+    sid._set_packed(packed)
+    return sid
+
+
+REGISTRY.track_cache(_parse_sid, 'synsetid_parse')
+REGISTRY.track_cache(_intern_sid, 'synsetid_intern')
 
 
 class Synset(object):
 
-    def __init__(self, sid, keys=None, lemmas=None, defs=None, exes=None, tagcount=0, lemma=None):
+    def __init__(self, sid, keys=None, lemmas=None, defs=None, exes=None, tagcount=0, lemma=None, lexfile=None):
         self.synsetid = sid
         self.keys = keys if keys is not None else []
         self.lemmas = lemmas if lemmas is not None else []
         self.defs = defs if defs else []
         self.exes = exes if exes else []
         self.tagcount = tagcount
+        self.lexfile = lexfile  # lexicographer file (lexdomainid in WordNet SQLite)
         if lemma is not None:
             self.lemma = lemma  # Canonical lemma
         pass
@@ -198,6 +301,7 @@ class Synset(object):
         self.keys.append(key)
 
     def get_tokens(self):
+        from chirptext.leutile import uniquify
         tokens = []
         tokens.extend(self.lemmas)
         for l in self.lemmas:
@@ -220,13 +324,58 @@ class Synset(object):
         return "(Synset:{})".format(self.sid)
 
 
+def merge_sids(a, b, op):
+    ''' Merge two sorted arrays of packed synset IDs in one pass
+    op -- intersection, union or difference (a - b)
+    Return a sorted array
+    '''
+    if op not in ('intersection', 'union', 'difference'):
+        raise ValueError("Invalid operation: {}".format(op))
+    result = array('q')
+    i = j = 0
+    size_a, size_b = len(a), len(b)
+    while i < size_a and j < size_b:
+        x, y = a[i], b[j]
+        if x < y:
+            if op != 'intersection':
+                result.append(x)
+            i += 1
+        elif y < x:
+            if op == 'union':
+                result.append(y)
+            j += 1
+        else:
+            if op != 'difference':
+                result.append(x)
+            i += 1
+            j += 1
+    if op != 'intersection':
+        result.extend(a[i:])
+    if op == 'union':
+        result.extend(b[j:])
+    return result
+
+
 class SynsetCollection(object):
     ''' Synset collection which provides basic synset search function (by_sid, by_sk, etc.)
+
+    Synsets are indexed by SynsetID and sensekey. Secondary indexes (lemma, POS, lexfile)
+    are built on first use and kept up to date afterwards.
     '''
-    def __init__(self):
+
+    # index name => function that returns index keys of a synset
+    INDEXES = {'lemma': lambda ss: {x.lower() for x in ss.lemmas} if ss.lemmas else (),
+               'pos': lambda ss: (ss.sid.pos,),
+               'lexfile': lambda ss: (ss.lexfile,) if ss.lexfile is not None else ()}
+
+    def __init__(self, synsets=None):
         self.synsets = []
         self.sid_map = {}
         self.sk_map = {}
+        self._indexes = {}
+        self._sids = None
+        if synsets:
+            self.extend(synsets)
 
     def add(self, synset):
         ssid = synset.sid
@@ -235,16 +384,41 @@ class SynsetCollection(object):
         if synset.keys is not None and len(synset.keys) > 0:
             for key in synset.keys:
                 self.sk_map[key] = synset
+        if self._indexes:
+            self._update_indexes((synset,))
+        self._sids = None
+        return self
+
+    def extend(self, synsets):
+        ''' Add many synsets at once '''
+        synsets = list(synsets)
+        self.synsets.extend(synsets)
+        self.sid_map.update((ss.sid, ss) for ss in synsets)
+        self.sk_map.update((key, ss) for ss in synsets if ss.keys for key in ss.keys)
+        if self._indexes:
+            self._update_indexes(synsets)
+        self._sids = None
         return self
 
+    def merge(self, another_scol):
+        ''' Add synsets from another synset collection '''
+        return self.extend(another_scol.synsets)
+
     def __getitem__(self, name):
         return self.synsets[name]
 
+    def __contains__(self, sid):
+        return self.by_sid(sid) is not None
+
     def by_sid(self, sid):
-        if sid and sid in self.sid_map:
-            return self.sid_map[str(sid)]
-        else:
+        if not sid:
             return None
+        if not isinstance(sid, SynsetID):
+            packed = _parse_sid(sid if isinstance(sid, int) else str(sid))
+            if packed is None:
+                return None
+            sid = _intern_sid(packed)
+        return self.sid_map.get(sid)
 
     def by_sk(self, sk):
         if sk in self.sk_map:
@@ -252,6 +426,65 @@ class SynsetCollection(object):
         else:
             return None
 
+    def by_lemma(self, lemma):
+        ''' Find synsets by lemma (case-insensitive) '''
+        return list(self._get_index('lemma').get(lemma.lower(), ()))
+
+    def by_pos(self, pos):
+        return list(self._get_index('pos').get(pos, ()))
+
+    def by_lexfile(self, lexfile):
+        return list(self._get_index('lexfile').get(lexfile, ()))
+
+    def _get_index(self, name):
+        index = self._indexes.get(name)
+        if index is None:
+            index = dd(list)
+            keys_of = SynsetCollection.INDEXES[name]
+            for ss in self.synsets:
+                for key in keys_of(ss):
+                    index[key].append(ss)
+            self._indexes[name] = index
+        return index
+
+    def _update_indexes(self, synsets):
+        for name, index in self._indexes.items():
+            keys_of = SynsetCollection.INDEXES[name]
+            for ss in synsets:
+                for key in keys_of(ss):
+                    index[key].append(ss)
+
+    @property
+    def sids(self):
+        ''' Packed synset IDs of this collection (sorted array of int64) '''
+        if self._sids is None:
+            self._sids = array('q', sorted(sid.packed for sid in self.sid_map))
+        return self._sids
+
+    def _select(self, packed_ids, *collections):
+        ''' Build a new collection from a sorted array of packed IDs (synsets are kept in collection order) '''
+        result = SynsetCollection()
+        size = len(packed_ids)
+        for scol in collections:
+            for ss in scol.synsets:
+                packed = ss.sid.packed
+                idx = bisect_left(packed_ids, packed)
+                # one synset per ID
+                if idx < size and packed_ids[idx] == packed and ss.sid not in result.sid_map:
+                    result.add(ss)
+        result._sids = packed_ids
+        return result
+
+    def intersection(self, other):
+        ''' Synsets of this collection which can also be found in other collection '''
+        return self._select(merge_sids(self.sids, other.sids, 'intersection'), self)
+
+    def union(self, other):
+        return self._select(merge_sids(self.sids, other.sids, 'union'), self, other)
+
+    def difference(self, other):
+        return self._select(merge_sids(self.sids, other.sids, 'difference'), self)
+
     def __iter__(self):
         return iter(self.synsets)
 
@@ -261,12 +494,6 @@ class SynsetCollection(object):
     def __len__(self):
         return self.count()
 
-    def merge(self, another_scol):
-        ''' Add synsets from another synset collection '''
-        for synset in another_scol.synsets:
-            self.add(synset)
-        return self
-
     def __str__(self):
         return str(self.synsets)
 
@@ -39,8 +39,19 @@ __status__ = "Prototype"
 
 #-----------------------------------------------------------------------
 
+import threading
+from array import array
+from bisect import bisect_left
+from itertools import accumulate
+from operator import itemgetter
+from collections import deque
+from collections import Counter
+from collections import defaultdict as dd
 from puchikarui import Schema, Execution
 from yawlib.models import SynsetID
+from yawlib.caching import LRUCache
+from yawlib.connections import LocalConnections
+from yawlib.metrics import REGISTRY, instrument
 
 #-----------------------------------------------------------------------
 
@@ -56,20 +67,279 @@ class OMWNTUMCSchema(Schema):
         self.add_table('synset_ex', 'synset lang def sid'.split(), alias='sex')
 
 
+class SynlinkGraph(object):
+    ''' synlink relations in compressed sparse row (CSR) arrays
+
+    Synsets (NTU-MC extension synsets 77xxxxxx included) are numbered by their position in
+    the sorted list of canonical IDs. The links of synset i are edges offsets[i] to offsets[i+1]-1,
+    targets[e] is the linked synset and links[e] the link type code (see link_types).
+    Link types are selected with bit masks (see mask()), walks do not touch the database.
+    '''
+
+    def __init__(self, rows):
+        ''' rows -- (synset1, synset2, link) '''
+        # edges grouped by source synset (stable sort: edges of a synset keep their order in rows)
+        rows = sorted(rows, key=itemgetter(0))
+        sources, targets, links = (list(map(itemgetter(col), rows)) for col in range(3))
+        del rows
+        self.synsets = sorted(set(sources).union(targets))
+        self.link_types = sorted(set(links))
+        if len(self.link_types) > 255:
+            raise Exception("Too many link types ({})".format(len(self.link_types)))
+        index = dict(zip(self.synsets, range(len(self.synsets))))
+        codes = dict(zip(self.link_types, range(len(self.link_types))))
+        counts = Counter(map(index.__getitem__, sources))
+        # counts[-1] is 0, so offsets starts with 0
+        self.offsets = array('i', accumulate(counts[idx] for idx in range(-1, len(self.synsets))))
+        self.targets = array('i', map(index.__getitem__, targets))
+        self.links = array('B', map(codes.__getitem__, links))
+
+    def __len__(self):
+        return len(self.synsets)
+
+    def __contains__(self, sid):
+        return self._node(sid) is not None
+
+    @property
+    def edge_count(self):
+        return len(self.targets)
+
+    def mask(self, links=None):
+        ''' Bit mask of link types (a link type, a list of link types or None for all of them)
+        Unknown link types are ignored
+        '''
+        if links is None:
+            return (1 << len(self.link_types)) - 1
+        if isinstance(links, str):
+            links = (links,)
+        links = set(links)
+        return sum(1 << code for code, link in enumerate(self.link_types) if link in links)
+
+    def _node(self, sid):
+        ''' Index of a synset in synsets (None if it has no links) '''
+        sid = SynsetID.parse(sid)
+        if sid is None:
+            return None
+        sid = sid.to_canonical()
+        idx = bisect_left(self.synsets, sid)
+        return idx if idx < len(self.synsets) and self.synsets[idx] == sid else None
+
+    def _sid(self, node):
+        return SynsetID.from_string(self.synsets[node])
+
+    def neighbours(self, sid, links=None):
+        ''' Get the linked synsets of a synset
+        Return a list of (SynsetID, link type)
+        '''
+        node = self._node(sid)
+        if node is None:
+            return []
+        mask = self.mask(links)
+        return [(self._sid(self.targets[e]), self.link_types[self.links[e]])
+                for e in range(self.offsets[node], self.offsets[node + 1]) if mask >> self.links[e] & 1]
+
+    def _walk(self, node, mask, max_depth=None, target=None):
+        ''' Breadth-first walk from node, return the parent (-1 for node) and depth of reached synsets '''
+        offsets, targets, links = self.offsets, self.targets, self.links
+        parents = {node: (-1, 0)}
+        queue = deque((node,))
+        while queue:
+            current = queue.popleft()
+            depth = parents[current][1] + 1
+            if max_depth is not None and depth > max_depth:
+                continue
+            for e in range(offsets[current], offsets[current + 1]):
+                nxt = targets[e]
+                if mask >> links[e] & 1 and nxt not in parents:
+                    parents[nxt] = (current, depth)
+                    if nxt == target:
+                        return parents
+                    queue.append(nxt)
+        return parents
+
+    def closure(self, sid, links=('hype', 'inst'), max_depth=None):
+        ''' Get the synsets which can be reached from a synset (transitive closure of links)
+        (e.g. closure(sid) => all hypernyms of sid)
+        Return a list of (SynsetID, depth), nearest synsets first
+        '''
+        node = self._node(sid)
+        if node is None:
+            return []
+        reached = self._walk(node, self.mask(links), max_depth)
+        return [(self._sid(n), depth) for n, (_, depth) in reached.items() if n != node]
+
+    def path(self, source, target, links=None, max_depth=None):
+        ''' Find a shortest path between two synsets
+        Return a list of SynsetID from source to target (both included) or None if there is no path
+        '''
+        src, dst = self._node(source), self._node(target)
+        if src is None or dst is None:
+            return None
+        reached = self._walk(src, self.mask(links), max_depth, target=dst)
+        if dst not in reached:
+            return None
+        path = []
+        node = dst
+        while node != -1:
+            path.append(self._sid(node))
+            node = reached[node][0]
+        return path[::-1]
+
+
 class OMWSQL:
-    def __init__(self, db_path):
+
+    # Maximum number of host parameters in one SQLite query
+    MAX_PARAMS = 500
+    # Maximum number of entries of each (table, language) cache
+    CACHE_SIZE = 20000
+
+    LEMMAS_QUERY = '''SELECT sense.synset, sense.lang, word.lemma
+                        FROM sense JOIN word ON word.wordid = sense.wordid
+                        WHERE sense.synset IN ({}) AND sense.lang IN ({}) ORDER BY sense.rowid'''
+    SYNSETS_QUERY = '''SELECT word.lemma, sense.lang, sense.synset
+                         FROM word JOIN sense ON sense.wordid = word.wordid
+                         WHERE word.lemma IN ({}) AND sense.lang IN ({}) ORDER BY sense.rowid'''
+    DEFS_QUERY = '''SELECT synset, lang, def FROM synset_def
+                      WHERE synset IN ({}) AND lang IN ({}) ORDER BY synset, lang, sid'''
+    EXES_QUERY = '''SELECT synset, lang, def FROM synset_ex
+                      WHERE synset IN ({}) AND lang IN ({}) ORDER BY synset, lang, sid'''
+
+    def __init__(self, db_path, cache_size=CACHE_SIZE):
         self.db_path = db_path
         self.schema = OMWNTUMCSchema(self.db_path)
-        # some cache here?
+        # (table, lang) => LRUCache of key => tuple of values (empty tuples are cached too)
+        self.cache_size = cache_size
+        self._caches = {}
+        self._caches_lock = threading.Lock()
+        self._synlink_graph = None
+        self._synlink_graph_lock = threading.Lock()
+        # Thread-local read-only connections
+        self._local_conns = LocalConnections(self.db_path)
+        REGISTRY.track_connections(self, 'omwsql')
+
+    def get_local_conn(self):
+        ''' Get the read-only connection of the current thread
+        The connection is kept open and reused by the thread (closed when it exits), do not close it.
+        '''
+        return self._local_conns.get()
+
+    def close(self):
+        ''' Close all thread-local connections '''
+        self._local_conns.close()
+
+    @property
+    def open_connections(self):
+        return len(self._local_conns)
+
+    def get_cache(self, table, lang):
+        cache = self._caches.get((table, lang))
+        if cache is None:
+            with self._caches_lock:
+                cache = self._caches.get((table, lang))
+                if cache is None:
+                    cache = LRUCache(self.cache_size, name='omw_{}_{}'.format(table, lang))
+                    self._caches[(table, lang)] = cache
+        return cache
+
+    def clear_caches(self):
+        for cache in list(self._caches.values()):
+            cache.clear()
+
+    def _select_in(self, query, keys, langs):
+        ''' Run query for all keys and languages (one query per MAX_PARAMS keys) '''
+        conn = self.get_local_conn()
+        size = self.MAX_PARAMS - len(langs)
+        rows = []
+        for i in range(0, len(keys), size):
+            chunk = keys[i:i + size]
+            rows.extend(conn.execute(query.format(','.join('?' * len(chunk)), ','.join('?' * len(langs))),
+                                     chunk + langs).fetchall())
+        return rows
+
+    def _lookup(self, table, query, keys, langs):
+        ''' Get the values of many keys in many languages through the caches of table
+        Return a map from key to {lang: tuple of values} (keys without values are left out)
+        '''
+        keys = list(keys)
+        langs = list(langs)
+        result = dd(dict)
+        missing_keys = set()
+        missing_langs = set()
+        for lang in langs:
+            cache = self.get_cache(table, lang)
+            for key in keys:
+                values = cache.get(key)
+                if values is None:
+                    missing_keys.add(key)
+                    missing_langs.add(lang)
+                elif values:
+                    result[key][lang] = values
+        if missing_keys:
+            found = dd(list)
+            for key, lang, value in self._select_in(query, sorted(missing_keys), sorted(missing_langs)):
+                found[key, lang].append(value)
+            for lang in missing_langs:
+                cache = self.get_cache(table, lang)
+                for key in missing_keys:
+                    values = found.get((key, lang))
+                    if values:
+                        result[key][lang] = cache.put(key, tuple(values))
+                    else:
+                        cache.put(key, ())
+        return result
+
+    def _lookup_synsets(self, table, query, sids, langs):
+        ''' Same as _lookup() but keys are synset IDs (returned as SynsetID) '''
+        sids = {SynsetID.from_string(sid).to_canonical(): sid for sid in sids}
+        result = self._lookup(table, query, sids.keys(), langs)
+        return {SynsetID.from_string(sid): {lang: list(values) for lang, values in result[sid].items()}
+                for sid in sids if sid in result}
+
+    def get_synlink_graph(self):
+        ''' Load synlink into a SynlinkGraph (only once) '''
+        if self._synlink_graph is None:
+            with self._synlink_graph_lock:
+                if self._synlink_graph is None:
+                    query = 'SELECT synset1, synset2, link FROM synlink ORDER BY rowid'
+                    self._synlink_graph = SynlinkGraph(self.get_local_conn().execute(query))
+        return self._synlink_graph
+
+    @instrument('omwsql')
+    def get_lemmas(self, sids, langs=('eng',)):
+        ''' Get the lemmas of many synsets in many languages at once
+        Return a map from SynsetID to {lang: [lemma, ...]} (synsets without lemmas are left out)
+        '''
+        return self._lookup_synsets('lemmas', self.LEMMAS_QUERY, sids, langs)
+
+    @instrument('omwsql')
+    def get_synsets_by_lemmas(self, lemmas, lang='eng'):
+        ''' Get the synsets of many lemmas of a language at once
+        Return a map from lemma to [SynsetID, ...] (lemmas which cannot be found are left out)
+        '''
+        result = self._lookup('synsets', self.SYNSETS_QUERY, set(lemmas), [lang])
+        return {lemma: [SynsetID.from_string(sid) for sid in values[lang]] for lemma, values in result.items()}
+
+    @instrument('omwsql')
+    def get_synset_defs(self, sids, langs=('eng',)):
+        ''' Get the definitions of many synsets in many languages at once
+        Return a map from SynsetID to {lang: [definition, ...]} (synsets without definitions are left out)
+        '''
+        return self._lookup_synsets('defs', self.DEFS_QUERY, sids, langs)
+
+    @instrument('omwsql')
+    def get_synset_exes(self, sids, langs=('eng',)):
+        ''' Get the examples of many synsets in many languages at once
+        Return a map from SynsetID to {lang: [example, ...]} (synsets without examples are left out)
+        '''
+        return self._lookup_synsets('exes', self.EXES_QUERY, sids, langs)
 
     def get_all_synsets(self):
         with Execution(self.schema) as exe:
             return exe.schema.ss.select()
 
     def get_synset_def(self, sid_str, lang='eng'):
+        ''' Get the first definition of a synset (None if there is none) '''
         sid = SynsetID.from_string(sid_str)
-        with Execution(self.schema) as exe:
-            defs = exe.schema.sdef.select(where='synset=? and lang=?', values=[sid.to_canonical(), lang])
-            assert len(defs) in (0, 1)
-            if defs:
-                return defs[0]._2
+        defs = self.get_synset_defs([sid], [lang]).get(sid)
+        if defs:
+            return defs[lang][0]
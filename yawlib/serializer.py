@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+JSON serialization for synsets and synset collections
+Latest version can be found at https://github.com/letuananh/yawlib
+
+Usage:
+    serializer = SynsetSerializer()
+    serializer.synset(ss)                  # => b'{"synsetid":"01775164-v",...}'
+    for chunk in serializer.iter_collection(synsets):
+        outfile.write(chunk)               # b'[{...},{...}]' in chunks
+    for chunk in serializer.iter_lines(synsets):
+        outfile.write(chunk)               # b'{...}\n{...}\n' in chunks
+
+orjson (or ujson) is used as encoder when it is installed, the standard
+json module is used otherwise. Output is UTF-8 encoded compact JSON.
+
+@author: Le Tuan Anh <tuananh.ke@gmail.com>
+'''
+
+# Copyright (c) 2017, Le Tuan Anh <tuananh.ke@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+__author__ = "Le Tuan Anh <tuananh.ke@gmail.com>"
+__copyright__ = "Copyright 2017, yawlib"
+__credits__ = []
+__license__ = "MIT"
+__version__ = "0.1"
+__maintainer__ = "Le Tuan Anh"
+__email__ = "<tuananh.ke@gmail.com>"
+__status__ = "Prototype"
+
+########################################################################
+
+import json
+import logging
+
+from .caching import LRUCache
+
+########################################################################
+
+logger = logging.getLogger(__name__)
+CHUNK_SIZE = 64 * 1024
+EMPTY_VALUES = (None, '', [], {})
+
+########################################################################
+
+
+def _json_dumps(obj):
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def get_encoder(backend='auto'):
+    ''' Get a function which encodes an object into JSON bytes
+
+    backend -- orjson, ujson, json or auto (the fastest available one)
+    '''
+    if backend in ('auto', 'orjson'):
+        try:
+            import orjson
+            return orjson.dumps
+        except ImportError:
+            if backend == 'orjson':
+                raise
+    if backend in ('auto', 'ujson'):
+        try:
+            import ujson
+            return lambda obj: ujson.dumps(obj, ensure_ascii=False).encode('utf-8')
+        except ImportError:
+            if backend == 'ujson':
+                raise
+    return _json_dumps
+
+
+class SynsetSerializer(object):
+    ''' Encode synsets into JSON bytes, one fragment per synset
+
+    Synset fragments are cached by synset ID. Synsets returned by lemma searches only
+    contain the matched senses, so lemmas, sensekeys and tagcount are part of the key too.
+    '''
+
+    def __init__(self, compact=False, cache_size=8192, backend='auto', chunk_size=CHUNK_SIZE):
+        self.compact = compact
+        self.chunk_size = chunk_size
+        self.encode = get_encoder(backend)
+        self.cache = LRUCache(cache_size, name='serializer')
+
+    def to_dict(self, ss):
+        data = ss.to_json()
+        if self.compact:
+            data = {k: v for k, v in data.items() if v not in EMPTY_VALUES}
+        return data
+
+    def dumps(self, obj):
+        ''' Encode a JSON-serializable object (dict, list, etc.) '''
+        return self.encode(obj)
+
+    def synset(self, ss):
+        ''' JSON fragment of a synset '''
+        key = (ss.sid, tuple(ss.lemmas or ()), tuple(ss.keys or ()), ss.tagcount)
+        fragment = self.cache.get(key)
+        if fragment is None:
+            fragment = self.cache.put(key, self.encode(self.to_dict(ss)))
+        return fragment
+
+    def iter_collection(self, synsets):
+        ''' Encode a collection of synsets as a JSON array (generator of bytes chunks) '''
+        buf = [b'[']
+        size = 1
+        for idx, ss in enumerate(synsets):
+            fragment = self.synset(ss)
+            if idx:
+                buf.append(b',')
+            buf.append(fragment)
+            size += len(fragment) + 1
+            if size >= self.chunk_size:
+                yield b''.join(buf)
+                buf = []
+                size = 0
+        buf.append(b']')
+        yield b''.join(buf)
+
+    def iter_mapping(self, items):
+        ''' Encode (key, synsets) pairs as a JSON object of arrays (generator of bytes chunks) '''
+        buf = [b'{']
+        size = 1
+        for idx, (key, synsets) in enumerate(items):
+            if idx:
+                buf.append(b',')
+            buf.append(self.encode(key))
+            buf.append(b':[')
+            size += len(buf[-2]) + 4
+            for sidx, ss in enumerate(synsets):
+                fragment = self.synset(ss)
+                if sidx:
+                    buf.append(b',')
+                buf.append(fragment)
+                size += len(fragment) + 1
+            buf.append(b']')
+            if size >= self.chunk_size:
+                yield b''.join(buf)
+                buf = []
+                size = 0
+        buf.append(b'}')
+        yield b''.join(buf)
+
+    def iter_lines(self, synsets, fields=None):
+        ''' Encode synsets as newline-delimited JSON (generator of bytes chunks)
+        fields -- keys to keep (None: all of them)
+        Lines are not cached, so a full export does not flush the synset cache
+        '''
+        buf = []
+        size = 0
+        for ss in synsets:
+            data = self.to_dict(ss)
+            if fields:
+                data = {k: data[k] for k in fields if k in data}
+            line = self.encode(data)
+            buf.append(line)
+            buf.append(b'\n')
+            size += len(line) + 1
+            if size >= self.chunk_size:
+                yield b''.join(buf)
+                buf = []
+                size = 0
+        if buf:
+            yield b''.join(buf)
+
+    def collection(self, synsets):
+        return b''.join(self.iter_collection(synsets))
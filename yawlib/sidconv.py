@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+Bulk synset ID conversion between WordNet SQLite (112345678),
+Gloss WordNet SQLite (n12345678) and canonical (12345678-n) formats
+Latest version can be found at https://github.com/letuananh/yawlib
+
+Usage:
+    >>> wnsql_to_canonical([112345678, 300001740])
+    ['12345678-n', '00001740-a']
+    >>> canonical_to_wnsql(numpy.array(['12345678-n', '00001740-a']))
+    array([112345678, 300001740])
+
+Lists are converted with plain arithmetic, NumPy arrays are converted
+as a whole (NumPy is only needed when NumPy arrays are given).
+WNSQL IDs are always returned as integers.
+
+@author: Le Tuan Anh <tuananh.ke@gmail.com>
+'''
+
+# Copyright (c) 2017, Le Tuan Anh <tuananh.ke@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+__author__ = "Le Tuan Anh <tuananh.ke@gmail.com>"
+__copyright__ = "Copyright 2017, yawlib"
+__credits__ = []
+__license__ = "MIT"
+__version__ = "0.1"
+__maintainer__ = "Le Tuan Anh"
+__email__ = "<tuananh.ke@gmail.com>"
+__status__ = "Prototype"
+
+########################################################################
+
+import re
+
+from .models import POS, SynsetID
+
+########################################################################
+
+BASE = SynsetID.WNSQL_BASE
+# POS code (1-6) <=> POS letter
+CODE2POS = dict(enumerate(POS.POSES, 1))
+POS2CODE = {p: c for c, p in CODE2POS.items()}
+CANONICAL_PATTERN = re.compile('([0-9]{{8}})-?([{}])'.format(POS.POSES))
+GWNSQL_PATTERN = re.compile('([{}])([0-9]{{8}})'.format(POS.POSES))
+
+########################################################################
+
+
+def _match_all(pattern, sids, fmt):
+    ''' Generate the groups of every synset ID, ValueError if one of them does not match pattern '''
+    for sid in sids:
+        m = pattern.fullmatch(sid) if isinstance(sid, str) else None
+        if m is None:
+            raise ValueError("Invalid {} synset ID: {!r}".format(fmt, sid))
+        yield m.groups()
+
+
+def is_ndarray(values):
+    ''' Check if values is a NumPy array (without importing NumPy) '''
+    return type(values).__name__ == 'ndarray' and type(values).__module__ == 'numpy'
+
+
+def wnsql_to_canonical(ids):
+    ''' [112345678, ...] => ['12345678-n', ...] '''
+    if is_ndarray(ids):
+        codes, offsets = _np_split_wnsql(ids)
+        return _np_format(offsets, codes, offset_col=0, pos_col=9, width=10, sep_col=8)
+    try:
+        return ['%08d-%s' % (i % BASE, CODE2POS[i // BASE]) for i in map(int, ids)]
+    except KeyError as e:
+        raise ValueError("Invalid WNSQL synset ID (POS number: {})".format(e))
+
+
+def wnsql_to_gwnsql(ids):
+    ''' [112345678, ...] => ['n12345678', ...] '''
+    if is_ndarray(ids):
+        codes, offsets = _np_split_wnsql(ids)
+        return _np_format(offsets, codes, offset_col=1, pos_col=0, width=9)
+    try:
+        return ['%s%08d' % (CODE2POS[i // BASE], i % BASE) for i in map(int, ids)]
+    except KeyError as e:
+        raise ValueError("Invalid WNSQL synset ID (POS number: {})".format(e))
+
+
+def wnsql_to_sids(ids):
+    ''' [112345678, ...] => [SynsetID('12345678-n'), ...] '''
+    if is_ndarray(ids):
+        codes, offsets = _np_split_wnsql(ids)
+        ids = ((offsets << SynsetID.POS_BITS) | codes).tolist()
+        return [SynsetID.from_packed(p) for p in ids]
+    return [SynsetID.from_string(i) for i in map(int, ids)]
+
+
+def sids_to_wnsql(sids):
+    ''' [SynsetID('12345678-n'), ...] => [112345678, ...] '''
+    mask, bits = SynsetID.POS_MASK, SynsetID.POS_BITS
+    return [(p & mask) * BASE + (p >> bits) for p in (sid.packed for sid in sids)]
+
+
+def canonical_to_wnsql(sids):
+    ''' ['12345678-n', ...] (or 12345678n) => [112345678, ...] '''
+    if is_ndarray(sids):
+        chars = _np_chars(sids, (9, 10))
+        # POS is the last non-empty character
+        pos = chars[:, 9].copy()
+        short = pos == 0
+        pos[short] = chars[short, 8]
+        if (chars[~short, 8] != ord('-')).any():
+            raise ValueError("Invalid canonical synset ID (separator)")
+        return _np_codes(pos) * BASE + _np_digits(chars[:, :8])
+    return [POS2CODE[p] * BASE + int(offset) for offset, p in _match_all(CANONICAL_PATTERN, sids, 'canonical')]
+
+
+def canonical_to_gwnsql(sids):
+    ''' ['12345678-n', ...] => ['n12345678', ...] '''
+    if is_ndarray(sids):
+        return wnsql_to_gwnsql(canonical_to_wnsql(sids))
+    return [p + offset for offset, p in _match_all(CANONICAL_PATTERN, sids, 'canonical')]
+
+
+def gwnsql_to_wnsql(sids):
+    ''' ['n12345678', ...] => [112345678, ...] '''
+    if is_ndarray(sids):
+        chars = _np_chars(sids, (9,))
+        return _np_codes(chars[:, 0]) * BASE + _np_digits(chars[:, 1:9])
+    return [POS2CODE[p] * BASE + int(offset) for p, offset in _match_all(GWNSQL_PATTERN, sids, 'GWNSQL')]
+
+
+def gwnsql_to_canonical(sids):
+    ''' ['n12345678', ...] => ['12345678-n', ...] '''
+    if is_ndarray(sids):
+        return wnsql_to_canonical(gwnsql_to_wnsql(sids))
+    return [offset + '-' + p for p, offset in _match_all(GWNSQL_PATTERN, sids, 'GWNSQL')]
+
+
+########################################################################
+# NumPy helpers (strings are processed as matrices of UCS-4 code points)
+########################################################################
+
+def _np_split_wnsql(ids):
+    import numpy as np
+    ids = np.asarray(ids).astype(np.int64)
+    codes, offsets = np.divmod(ids, BASE)
+    if len(codes) and (codes.min() < 1 or codes.max() > len(CODE2POS)):
+        raise ValueError("Invalid WNSQL synset ID (POS number out of range)")
+    return codes, offsets
+
+
+def _np_chars(sids, lengths):
+    ''' Unicode array => (n, 10) uint32 matrix
+    Every synset ID must have one of the given lengths (longer IDs would be truncated)
+    '''
+    import numpy as np
+    sids = np.asarray(sids)
+    if not sids.size:
+        return np.zeros((0, 10), dtype=np.uint32)
+    if sids.dtype.kind != 'U' or sids.ndim != 1:
+        raise ValueError("Synset IDs must be a 1-D array of strings")
+    if not np.isin(np.char.str_len(sids), lengths).all():
+        raise ValueError("Invalid synset ID length (expected {} characters)".format(' or '.join(map(str, lengths))))
+    sids = np.ascontiguousarray(sids, dtype='U10')
+    return sids.view(np.uint32).reshape(len(sids), 10)
+
+
+def _np_digits(chars):
+    ''' (n, 8) matrix of digit code points => int64 array '''
+    import numpy as np
+    digits = chars.astype(np.int64) - ord('0')
+    if digits.size and (digits.min() < 0 or digits.max() > 9):
+        raise ValueError("Invalid synset offset")
+    return digits @ (10 ** np.arange(7, -1, -1, dtype=np.int64))
+
+
+def _np_codes(pos_chars):
+    ''' POS letters (code points) => POS codes '''
+    import numpy as np
+    table = np.zeros(128, dtype=np.int64)
+    for p, c in POS2CODE.items():
+        table[ord(p)] = c
+    codes = table[np.minimum(pos_chars, 127)]
+    if codes.size and codes.min() == 0:
+        raise ValueError("Invalid POS")
+    return codes
+
+
+def _np_format(offsets, codes, offset_col, pos_col, width, sep_col=None):
+    ''' Write 8 zero-padded offset digits and a POS letter into a (n, width) code point matrix '''
+    import numpy as np
+    letters = np.array([0] + [ord(p) for p in POS.POSES], dtype=np.uint32)
+    chars = np.zeros((len(offsets), width), dtype=np.uint32)
+    powers = 10 ** np.arange(7, -1, -1, dtype=np.int64)
+    chars[:, offset_col:offset_col + 8] = offsets[:, None] // powers % 10 + ord('0')
+    chars[:, pos_col] = letters[codes]
+    if sep_col is not None:
+        chars[:, sep_col] = ord('-')
+    return chars.view('U{}'.format(width)).ravel()
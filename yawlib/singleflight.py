@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+Single-flight call coalescing: concurrent calls with the same key share one computation
+Latest version can be found at https://github.com/letuananh/yawlib
+
+Usage:
+    flight = SingleFlight('lookups')
+    flight.do(('lemma', 'love'), wsql.get_synsets_by_lemma, 'love')
+
+    class MyDAO:
+        @single_flight('mydao')
+        def get_something(self, key): ...
+
+    # asyncio
+    aflight = AsyncSingleFlight('lookups')
+    await aflight.do(key, coroutine_function, *args)
+
+Results are not cached: a call which starts after the shared computation has
+finished runs again. The caller which ran the computation gets its result,
+waiting callers get a deep copy (so they can modify it) and, on errors, a new
+exception of the same type chained from the original one.
+
+@author: Le Tuan Anh <tuananh.ke@gmail.com>
+'''
+
+# Copyright (c) 2017, Le Tuan Anh <tuananh.ke@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+__author__ = "Le Tuan Anh <tuananh.ke@gmail.com>"
+__copyright__ = "Copyright 2017, yawlib"
+__credits__ = []
+__license__ = "MIT"
+__version__ = "0.1"
+__maintainer__ = "Le Tuan Anh"
+__email__ = "<tuananh.ke@gmail.com>"
+__status__ = "Prototype"
+
+########################################################################
+
+import copy
+import asyncio
+import threading
+from functools import wraps
+
+from .metrics import REGISTRY
+
+########################################################################
+
+CALLS = REGISTRY.counter('yawlib_singleflight_calls_total', 'Calls which went through a single-flight group', ('group',))
+COALESCED = REGISTRY.counter('yawlib_singleflight_coalesced_total', 'Calls which waited for an identical in-flight call', ('group',))
+
+########################################################################
+
+
+def follower_error(error):
+    ''' New exception for a waiting caller (raise it from error), the leader's one is not shared '''
+    try:
+        fresh = copy.copy(error)
+    except Exception:
+        fresh = None
+    if type(fresh) is not type(error):
+        fresh = RuntimeError("Shared call failed: {!r}".format(error))
+    return fresh
+
+
+class _Call(object):
+
+    __slots__ = ('event', 'result', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight(object):
+    ''' Coalesce concurrent calls with the same key (thread variant) '''
+
+    def __init__(self, name='default', copy_result=copy.deepcopy):
+        ''' copy_result -- copies the result for each waiting caller (None: results are immutable and shared) '''
+        self.name = name
+        self.copy_result = copy_result
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._total = CALLS.labels(name)
+        self._coalesced = COALESCED.labels(name)
+
+    def do(self, key, func, *args):
+        ''' Call func(*args), or wait for the in-flight call with the same key and share its result '''
+        self._total.inc()
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            self._coalesced.inc()
+            call.event.wait()
+            if call.error is not None:
+                raise follower_error(call.error) from call.error
+            return call.result if self.copy_result is None else self.copy_result(call.result)
+        try:
+            call.result = func(*args)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+    def __len__(self):
+        ''' Number of in-flight calls '''
+        return len(self._calls)
+
+
+class AsyncSingleFlight(object):
+    ''' Coalesce concurrent calls with the same key (asyncio variant)
+
+    The shared computation runs as a task, so it is not cancelled when
+    one of the waiting callers is cancelled.
+    '''
+
+    def __init__(self, name='default', copy_result=copy.deepcopy):
+        self.name = name
+        self.copy_result = copy_result
+        self._tasks = {}
+        self._total = CALLS.labels(name)
+        self._coalesced = COALESCED.labels(name)
+
+    async def do(self, key, func, *args):
+        ''' Await func(*args) (a coroutine function), or the in-flight call with the same key '''
+        self._total.inc()
+        task = self._tasks.get(key)
+        if task is None:
+            task = self._tasks[key] = asyncio.ensure_future(func(*args))
+            task.add_done_callback(lambda _: self._tasks.pop(key, None))
+            return await asyncio.shield(task)
+        self._coalesced.inc()
+        try:
+            result = await asyncio.shield(task)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            raise follower_error(e) from e
+        return result if self.copy_result is None else self.copy_result(result)
+
+    def __len__(self):
+        return len(self._tasks)
+
+
+def single_flight(group, copy_result=copy.deepcopy):
+    ''' Decorator which coalesces concurrent calls of a method with the same (hashable) arguments
+    Calls with keyword arguments or unhashable arguments (e.g. a list of IDs) are not coalesced
+    '''
+    flight = SingleFlight(group, copy_result)
+
+    def decorator(func):
+        method = func.__name__
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if kwargs:
+                return func(*args, **kwargs)
+            key = (method,) + args
+            try:
+                hash(key)
+            except TypeError:
+                return func(*args)
+            return flight.do(key, func, *args)
+        wrapper.flight = flight
+        return wrapper
+    return decorator
@@ -53,65 +53,127 @@ __email__ = "<tuananh.ke@gmail.com>"
 __status__ = "Prototype"
 
 import sys
+import signal
 import os.path
+import time
+import itertools
+import csv
+import sqlite3
+import hashlib
 import argparse
 import logging
-from lxml import etree
+from collections import deque
 from collections import defaultdict as dd
 from collections import namedtuple
-
-from chirptext.leutile import Counter, Timer, header, FileHelper
+from collections import OrderedDict
+from collections import Counter as CharCounter
 
 from .helpers import config_logging, add_logging_config
 from .helpers import add_wordnet_config
 from .helpers import show_info
-from .helpers import get_gwn, get_gwnxml
+from .helpers import get_gwn, get_gwnxml, get_wn
+from .helpers import glosstag_files, MOCKUP_SYNSETS_DATA
 from .helpers import get_synset_by_id, get_synset_by_sk, get_synsets_by_term
-from .glosswordnet import Gloss
-from .wordnetsql import WordnetSQL as WSQL
+from .config import YLConfig
+from .models import SynsetCollection
+from .sidconv import gwnsql_to_canonical, canonical_to_gwnsql
 
 logger = logging.getLogger()
+_NOT_LOADED = object()
+fuzz = _NOT_LOADED  # fuzzywuzzy is imported on first use (see get_fuzz())
+
+
+def get_fuzz():
+    ''' fuzzywuzzy.fuzz, or None when fuzzywuzzy is not installed '''
+    global fuzz
+    if fuzz is _NOT_LOADED:
+        try:
+            from fuzzywuzzy import fuzz
+        except Exception as e:
+            logger.warning("fuzzywuzzy is not installed")
+            fuzz = None
+    return fuzz
 
-try:
-    from fuzzywuzzy import fuzz
-except Exception as e:
-    logger.warning("fuzzywuzzy is not installed")
-    pass
 #-----------------------------------------------------------------------
 # CONFIGURATION
 #-----------------------------------------------------------------------
 # >>> WARNING: Do NOT change these values here. Change config.py instead!
 #
 
-GLOSSTAG_NTUMC_OUTPUT = FileHelper.abspath('data/glosstag_ntumc')
-GLOSSTAG_PATCH = FileHelper.abspath('data/glosstag_patch.xml')
-MISALIGNED = FileHelper.abspath('data/misaligned.xml')
+GLOSSTAG_NTUMC_OUTPUT = os.path.abspath('data/glosstag_ntumc')
+GLOSSTAG_PATCH = os.path.abspath('data/glosstag_patch.xml')
+MISALIGNED = os.path.abspath('data/misaligned.xml')
+NTUMC_BUFFER_SIZE = 1 << 20  # output file buffer (bytes)
+SPLITS_SETUP_SCRIPT = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'glosswordnet', 'script', 'gwn_splits.sql')
+SPLITS_BATCH_SIZE = 500  # synsets loaded from / sentences read from Gloss WordNet DB at a time
+SPLITS_ORDER = 'substr(sid, 2), substr(sid, 1, 1), ord'  # canonical synset ID order
+SPLITS_TABLES = ('gloss_sent', 'glossitem_offset', 'gloss_sent_tag', 'synset_patch')
+BUILD_SETUP_SCRIPT = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'glosswordnet', 'script', 'gwn_build.sql')
+BUILD_BATCH_SIZE = 1000  # synsets imported per transaction (checkpoint)
+BATCH_CHUNK_SIZE = 1000  # queries resolved at a time by wntk batch
+PATCH_SETUP_SCRIPT = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'glosswordnet', 'script', 'gwn_patch.sql')
+# synsets overridden by GlossTagPatch (other synsets in the patch file are ignored)
+GLOSSTAG_PATCHED = ('01179767-a', '00022401-r', '00100506-a', '00710741-a', '01846815-a', '02171024-a', '02404081-a', '02773862-a', '00515154-v', '00729109-v', '00781000-v', '01572728-v', '01593254-v', '01915365-v', '02162162-v', '02655135-v', '02711114-v', '00442115-n', '01219722-n', '07192129-n', '13997529-n', '14457976-n', '00781000-v', '02655135-v')
 
 #-----------------------------------------------------------------------
 
 
 class GlossTagPatch:
-    def __init__(self):
-        self.patched = ['01179767-a', '00022401-r', '00100506-a', '00710741-a', '01846815-a', '02171024-a', '02404081-a', '02773862-a', '00515154-v', '00729109-v', '00781000-v', '01572728-v', '01593254-v', '01915365-v', '02162162-v', '02655135-v', '02711114-v', '00442115-n', '01219722-n', '07192129-n', '13997529-n', '14457976-n', '00781000-v', '02655135-v']
-        xmlwn = XMLGWordNet()
-        xmlwn.read(GLOSSTAG_PATCH)
-        self.synsets = xmlwn.synsets
+    def __init__(self, path=GLOSSTAG_PATCH):
+        self.patched = list(GLOSSTAG_PATCHED)
+        self.digest = patch_digest(path, self.patched)
+        self.synsets = SynsetCollection()
         self.synset_map = {}
-        for ss in self.synsets:
-            self.synset_map[ss.get_synsetid()] = ss
-        pass
+        self.digests = {}  # synset ID => SHA-1 of its element (patched synsets only)
+        for ss, digest in iter_xml_synsets(path):
+            self.synsets.add(ss)
+            self.synset_map[str(ss.sid)] = ss
+            if str(ss.sid) in self.patched:
+                self.digests[str(ss.sid)] = digest
+
+
+def iter_xml_synsets(path):
+    ''' Generate (synset, SHA-1 of its element) from a Gloss WordNet XML (or GlossTag patch) file '''
+    from lxml import etree
+    from .glosswordnet import GWordnetXML
+    xmlwn = GWordnetXML()
+    with open(path, 'rb') as infile:
+        for event, element in etree.iterparse(infile):
+            if element.tag == 'synset':
+                digest = hashlib.sha1(etree.tostring(element)).hexdigest()
+                ss = xmlwn.parse_synset(element)
+                element.clear()
+                yield ss, digest
+
+
+def patch_digest(path, patched):
+    ''' SHA-1 of a GlossTag patch file and the list of patched synsets '''
+    sha = file_sha1(path)
+    sha.update(' '.join(sorted(set(patched))).encode('utf-8'))
+    return sha.hexdigest()
+
+
+def file_sha1(path):
+    sha = hashlib.sha1()
+    with open(path, 'rb') as infile:
+        for block in iter(lambda: infile.read(1 << 16), b''):
+            sha.update(block)
+    return sha
 
 
 def cache_all_synsets(wng_db_loc):
     ''' Cache all Gloss Synset (SQLite) to database
     '''
+    from chirptext.leutile import Timer
+    from .glosswordnet import GWordnetSQLite
+    from .wordnetsql import WordnetSQL as WSQL
     t = Timer()
     t.start("Caching synsets")
-    db = SQLiteGWordNet(wng_db_loc)
+    db = GWordnetSQLite(wng_db_loc)
     synsets = db.all_synsets()
     t.end("Done caching")
 
-    db = WSQL(WORDNET_30_PATH)
+    db = WSQL(YLConfig.WNSQL30_PATH)
     t.start("Start caching stuff ...")
     # This should take less than 5 secs to run
     db.cache_all_sensekey()
@@ -125,16 +187,19 @@ def cache_all_synsets(wng_db_loc):
 def mockup_synsets():
     ''' Retrieve mockup synsets from ./data/test.xml
     '''
-    xmlwn = XMLGWordNet()
-    xmlwn.read(MOCKUP_SYNSETS_DATA)
+    from .glosswordnet import GWordnetXML
+    xmlwn = GWordnetXML(MOCKUP_SYNSETS_DATA)
     synsets = xmlwn.synsets
     return synsets
 
 def test_skmap_gwn_wn30():
     ''' Comparing sensekeys between GWN and WN30SQLite
     '''
-    gwn = SQLiteGWordNet(wng_db_loc)
-    wn = WSQL(WORDNET_30_PATH)
+    from chirptext.leutile import Counter, Timer
+    from .glosswordnet import GWordnetSQLite
+    from .wordnetsql import WordnetSQL as WSQL
+    gwn = GWordnetSQLite(wng_db_loc)
+    wn = WSQL(YLConfig.WNSQL30_PATH)
 
     t = Timer()
     t.start('Caching WN30 sensekey map')
@@ -205,7 +270,7 @@ MANUAL_SPLIT = {
 def split_gloss(ss, expected_length):
     """ Split gloss (raw text) into many sentences
     """
-    sid = ss.get_synsetid()
+    sid = str(ss.sid)
     if sid in MANUAL_SPLIT:
         return MANUAL_SPLIT[sid]
 
@@ -244,6 +309,7 @@ def split_gloss(ss, expected_length):
 def combine_glosses(orig_glosses, ssid = None):
     ''' Combine wrongly split glosses 
     '''
+    from .glosswordnet import Gloss
     if ssid in [ '00022401-r', '00098147-a' ]:
         # ignore these synsets
         return orig_glosses
@@ -282,42 +348,167 @@ def combine_glosses(orig_glosses, ssid = None):
 
     return [ g ] + exs
 
-SplitData = namedtuple('SplitData', ['ss', 'sents', 'glosses', 'aligned'])
+# aligned -- (sentence, gloss) pairs in sentence order, sent_ids -- index of the sentence of each pair
+SplitData = namedtuple('SplitData', ['ss', 'sents', 'glosses', 'aligned', 'sent_ids'])
 
-def prepare_for_ntumc(ss, glpatch=None):
-    """ Split glosses into sentences (for importing into NTU-MC)
+ALIGN_THRESHOLD = 80        # fuzz.ratio() of an aligned (sentence, gloss) pair must be above this
+ALIGN_POOL_THRESHOLD = 1000  # fewer synsets are aligned in-process
+ALIGN_CHUNK_SIZE = 128
+
+
+def gloss_text(gl):
+    ''' Text of a gloss as it is compared to raw gloss sentences '''
+    return ' '.join([x.text for x in gl.items]).replace(';', '')
+
+
+def ratio_bound(a, b, bag_a=None, bag_b=None):
+    ''' Upper bound of fuzz.ratio(a, b) (length first, then common characters)
+    bag_a, bag_b -- precomputed CharCounter of a and b
+    '''
+    total = len(a) + len(b)
+    if not total:
+        return 100
+    bound = round(200 * min(len(a), len(b)) / total)
+    if bound <= ALIGN_THRESHOLD:
+        return bound
+    common = (bag_a or CharCounter(a)) & (bag_b or CharCounter(b))
+    return round(200 * sum(common.values()) / total)
+
+
+def match_score(sent, gltext, bags=None):
+    ''' fuzz.ratio() of a sentence and a gloss text, 0 when they cannot be aligned
+    bags -- CharCounter of sent and gltext, to skip fuzz.ratio() when ratio_bound() is too low
+    (worth it for unlikely pairs)
+    '''
+    if sent == gltext:
+        return 100
+    if bags and ratio_bound(sent, gltext, *bags) <= ALIGN_THRESHOLD:
+        return 0
+    score = get_fuzz().ratio(sent, gltext)
+    return score if score > ALIGN_THRESHOLD else 0
+
+
+def align_sents(sents, gltexts):
+    ''' Align raw gloss sentences to gloss texts
+    Return a list of (sentence index, gloss index, score), ordered by sentence
+
+    Each gloss is aligned to at most one sentence and the assignment with the highest
+    total score is picked (glosses are not always in the same order as the sentences)
+    '''
+    if get_fuzz() is None:
+        return [(idx, idx, None) for idx in range(min(len(sents), len(gltexts)))]
+    if len(sents) == len(gltexts):
+        # most synsets are split correctly
+        diagonal = [match_score(sent, gltext) for sent, gltext in zip(sents, gltexts)]
+        if all(diagonal):
+            return [(idx, idx, score) for idx, score in enumerate(diagonal)]
+    # candidate glosses of each sentence, the best ones first
+    candidates = []
+    glbags = [CharCounter(gltext) for gltext in gltexts]
+    for sent in sents:
+        bag = CharCounter(sent)
+        scores = ((match_score(sent, gltext, (bag, glbag)), j) for j, (gltext, glbag) in enumerate(zip(gltexts, glbags)))
+        candidates.append(sorted(((score, j) for score, j in scores if score), reverse=True))
+    memo = {}
+
+    def best(i, used):
+        ''' best (total score, matches) of sents[i:] when glosses in used (a bitmask) are taken '''
+        if i == len(sents):
+            return (0, ())
+        if (i, used) not in memo:
+            result = None
+            for score, j in candidates[i]:
+                if not used & (1 << j):
+                    total, matches = best(i + 1, used | (1 << j))
+                    if result is None or total + score > result[0]:
+                        result = (total + score, ((i, j, score),) + matches)
+            # leave sents[i] unaligned (on ties, earlier sentences are aligned first)
+            skipped = best(i + 1, used)
+            if result is None or skipped[0] > result[0]:
+                result = skipped
+            memo[(i, used)] = result
+        return memo[(i, used)]
+    return list(best(0, 0)[1])
+
+
+def _align_job(job):
+    return align_sents(*job)
+
+
+def split_for_ntumc(ss, glpatch=None):
+    """ Split raw gloss into sentences and combine glosses to match them
+    Return (ss, sents, glosses)
     """
-    if glpatch and ss.get_synsetid() in glpatch.patched:
-        ss = glpatch.synset_map[ss.get_synsetid()]
+    if glpatch and str(ss.sid) in glpatch.digests:
+        # patched and found in the patch file
+        ss = glpatch.synset_map[str(ss.sid)]
 
     sents = split_gloss(ss, len(ss.glosses))
     glosses = ss.glosses
     if len(glosses) != len(sents):
         # try to combine glosses smartly
-        glosses = combine_glosses(ss.glosses, ss.get_synsetid())
+        glosses = combine_glosses(ss.glosses, str(ss.sid))
         if len(glosses) != len(sents) and len(glosses) == len(ss.glosses):
             # need to relax split_gloss method a bit
             sents = split_gloss(ss, len(ss.glosses))
+    return ss, sents, glosses
+
 
+def to_split_data(ss, sents, glosses, matches):
+    aligned = [(sents[i], glosses[j]) for i, j, _ in matches]
+    if len(aligned) < len(sents):
+        logging.error("Invalid alignment in synset %s" % (ss.sid,))
+    return SplitData(ss, sents, glosses, aligned, [i for i, _, _ in matches])
+
+
+def prepare_for_ntumc(ss, glpatch=None):
+    """ Split glosses into sentences (for importing into NTU-MC)
+    """
+    ss, sents, glosses = split_for_ntumc(ss, glpatch)
+    return to_split_data(ss, sents, glosses, align_sents(sents, [gloss_text(gl) for gl in glosses]))
+
+
+def align_synsets(synsets, glpatch=None, processes=None, c=None):
+    """ prepare_for_ntumc() for many synsets (generator of SplitData, in order)
+    Sentences are aligned by a process pool when there are many synsets.
+    Synsets, sentences and misaligned synsets are counted in c (a Counter) if provided
+    """
+    from multiprocessing import Pool
+    splits = deque()
+
+    def jobs():
+        for ss in synsets:
+            split = split_for_ntumc(ss, glpatch)
+            splits.append(split)
+            yield (split[1], [gloss_text(gl) for gl in split[2]])
+
+    if (processes or os.cpu_count()) == 1 or (hasattr(synsets, '__len__') and len(synsets) < ALIGN_POOL_THRESHOLD):
+        results = map(_align_job, jobs())
+        pool = None
+    else:
+        pool = Pool(processes)
+        results = pool.imap(_align_job, jobs(), ALIGN_CHUNK_SIZE)
     try:
-        aligned = []
-        for (sent, gl) in zip(sents, glosses):
-            gltext = ' '.join([ x.text for x in gl.items ]).replace(';', '')
-            if fuzz.ratio(sent, gltext) > 80:
-                aligned.append((sent, gl))
-            else:
-                for gl in glosses:
-                    gltext = ' '.join([ x.text for x in gl.items ]).replace(';', '')
-                    if fuzz.ratio(sent, gltext) > 80:
-                        aligned.append((sent, gl))
-                        break
-        if len(aligned) < len(sents):
-            logging.error("Invalid alignment in synset %s" % (ss.get_synset_by_id(),))
-    except Exception as e:
-        aligned = list(zip(sents, glosses))
-        pass
-            
-    return SplitData(ss, sents, glosses, aligned)
+        for matches in results:
+            data = to_split_data(*splits.popleft(), matches)
+            if c is not None:
+                c.count("synsets")
+                c.update({"sentences": len(data.sents), "aligned": len(data.aligned)})
+                if len(data.aligned) < len(data.sents):
+                    c.count("misaligned synsets")
+            yield data
+    finally:
+        if pool is not None:
+            pool.terminate()
+
+
+def alignment_report(c, elapsed):
+    ''' Throughput and misalignment rate of align_synsets() '''
+    synsets = c["synsets"]
+    return "%s synsets (%s sentences) aligned in %.2fs (%.0f synsets/s) | misaligned: %s (%.2f%%)" % (
+        synsets, c["sentences"], elapsed, synsets / elapsed if elapsed else 0,
+        c["misaligned synsets"], 100.0 * c["misaligned synsets"] / synsets if synsets else 0)
+
 
 def dev_mode(wng_db_loc, mockup=True):
     ''' Just a dummy method for quick calling
@@ -332,57 +523,61 @@ def dev_mode(wng_db_loc, mockup=True):
 
 
 def glosstag2txt(wng_db_loc):
+    from .glosswordnet import GWordnetSQLite
     print("glosstag")
-    gwn = SQLiteGWordNet(wng_db_loc)
+    gwn = GWordnetSQLite(wng_db_loc)
     synsets = gwn.all_synsets()
     print("Synset count: %s" % (len(synsets),))
 
 def fix_misalignment():
-    xmlwn = XMLGWordNet()
+    from .glosswordnet import GWordnetXML
+    xmlwn = GWordnetXML()
     xmlwn.read(MISALIGNED)
     synsets = xmlwn.synsets
     glpatch = GlossTagPatch()
     with open('data/temp.txt', 'w') as outfile:
         for ss in synsets:
-            outfile.write("Synset ID: %s\n" % (ss.get_synsetid(),))
-            (ss,sents,glosses, aligned) = prepare_for_ntumc(ss, glpatch)
+            outfile.write("Synset ID: %s\n" % (str(ss.sid),))
+            (ss, sents, glosses, aligned, _) = prepare_for_ntumc(ss, glpatch)
             outfile.write('RAW: %s' % (ss.raw_glosses[0].gloss))
             invalid = False
             for sent, gl in aligned:
-                gltext = ' '.join([ x.text for x in gl.items ]).replace(';', '')
-                match_score = fuzz.ratio(sent, gltext)
+                gltext = gloss_text(gl)
+                match_score = get_fuzz().ratio(sent, gltext)
                 outfile.write('    [%s] %s -- %s\n' % (match_score, sent, gl.items))
                 if match_score < 80:
-                    outfile.write("WARNING [%s]: %s >><< %s\n" % (ss.get_synsetid(), sent, gltext))
+                    outfile.write("WARNING [%s]: %s >><< %s\n" % (str(ss.sid), sent, gltext))
             outfile.write('\n--\n')
         
     print("%s synsets to be fixed" % (len(synsets)))
     print("See data/temp.txt for more information")
 
-def test_alignment(wng_db_loc, mockup=True):
+def test_alignment(wng_db_loc, mockup=True, processes=None):
+    from chirptext.leutile import Counter, Timer
+    from .glosswordnet import GWordnetSQLite
+    from .wordnetsql import WordnetSQL as WSQL
     t = Timer()
     t.start("Cache all SQLite synsets")
     if mockup:
-        xmlwn = XMLGWordNet()
-        xmlwn.read(MOCKUP_SYNSETS_DATA)
-        synsets = xmlwn.synsets
+        synsets = mockup_synsets()
     else:
-        logging.info("Using SQLiteGWordNet (%s)" % (WORDNET_30_PATH))
-        db = WSQL(WORDNET_30_PATH)
-        gwn = SQLiteGWordNet(wng_db_loc)
+        logging.info("Using SQLiteGWordNet (%s)" % (YLConfig.WNSQL30_PATH))
+        db = WSQL(YLConfig.WNSQL30_PATH)
+        gwn = GWordnetSQLite(wng_db_loc)
         synsets = gwn.all_synsets()
     t.end("Done caching")
     
     c = Counter()
+    ac = Counter()
+    t.start("Aligning sentences")
     with open("data/WRONG_SPLIT.txt", 'w') as wrong, open('data/SYNSET_TO_FIX.txt', 'w') as sslist, open('data/INVALID_ALIGNMENT.txt', 'w') as invalidfile:
         glpatch = GlossTagPatch()
         invalid_synsets = set()
-        for ss in synsets:
+        for (ss, sents, glosses, aligned, _) in align_synsets(synsets, glpatch, processes, ac):
             orig_glosses = [ x.text() for x in ss.glosses ]
-            (ss,sents,glosses, aligned) = prepare_for_ntumc(ss, glpatch)
             if len(sents) != len(glosses):
-                sslist.write("%s\n" % (ss.get_synsetid()))
-                wrong.write("[%s] -- %s\n" % (ss.get_synsetid(), ss.raw_glosses[0].gloss,))
+                sslist.write("%s\n" % (str(ss.sid)))
+                wrong.write("[%s] -- %s\n" % (str(ss.sid), ss.raw_glosses[0].gloss,))
                 wrong.write("len(sents) = %s\n" % (len(sents)))
                 for idx, part in enumerate(sents):
                     wrong.write("    -- %s: %s\n" % (str(idx).rjust(3), part,))
@@ -394,23 +589,20 @@ def test_alignment(wng_db_loc, mockup=True):
                     wrong.write('    |  %s: %s\n' % (str(idx).rjust(3), gl.items,))
 
                 c.count("WRONG")
-                wrong.write("'%s' : %s\n\n" % (ss.get_synsetid(), sents,))
+                wrong.write("'%s' : %s\n\n" % (str(ss.sid), sents,))
             else:
                 c.count("OK")
-            # check word alignment
-            invalid = False
-            for sent, gl in aligned:
-                gltext = ' '.join([ x.text for x in gl.items ]).replace(';', '')
-                if fuzz.ratio(sent, gltext) < 80:
-                    print("WARNING [%s]: %s >><< %s" % (ss.get_synsetid(), sent, gltext))
-                    invalid = True
-            if invalid:
-                invalid_synsets.add(ss.get_synsetid())
-                invalidfile.write('%s\n' % (ss.get_synsetid(), ))
+            # check sentence alignment (aligned pairs always score above ALIGN_THRESHOLD)
+            if len(aligned) < len(sents):
+                print("WARNING [%s]: %s of %s sentences could not be aligned" % (str(ss.sid), len(sents) - len(aligned), len(sents)))
+                invalid_synsets.add(str(ss.sid))
+                invalidfile.write('%s\n' % (str(ss.sid), ))
                 invalidfile.write('Split raw gloss : \t%s\n' % (sents,))
                 invalidfile.write('Orig glosses    : \t%s\n' % (orig_glosses,))
                 invalidfile.write('Combined glosses: \t%s\n--\n\n' % ([ x.text() for x in glosses ],))
         invalidfile.write("\n\ninvalid_synsets=%s" % (invalid_synsets,))
+    t.end()
+    print(alignment_report(ac, t.exec_time()))
     c.summarise()
     if c['WRONG'] > 0:
         print("See data/SYNSET_TO_FIX.txt and data/WRONG_SPLIT.txt for more information")
@@ -419,13 +611,15 @@ def test_alignment(wng_db_loc, mockup=True):
     
     print("Done!")
 
+Word = namedtuple("Word", "data cfrom cto")
+AnnotatedSentence = namedtuple("AnnotatedSentence", "sent words")
+
+
 def smart_search(sentence, words, getitem=lambda x:x):
     ''' Link tokenized words back to original sentence
     '''
     pos = 0
     prob = False
-    Word = namedtuple("Word", "data cfrom cto")
-    AnnotatedSentence = namedtuple("AnnotatedSentence", "sent words")
     asent = AnnotatedSentence(sentence, [])
     for wid, word in enumerate(words):
         word_text = getitem(word)
@@ -449,141 +643,496 @@ def smart_search(sentence, words, getitem=lambda x:x):
 #--------------------------------------------------------
 
 
+def run_script(conn, path):
+    with open(path) as script:
+        conn.executescript(script.read())
+
+
+def build_gwn(gwn, files, batch_size=BUILD_BATCH_SIZE, force=False):
+    ''' Import Gloss WordNet XML files into a Gloss WordNet DB incrementally
+
+    Files whose content did not change since the last build are not parsed, only synsets
+    whose element changed are replaced and synsets which are gone are removed (see gwn_build.sql).
+    Synsets are committed batch_size at a time, an interrupted build resumes from the last batch.
+    Patches applied to replaced synsets are dropped from patch_log (see apply_patch()).
+    force -- drop all tables and import everything
+    Return (number of parsed files, number of inserted, replaced or removed synsets)
+    '''
+    from .glosswordnet.sqlitedao import SETUP_SCRIPT as GWN_SETUP_SCRIPT
+    conn = sqlite3.connect(gwn.db_path, isolation_level=None)
+    try:
+        if force or not conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='synset'").fetchone():
+            run_script(conn, GWN_SETUP_SCRIPT)
+        run_script(conn, BUILD_SETUP_SCRIPT)
+        run_script(conn, PATCH_SETUP_SCRIPT)
+        if force:
+            for table in ('build_file', 'build_synset', 'patch_log'):
+                conn.execute('DELETE FROM %s' % (table,))
+            if conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='gloss_build'").fetchone():
+                conn.execute("DELETE FROM gloss_build WHERE name = 'splits'")
+        build = conn.execute('INSERT INTO build_log (files, synsets) VALUES (0, 0)').lastrowid
+        built = dict(conn.execute('SELECT path, digest FROM build_file'))
+        parsed = changed = 0
+        for path in files:
+            path = os.path.abspath(path)
+            digest = file_sha1(path).hexdigest()
+            if built.get(path) == digest:
+                continue
+            logger.info("Importing %s" % (path,))
+            stored = dict(conn.execute('SELECT sid, digest FROM build_synset WHERE file = ?', (path,)))
+            seen = set()
+            batch = []
+            for ss, ss_digest in iter_xml_synsets(path):
+                sid = ss.sid.to_gwnsql()
+                seen.add(sid)
+                if stored.get(sid) != ss_digest:
+                    batch.append((sid, ss, ss_digest))
+                    if len(batch) >= batch_size:
+                        changed += _import_synsets(conn, gwn, build, path, batch)
+                        batch = []
+            changed += _import_synsets(conn, gwn, build, path, batch)
+            removed = [sid for sid, ss_digest in stored.items() if ss_digest is not None and sid not in seen]
+            conn.execute('BEGIN IMMEDIATE')
+            gwn.delete_synsets(conn, removed)
+            conn.executemany('UPDATE build_synset SET digest = NULL, build = ? WHERE sid = ?', [(build, sid) for sid in removed])
+            conn.execute('INSERT OR REPLACE INTO build_file (path, digest) VALUES (?, ?)', (path, digest))
+            conn.execute('COMMIT')
+            parsed += 1
+            changed += len(removed)
+        conn.execute('UPDATE build_log SET finished = CURRENT_TIMESTAMP, files = ?, synsets = ? WHERE id = ?', (parsed, changed, build))
+        return parsed, changed
+    except Exception:
+        if conn.in_transaction:
+            conn.execute('ROLLBACK')
+        raise
+    finally:
+        conn.close()
+
+
+def _import_synsets(conn, gwn, build, path, batch):
+    ''' Replace a batch of (sid, synset, digest) in one transaction '''
+    if not batch:
+        return 0
+    conn.execute('BEGIN IMMEDIATE')
+    gwn.replace_synsets(conn, [ss for _, ss, _ in batch])
+    conn.executemany('INSERT OR REPLACE INTO build_synset (sid, file, digest, build) VALUES (?, ?, ?, ?)',
+                     [(sid, path, digest, build) for sid, _, digest in batch])
+    conn.executemany('DELETE FROM patch_log WHERE sid = ?', [(sid,) for sid, _, _ in batch])
+    conn.execute('COMMIT')
+    return len(batch)
+
+
 def convert(args):
-    ''' Convert Gloss WordNet XML into SQLite format
+    ''' Convert Gloss WordNet XML into SQLite format (only changed synsets are imported, see build_gwn())
     '''
+    from chirptext.leutile import Timer, header
     show_info(args)
 
-    if os.path.isfile(args.glossdb) and os.path.getsize(args.glossdb) > 0:
+    if args.force and os.path.isfile(args.glossdb) and os.path.getsize(args.glossdb) > 0:
         print("DB file exists (%s | size: %s)" % (args.glossdb, os.path.getsize(args.glossdb)))
         answer = input("If you want to overwrite this file, please type CONFIRM: ")
         if answer != "CONFIRM":
             print("Script aborted!")
             exit()
-    db = get_gwn(args)
+    files = args.mockup_files if args.mockup else glosstag_files(os.path.join(args.gloss_xml, 'merged'))
     header('Importing data from XML to SQLite')
     t = Timer()
-    header("Extracting Gloss WordNet (XML)")
-    xmlgwn = get_gwnxml(args)
-    header("Inserting data into SQLite database")
     t.start()
-    db.insert_synsets(xmlgwn.synsets)
+    parsed, changed = build_gwn(get_gwn(args), files, args.batch, args.force)
     t.end('Insertion completed.')
-    pass
+    print("%s files parsed, %s synsets imported or removed in %.2fs" % (parsed, changed, t.exec_time()))
+
+
+NTUMC_USER = 'letuananh'
+NTUMC_IGNORED_SK = 'purposefully_ignored%0:00:00::'
+NTUMC_BATCH_SIZE = 10000  # rows inserted per executemany()
+NTUMC_COLUMNS = OrderedDict([
+    ('corpus', ('corpusID', 'corpus', 'title', 'language')),
+    ('doc', ('docid', 'doc', 'title', 'url', 'subtitle', 'corpusID')),
+    ('sent', ('sid', 'docID', 'pid', 'sent', 'comment', 'usrname')),
+    ('word', ('sid', 'wid', 'word', 'pos', 'lemma', 'cfrom', 'cto', 'comment', 'usrname')),
+    ('concept', ('sid', 'cid', 'clemma', 'tag', 'tags', 'comment', 'ntag', 'usrname')),
+    ('cwl', ('sid', 'wid', 'cid', 'usrname'))])
+NTUMC_CORPUS = (100, 'misc', 'Miscellaneous', 'eng')
+NTUMC_DOC = (1000, 'glosstag', 'WordNet with Semantically Tagged Glosses', 'http://wordnet.princeton.edu/glosstag.shtml', '', 100)
+
 
+def get_sk_map(gwn):
+    ''' sensekey => canonical synset ID of a Gloss WordNet (SQLite), None if a key belongs to many synsets '''
+    sk_map = {}
+    rows = gwn.get_all_sensekeys()
+    for row, sid in zip(rows, gwnsql_to_canonical([row.sid for row in rows])):
+        sk_map[row.sensekey] = sid if sk_map.get(row.sensekey, sid) == sid else None
+    return sk_map
 
-def export_ntumc(wng_loc, wng_db_loc, mockup=False):
+
+GlossWord = namedtuple('GlossWord', 'itemid origid text pos lemma coll cfrom cto')
+GlossTag = namedtuple('GlossTag', 'sk lemma coll item_origid')
+
+
+def locate_words(sent, gl):
+    ''' Link the items of a gloss to the sentence it is aligned to
+    Return (words, tags) as lists of GlossWord (with cfrom/cto in sent) and GlossTag
+    '''
+    words = []
+    for word in smart_search(sent, gl.items, lambda x: x.text).words:
+        item = word.data
+        if sent[word.cfrom:word.cto] != item.text:
+            print("WARNING: Expected [%s] but found [%s]" % (item.text, sent[word.cfrom:word.cto]))
+        itemid = item.itemid if isinstance(item.itemid, int) and item.itemid >= 0 else None  # glossitem ID (DB only)
+        words.append(GlossWord(itemid, item.origid, item.text, item.pos, item.lemma, item.coll, word.cfrom, word.cto))
+    tags = [GlossTag(tag.sk, tag.lemma, tag.coll, tag.item.origid if tag.item else None) for tag in gl.tags]
+    return words, tags
+
+
+def iter_sent_rows(sentid, docid, synsetid, sent, words, tags, sk_map):
+    ''' Generate (table, row) of NTU-MC tables for a sentence (see locate_words()) '''
+    yield 'sent', (sentid, docid, '', sent, '[WNSID=%s]' % (synsetid,), NTUMC_USER)
+    wordid_map = {}
+    coll_map = dd(list)
+    for wordid, word in enumerate(words):
+        yield 'word', (sentid, wordid, word.text, word.pos, word.lemma, word.cfrom, word.cto, '', NTUMC_USER)
+        wordid_map[word.origid] = wordid
+        if word.coll:
+            coll_map[word.coll].append(word.origid)
+    conceptid = 0
+    for tag in tags:
+        # tag = synsetid in NTU format (12345678-x)
+        if not tag.sk or tag.sk == NTUMC_IGNORED_SK:
+            continue
+        if tag.sk not in sk_map:
+            logger.info("sk[%s] could not be found" % (tag.sk))
+        elif sk_map[tag.sk] is None:
+            logger.info("Too many synsets found for sk[%s]" % (tag.sk))
+        else:
+            yield 'concept', (sentid, conceptid, tag.lemma, '', '', sk_map[tag.sk], '', NTUMC_USER)
+            if tag.coll:
+                # multiword expression
+                wids = [wordid_map[collword] for collword in coll_map[tag.coll] if collword in wordid_map]
+            elif tag.item_origid in wordid_map:
+                # normal tag
+                wids = [wordid_map[tag.item_origid]]
+            else:
+                wids = []
+            for wid in wids:
+                yield 'cwl', (sentid, wid, conceptid, NTUMC_USER)
+        conceptid += 1
+
+
+def iter_ntumc_rows(aligned_synsets, sk_map, sentid=1000000, docid=1000):
+    ''' Generate (table, row) of NTU-MC tables (see NTUMC_COLUMNS) from align_synsets() output
+    sk_map -- sensekey => canonical synset ID (see get_sk_map())
+    '''
+    yield 'corpus', NTUMC_CORPUS
+    yield 'doc', NTUMC_DOC
+    for ss, sents, glosses, aligned, _ in aligned_synsets:
+        # [2016-02-01] There is an error in glossitem for synset 01179767-a (a01179767)
+        for sent, gl in aligned:
+            words, tags = locate_words(sent, gl)
+            yield from iter_sent_rows(sentid, docid, ss.sid, sent, words, tags, sk_map)
+            sentid += 1
+
+
+def iter_gwn_synsets(gwn, sids=None, batch_size=SPLITS_BATCH_SIZE):
+    ''' Load synsets (with glosses) from a Gloss WordNet DB, batch_size synsets at a time
+    sids -- synset IDs (GWNSQL format, e.g. n12345678), all synsets by default
+    '''
+    if sids is None:
+        sids = [row.id for row in gwn.all_synsets(deep_select=False)]
+    for idx in range(0, len(sids), batch_size):
+        yield from gwn.get_synsets_by_ids(sids[idx:idx + batch_size])
+
+
+def iter_patches(path, patched=GLOSSTAG_PATCHED):
+    ''' Generate (synset, SHA-1 of its element) of the synsets in patched (canonical IDs, all if None) from a patch file '''
+    patched = None if patched is None else set(patched)
+    for ss, digest in iter_xml_synsets(path):
+        if patched is None or str(ss.sid) in patched:
+            yield ss, digest
+
+
+def apply_patch(gwn, paths, patched=GLOSSTAG_PATCHED):
+    ''' Apply GlossTag patch files to a Gloss WordNet DB in one transaction
+    Only synsets in patched (canonical IDs, all synsets if None) are applied, like GlossTagPatch.
+    All rows of a patched synset are replaced and the patch is recorded in patch_log (see gwn_patch.sql).
+    Synsets whose latest applied patch is the same (same SHA-1) are skipped, if a synset is found
+    in many files the last one is used.
+    Return the IDs of patched synsets
+    '''
+    patches = OrderedDict()
+    for path in paths:
+        for ss, digest in iter_patches(path, patched):
+            patches[ss.sid.to_gwnsql()] = (ss, digest, os.path.abspath(path))
+    conn = sqlite3.connect(gwn.db_path, isolation_level=None)
+    try:
+        run_script(conn, PATCH_SETUP_SCRIPT)
+        conn.execute('BEGIN IMMEDIATE')
+        # latest patch of each synset
+        applied = dict(conn.execute('SELECT sid, digest FROM patch_log ORDER BY id'))
+        patched = [(sid, digest, source) for sid, (ss, digest, source) in patches.items() if applied.get(sid) != digest]
+        gwn.replace_synsets(conn, [patches[sid][0] for sid, _, _ in patched])
+        conn.executemany('INSERT INTO patch_log (sid, digest, source) VALUES (?, ?, ?)', patched)
+        conn.execute('COMMIT')
+        return [str(patches[sid][0].sid) for sid, _, _ in patched]
+    except Exception:
+        if conn.in_transaction:
+            conn.execute('ROLLBACK')
+        raise
+    finally:
+        conn.close()
+
+
+def patch_applied(db_path, path=GLOSSTAG_PATCH, patched=GLOSSTAG_PATCHED):
+    ''' True if the latest applied patch (see apply_patch()) of every synset of a patch file is this one '''
+    expected = {ss.sid.to_gwnsql(): digest for ss, digest in iter_patches(path, patched)}
+    conn = sqlite3.connect(db_path)
+    try:
+        if not conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'patch_log'").fetchone():
+            return False
+        applied = dict(conn.execute('SELECT sid, digest FROM patch_log ORDER BY id'))
+        return all(applied.get(sid) == digest for sid, digest in expected.items())
+    finally:
+        conn.close()
+
+
+def build_splits(gwn, patch_path=GLOSSTAG_PATCH, processes=None, force=False):
+    ''' Split raw glosses into sentences, align them to glosses and store sentences, word offsets
+    and sense tags in the Gloss WordNet DB (see gwn_splits.sql), so that exports are pure reads
+
+    After the first build only synsets whose patch was added, changed or removed, or which were
+    patched or imported in the DB since the last build (see apply_patch() and build_gwn()) are recomputed
+    Return the number of (re)built synsets
+    '''
+    glpatch = GlossTagPatch(patch_path) if patch_path and os.path.isfile(patch_path) else None
+    conn = sqlite3.connect(gwn.db_path, isolation_level=None)
+    try:
+        for path in (SPLITS_SETUP_SCRIPT, PATCH_SETUP_SCRIPT, BUILD_SETUP_SCRIPT):
+            run_script(conn, path)
+        state = dict(conn.execute('SELECT name, value FROM gloss_build'))
+        logged = conn.execute('SELECT COALESCE(MAX(id), 0) FROM patch_log').fetchone()[0]
+        imported = conn.execute('SELECT COALESCE(MAX(build), 0) FROM build_synset').fetchone()[0]
+        if not force and state.get('splits') and state.get('patch') == (glpatch.digest if glpatch else '') and state.get('patch_log') == str(logged) and state.get('build') == str(imported):
+            return 0
+        if force or not state.get('splits'):
+            changed = sids = None
+        else:
+            stored = dict(conn.execute('SELECT sid, digest FROM synset_patch'))
+            current = glpatch.digests if glpatch else {}
+            changed = {sid for sid in set(stored) | set(current) if stored.get(sid) != current.get(sid)}
+            db_patched = [row[0] for row in conn.execute('SELECT DISTINCT sid FROM patch_log WHERE id > ?', (int(state.get('patch_log') or 0),))]
+            db_patched += [row[0] for row in conn.execute('SELECT sid FROM build_synset WHERE build > ?', (int(state.get('build') or 0),))]
+            changed.update(gwnsql_to_canonical(db_patched))
+            changed = sorted(changed)
+            sids = canonical_to_gwnsql(changed)
+        # new rows are staged in a temporary DB, the Gloss WordNet DB is only locked to swap them in
+        # (synsets are read through another connection in the meantime)
+        conn.execute("ATTACH DATABASE '' AS stage")
+        for table in SPLITS_TABLES:
+            conn.execute('CREATE TABLE stage.{0} AS SELECT * FROM main.{0} WHERE 0'.format(table))
+        sentid = 0 if sids is None else conn.execute('SELECT COALESCE(MAX(id), 0) FROM gloss_sent').fetchone()[0]
+        built = 0
+        sents, words, tags = [], [], []
+        conn.execute('BEGIN')
+        for data in align_synsets(iter_gwn_synsets(gwn, sids), glpatch, processes):
+            sid = data.ss.sid.to_gwnsql()
+            aligned = dict(zip(data.sent_ids, data.aligned))
+            for order, sent in enumerate(data.sents):
+                sentid += 1
+                pair = aligned.get(order)
+                sents.append((sentid, sid, order, sent, int(pair is not None)))
+                if pair is not None:
+                    sent_words, sent_tags = locate_words(sent, pair[1])
+                    words.extend((sentid, wid) + tuple(word) for wid, word in enumerate(sent_words))
+                    tags.extend((sentid,) + tuple(tag) for tag in sent_tags)
+            built += 1
+            if len(sents) >= SPLITS_BATCH_SIZE:
+                _stage_splits(conn, sents, words, tags)
+                sents, words, tags = [], [], []
+        _stage_splits(conn, sents, words, tags)
+        if glpatch:
+            patched = [(sid, digest) for sid, digest in glpatch.digests.items() if changed is None or sid in changed]
+            conn.executemany('INSERT INTO stage.synset_patch (sid, digest) VALUES (?, ?)', patched)
+        conn.execute('COMMIT')
+        # swap
+        conn.execute('BEGIN IMMEDIATE')
+        if sids is None:
+            for table in SPLITS_TABLES:
+                conn.execute('DELETE FROM main.%s' % (table,))
+        else:
+            for idx in range(0, len(sids), SPLITS_BATCH_SIZE):
+                batch = sids[idx:idx + SPLITS_BATCH_SIZE]
+                marks = ','.join('?' * len(batch))
+                for table in ('glossitem_offset', 'gloss_sent_tag'):
+                    conn.execute('DELETE FROM main.%s WHERE sentid IN (SELECT id FROM main.gloss_sent WHERE sid IN (%s))' % (table, marks), batch)
+                conn.execute('DELETE FROM main.gloss_sent WHERE sid IN (%s)' % (marks,), batch)
+                conn.execute('DELETE FROM main.synset_patch WHERE sid IN (%s)' % (marks,), changed[idx:idx + SPLITS_BATCH_SIZE])
+        for table in SPLITS_TABLES:
+            conn.execute('INSERT INTO main.{0} SELECT * FROM stage.{0}'.format(table))
+        conn.executemany('INSERT OR REPLACE INTO main.gloss_build (name, value) VALUES (?, ?)',
+                         [('splits', '1'), ('patch', glpatch.digest if glpatch else ''), ('patch_log', str(logged)), ('build', str(imported))])
+        conn.execute('COMMIT')
+        return built
+    except Exception:
+        if conn.in_transaction:
+            conn.execute('ROLLBACK')
+        raise
+    finally:
+        conn.close()
+
+
+def _stage_splits(conn, sents, words, tags):
+    conn.executemany('INSERT INTO stage.gloss_sent (id, sid, ord, sent, aligned) VALUES (?, ?, ?, ?, ?)', sents)
+    conn.executemany('INSERT INTO stage.glossitem_offset (sentid, wid, itemid, origid, text, pos, lemma, coll, cfrom, cto) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', words)
+    conn.executemany('INSERT INTO stage.gloss_sent_tag (sentid, sk, lemma, coll, item_origid) VALUES (?, ?, ?, ?, ?)', tags)
+
+
+def iter_stored_ntumc_rows(conn, sk_map, sentid=1000000, docid=1000):
+    ''' iter_ntumc_rows() from splits stored by build_splits() (synsets in canonical ID order)
+    conn -- sqlite3 connection to the Gloss WordNet DB
+    '''
+    yield 'corpus', NTUMC_CORPUS
+    yield 'doc', NTUMC_DOC
+    cursor = conn.execute('SELECT id, sid, sent FROM gloss_sent WHERE aligned = 1 ORDER BY ' + SPLITS_ORDER)
+    while True:
+        rows = cursor.fetchmany(SPLITS_BATCH_SIZE)
+        if not rows:
+            break
+        ids = [row[0] for row in rows]
+        marks = ','.join('?' * len(ids))
+        words = dd(list)
+        for row in conn.execute('SELECT sentid, itemid, origid, text, pos, lemma, coll, cfrom, cto FROM glossitem_offset WHERE sentid IN (%s) ORDER BY sentid, wid' % (marks,), ids):
+            words[row[0]].append(GlossWord(*row[1:]))
+        tags = dd(list)
+        for row in conn.execute('SELECT sentid, sk, lemma, coll, item_origid FROM gloss_sent_tag WHERE sentid IN (%s) ORDER BY rowid' % (marks,), ids):
+            tags[row[0]].append(GlossTag(*row[1:]))
+        for row, synsetid in zip(rows, gwnsql_to_canonical([row[1] for row in rows])):
+            yield from iter_sent_rows(sentid, docid, synsetid, row[2], words[row[0]], tags[row[0]], sk_map)
+            sentid += 1
+
+
+def to_sql_literal(value):
+    if isinstance(value, str):
+        return "'%s'" % (value.replace("'", "''"),)
+    return 'NULL' if value is None else str(value)
+
+
+def write_ntumc_script(rows, path):
+    ''' Write NTU-MC rows as an SQL script (INSERT statements in one transaction) '''
+    with open(path, 'w', buffering=NTUMC_BUFFER_SIZE) as outfile:
+        outfile.write("BEGIN TRANSACTION;\n")
+        for table, row in rows:
+            outfile.write('INSERT INTO %s (%s) VALUES (%s);\n' % (table, ','.join(NTUMC_COLUMNS[table]), ','.join(to_sql_literal(x) for x in row)))
+        outfile.write("END TRANSACTION;\n")
+
+
+def write_ntumc_csv(rows, prefix):
+    ''' Write NTU-MC rows into tab-separated files (prefix_sent.csv, prefix_word.csv, etc.), one per table '''
+    files = OrderedDict()
+    writers = {}
+    try:
+        for table in NTUMC_COLUMNS:
+            files[table] = open('%s_%s.csv' % (prefix, table), 'w', newline='', buffering=NTUMC_BUFFER_SIZE)
+            writers[table] = csv.writer(files[table], delimiter='\t').writerow
+        for table, row in rows:
+            writers[table](row)
+    finally:
+        for outfile in files.values():
+            outfile.close()
+    return ['%s_%s.csv' % (prefix, table) for table in files]
+
+
+def write_ntumc_sqlite(rows, db_path, batch_size=NTUMC_BATCH_SIZE):
+    ''' Insert NTU-MC rows into an NTU-MC SQLite DB in one transaction
+    Missing tables are created (with the exported columns only)
+    Return the number of inserted rows by table
+    '''
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    counts = OrderedDict((table, 0) for table in NTUMC_COLUMNS)
+    try:
+        for table, columns in NTUMC_COLUMNS.items():
+            conn.execute('CREATE TABLE IF NOT EXISTS %s (%s)' % (table, ', '.join(columns)))
+        queries = {table: 'INSERT INTO %s (%s) VALUES (%s)' % (table, ','.join(columns), ','.join('?' * len(columns)))
+                   for table, columns in NTUMC_COLUMNS.items()}
+        batches = dd(list)
+        conn.execute('BEGIN')
+        for table, row in rows:
+            batch = batches[table]
+            batch.append(row)
+            if len(batch) >= batch_size:
+                conn.executemany(queries[table], batch)
+                counts[table] += len(batch)
+                del batch[:]
+        for table, batch in batches.items():
+            conn.executemany(queries[table], batch)
+            counts[table] += len(batch)
+        conn.execute('COMMIT')
+    except Exception:
+        if conn.in_transaction:
+            conn.execute('ROLLBACK')
+        raise
+    finally:
+        conn.close()
+    return counts
+
+
+def export_ntumc(wng_loc, wng_db_loc, mockup=False, processes=None, mode='script', output=None, stored=False):
     '''
     Export GlossTag to NTU-MC format
+    mode   -- script (SQL script), sqlite (insert into an NTU-MC SQLite DB) or csv (one file per table)
+    output -- output file (script), DB (sqlite) or file prefix (csv)
+    stored -- read sentences and word offsets stored by build_splits() instead of computing them
     '''
+    from chirptext.leutile import Counter, Timer
+    from .glosswordnet import GWordnetXML, GWordnetSQLite
     print("Export GlossTag to NTU-MC")
-    merged_folder         = os.path.join(wng_loc, 'merged')
-#    glosstag_ntumc_script = wng_db_loc + ".ntumc.sql"
-    glosstag_ntumc_script = GLOSSTAG_NTUMC_OUTPUT + ".script.sql"
-    sent_file_path        = GLOSSTAG_NTUMC_OUTPUT + '_sent.csv'
-    word_file_path        = GLOSSTAG_NTUMC_OUTPUT + '_word.csv'
-    concept_file_path     = GLOSSTAG_NTUMC_OUTPUT + '_concept.csv'    
+    merged_folder = os.path.join(wng_loc, 'merged')
+    if not output:
+        output = GLOSSTAG_NTUMC_OUTPUT + ('.script.sql' if mode == 'script' else '.db' if mode == 'sqlite' else '')
 
     print("Path to glosstag folder: %s" % (merged_folder))
     print("Path to glosstag DB    : %s" % (wng_db_loc))
-    print("Output file            : %s" % (glosstag_ntumc_script))
+    print("Output ({})".format(mode).ljust(23) + ": %s" % (output))
 
     t = Timer()
-    t.start("Retrieving synsets from DB")
-
-    gwn = SQLiteGWordNet(wng_db_loc)
-    if mockup:
-        synsets = mockup_synsets()
-        pass
+    gwn = GWordnetSQLite(wng_db_loc)
+    sk_map = get_sk_map(gwn)
+    ac = Counter()
+    conn = None
+    if stored:
+        conn = sqlite3.connect(wng_db_loc)
+        rows = iter_stored_ntumc_rows(conn, sk_map)
     else:
-        # synsets = gwn.all_synsets()
-        wn = WSQL(WORDNET_30_PATH)
-        xmlwn = read_xmlwn(GLOSSTAG_XML_FILES)
-        synsets = xmlwn.synsets
-
-    print("%s synsets found in %s" % (len(synsets), wng_db_loc))
-    t.end()
+        t.start("Retrieving synsets from DB")
+        glpatch = None
+        if not mockup and os.path.isfile(GLOSSTAG_PATCH) and patch_applied(wng_db_loc):
+            # patched synsets are stored in the DB already (wntk patch)
+            synsets = list(iter_gwn_synsets(gwn))
+        else:
+            synsets = mockup_synsets() if mockup else GWordnetXML(glosstag_files(merged_folder)).synsets
+            glpatch = GlossTagPatch()
+        print("%s synsets found in %s" % (len(synsets), wng_db_loc))
+        t.end()
+        rows = iter_ntumc_rows(align_synsets(synsets, glpatch, processes, ac), sk_map)
     t.start("Generating cfrom cto ...")
-    with open(glosstag_ntumc_script, 'w') as outfile, open(sent_file_path, 'w') as sent_file, open(word_file_path, 'w') as word_file, open(concept_file_path, 'w') as concept_file:
-        outfile.write("""BEGIN TRANSACTION;
-   INSERT INTO corpus (corpusID, corpus, title, language)
-      VALUES (100, 'misc', "Miscellaneous", "eng"); 
-   INSERT INTO doc (docid, doc, title, url, subtitle, corpusID) 
-      VALUES(1000, "glosstag", "WordNet with Semantically Tagged Glosses", "http://wordnet.princeton.edu/glosstag.shtml", "", 100);
-""")
-        sentid = 1000000
-        docid  = 1000
-        glpatch = GlossTagPatch()
-        for ss in synsets:
-            (ss, sents, glosses, aligned) = prepare_for_ntumc(ss, glpatch)
-            # sent = ss.raw_glosses[0].gloss
-            
-            # print(sent)
-            # [2016-02-01] There is an error in glossitem for synset 01179767-a (a01179767)
-            for sent, gl in aligned:
-                wordid = 0
-                conceptid = 0
-
-                wordid_map = {}
-                conceptid_map = {}
-
-                sent_file.write('%s\t%s\n' % (sentid, sent,))
-                coll_map = dd(list)
-                cwl = []
-                CWL = namedtuple("CWL", "cid wid".split())
-                words = gl.items
-                asent = smart_search(sent, words, lambda x: x.text)
-                outfile.write('INSERT INTO sent (sid,docID,pid,sent,comment,usrname) VALUES(%s,%s,"","%s","[WNSID=%s]","letuananh");\n' % ( sentid, docid, asent.sent.replace('"', '""').replace("'", "''"), ss.get_synsetid()) )
-                outfile.write('-- WORDS\n')
-                for word in asent.words:
-                    testword = sent[word.cfrom:word.cto]
-                    if testword != word.data.text:
-                        print("WARNING: Expected [%s] but found [%s]" % (word.text, testword))
-                    outfile.write('INSERT INTO word (sid, wid, word, pos, lemma, cfrom, cto, comment, usrname) VALUES (%s, %s, "%s", "%s", "%s", %s, %s, "", "letuananh");\n' % (sentid, wordid, word.data.text.replace('"', '""').replace("'", "''"), word.data.pos, word.data.lemma, word.cfrom, word.cto))
-                    wordid_map[wordid] = word.data.origid
-                    wordid_map[word.data.origid] = wordid
-                    if word.data.coll:
-                        coll_map[word.data.coll].append(word.data.origid)
-                    word_file.write('%s\t%s\t%s\t%s\t%s\n' % (sentid, word.data.text, word.cfrom, word.cto, word.data.lemma))
-                    wordid += 1
-                outfile.write('-- CONCEPTS\n')
-                #for gl in ss.glosses:
-                for tag in gl.tags:
-                    # tag = synsetid in NTU format (12345678-x)
-                    if tag.sk and tag.sk != 'purposefully_ignored%0:00:00::':
-                        tagged_ss = gwn.get_synset_by_sk(tag.sk)
-                        if not tagged_ss:
-                            logger.info("sk[%s] could not be found" % (tag.sk))
-                        elif len(tagged_ss) > 1:
-                            logger.info("Too many synsets found for sk[%s]" % (tag.sk))
-                        else:
-                            # outfile.write("--%s\n" % (tagged_ss[0].get_synsetid(),))
-                            outfile.write('INSERT INTO concept (sid, cid, clemma, tag, tags, comment, ntag, usrname) VALUES (%s, %s, "%s", "", "", "%s", "", "letuananh"); --sk=[%s]\n' % (sentid, conceptid, tag.lemma.replace('"', '""').replace("'", "''"), tagged_ss[0].get_synsetid(), tag.sk) );
-                        conceptid_map[tag.origid] = conceptid
-                        conceptid_map[conceptid]  = tag.origid
-                        conceptid += 1
-                        if tag.coll:
-                            # multiword expression
-                            for collword in coll_map[tag.coll]:
-                                cwl.append(CWL(conceptid, wordid_map[collword]))
-                        elif tag.item:
-                            # normal tag
-                            cwl.append(CWL(conceptid, wordid_map[tag.item.origid]))
-                # outfile.write("/*%s*/\n" % (wordid_map))
-                # outfile.write("/*%s*/\n" % (conceptid_map))
-                # outfile.write("/*%s*/\n" % coll_map)
-                # outfile.write("/*%s*/\n" % cwl)
-                outfile.write('-- Concept-Word Links\n')
-                for lnk in cwl:
-                    outfile.write('INSERT INTO cwl (sid, wid, cid, usrname) VALUES (%s, %s, %s, "letuananh");\n' % (sentid, lnk.wid, lnk.cid))
-                sentid += 1
-                outfile.write('\n')
-        # end for synsets
-        outfile.write("END TRANSACTION;\n");
+    try:
+        if mode == 'sqlite':
+            for table, count in write_ntumc_sqlite(rows, output).items():
+                print("%s: %s rows" % (table, count))
+        elif mode == 'csv':
+            for path in write_ntumc_csv(rows, output):
+                print("  + %s" % (path,))
+        elif mode == 'script':
+            write_ntumc_script(rows, output)
+        else:
+            raise Exception("Invalid export mode: {}".format(mode))
+    finally:
+        if conn is not None:
+            conn.close()
     t.end()
+    if not stored:
+        print(alignment_report(ac, t.exec_time()))
     print("Done!")
-    
-    pass
+
 
 def to_synsetid(synsetid):
     return '%s-%s' % (synsetid[1:], synsetid[0])
@@ -592,6 +1141,8 @@ SYNSETS_TO_EXTRACT = [ '09524555-n', '02426634-n', '10310516-n', '01804340-n', '
 # '00100506-a', '00710741-a', '01846815-a', '02171024-a', '02404081-a', '02773862-a', '00515154-v', '00729109-v', '00781000-v', '01572728-v', '01593254-v', '01915365-v', '02162162-v', '02655135-v', '02711114-v', '00442115-n', '01219722-n', '07192129-n', '13997529-n', '14457976-n'
 
 def extract_synsets_xml():
+    from lxml import etree
+    from chirptext.leutile import Counter, Timer
     xfile_path = 'data/extract.xml'
     synsets = etree.Element("synsets")
     t = Timer()
@@ -644,10 +1195,169 @@ def search_by_lemma(args):
     pass
 
 
+def complete_lemma(args):
+    wn = get_wn(args)
+    for lemma in wn.complete(args.prefix, args.limit, args.pos):
+        print(lemma)
+
+
+def read_batch_queries(lines):
+    ''' Queries of wntk batch, one per line: synset ID, sensekey or lemma with optional POS (love/v or love<TAB>v)
+    Blank lines and lines starting with # are skipped
+    '''
+    for line in lines:
+        query = line.strip()
+        if not query or query.startswith('#'):
+            continue
+        lemma, sep, pos = query.partition('\t')
+        yield '%s/%s' % (lemma.strip(), pos.strip()) if sep else query
+
+
+def format_jsonl(serializer, query, synsets):
+    return b''.join((b'{"query":', serializer.dumps(query), b',"synsets":[', b','.join(serializer.synset(ss) for ss in synsets), b']}\n'))
+
+
+def format_tsv(serializer, query, synsets):
+    ''' query, synset ID, lemmas and definition (one row per synset, empty fields if nothing was found) '''
+    rows = [(query, str(ss.sid), ', '.join(ss.lemmas), ss.definition or '') for ss in synsets] or [(query, '', '', '')]
+    return ''.join('\t'.join(' '.join(field.split()) for field in row) + '\n' for row in rows).encode('utf-8')
+
+
+def run_batch(service, queries, outfile, fmt='jsonl', chunk_size=BATCH_CHUNK_SIZE):
+    ''' Resolve queries chunk_size at a time (see YawolService.resolve()) and write results in input order
+    outfile -- binary file, one JSON line (jsonl) or TSV rows (tsv) per query
+    Return (number of queries, number of queries with results)
+    '''
+    formatter = format_tsv if fmt == 'tsv' else format_jsonl
+    total = found = 0
+    queries = iter(queries)
+    while True:
+        chunk = list(itertools.islice(queries, chunk_size))
+        if not chunk:
+            break
+        results = service.resolve(chunk)
+        outfile.write(b''.join(formatter(service.serializer, query, results[query]) for query in chunk))
+        total += len(chunk)
+        found += sum(1 for query in chunk if results[query])
+    return total, found
+
+
+def batch_lookup(args):
+    ''' Look up many synset IDs, sensekeys and lemmas over one connection '''
+    from .yawol import YawolService
+    wsql = get_wn(args)
+    infile = open(args.input) if args.input and args.input != '-' else sys.stdin
+    outfile = open(args.output, 'wb') if args.output else sys.stdout.buffer
+    start = time.time()
+    try:
+        total, found = run_batch(YawolService(wsql), read_batch_queries(infile), outfile, args.format, args.chunk)
+    finally:
+        if infile is not sys.stdin:
+            infile.close()
+        if outfile is not sys.stdout.buffer:
+            outfile.close()
+        wsql.close()
+    elapsed = time.time() - start
+    print("%s queries (%s found) in %.2fs (%.0f queries/s)" % (total, found, elapsed, total / elapsed if elapsed else 0), file=sys.stderr)
+
+
+def start_daemon(args):
+    ''' Keep WordNet DAOs open and answer lookups on a Unix socket (see yawlib.daemon) '''
+    from chirptext.leutile import Timer
+    from .omwsql import OMWSQL
+    from .daemon import WntkDaemon, serve as serve_daemon
+    daemon = WntkDaemon(get_gwn(args),
+                        get_wn(args) if os.path.isfile(args.wnsql) else None,
+                        OMWSQL(args.omw) if os.path.isfile(args.omw) else None)
+    t = Timer()
+    t.start("Warming up caches")
+    daemon.warmup()
+    t.end()
+    # SIGTERM => clean shutdown (socket file is removed)
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    print("Listening on %s" % (args.socket,))
+    try:
+        serve_daemon(daemon, args.socket)
+    except KeyboardInterrupt:
+        pass
+
+
+def daemon_request(args):
+    ''' Request for `wntk serve` equivalent to a lookup command (None if it cannot be forwarded) '''
+    detail = '1' if getattr(args, 'detail', False) else ''
+    if args.func is search_by_id:
+        return ('synset', args.synsetid, detail)
+    elif args.func is search_by_key:
+        return ('key', args.sensekey, detail)
+    elif args.func is search_by_lemma:
+        return ('lemma', args.lemma, args.pos or '', detail)
+    elif args.func is complete_lemma:
+        return ('complete', args.prefix, args.pos or '', args.limit)
+    return None
+
+
+def forward_to_daemon(args):
+    ''' Print the response of a running daemon, return False if it is not running or cannot answer '''
+    from .daemon import forward
+    request = daemon_request(args)
+    if request is None:
+        return False
+    payload = forward(request, args.daemon_socket)
+    if payload is None:
+        return False
+    sys.stdout.write(payload)
+    return True
+
+
+def export_glosstag_ntumc(args):
+    export_ntumc(args.gloss_xml, args.glossdb, args.mockup, args.jobs, args.format, args.output, args.stored)
+
+
+def store_splits(args):
+    from chirptext.leutile import Timer
+    t = Timer()
+    t.start("Building gloss sentence splits")
+    built = build_splits(get_gwn(args), args.patch, args.jobs, args.force)
+    t.end()
+    print("%s synsets (re)built in %.2fs" % (built, t.exec_time()))
+
+
+def patch_gwn(args):
+    ''' Apply GlossTag patch files to Gloss WordNet DB '''
+    from chirptext.leutile import Timer
+    t = Timer()
+    t.start("Applying patches")
+    patched = apply_patch(get_gwn(args), args.files if args.files else [GLOSSTAG_PATCH], None if args.all else GLOSSTAG_PATCHED)
+    t.end()
+    for sid in patched:
+        print("  + %s" % (sid,))
+    print("%s synsets patched in %.2fs" % (len(patched), t.exec_time()))
+
+
+def align_glosses(args):
+    ''' Align raw gloss sentences to Gloss WordNet glosses (NTU-MC preparation) '''
+    from chirptext.leutile import Counter, Timer
+    t = Timer()
+    t.start("Reading Gloss WordNet XML")
+    synsets = get_gwnxml(args).synsets
+    t.end()
+    glpatch = GlossTagPatch() if args.patch else None
+    c = Counter()
+    t.start("Aligning sentences")
+    misaligned = [str(data.ss.sid) for data in align_synsets(synsets, glpatch, args.jobs, c) if len(data.aligned) < len(data.sents)]
+    t.end()
+    if args.output:
+        with open(args.output, 'w') as outfile:
+            for sid in misaligned:
+                outfile.write('%s\n' % (sid,))
+    print(alignment_report(c, t.exec_time()))
+
+
 def main():
     '''Main entry of wntk
 
     '''
+    from .daemon import DEFAULT_SOCKET
     # It's easier to create a user-friendly console application by using argparse
     # See reference at the top of this script
     parser = argparse.ArgumentParser(description="WordNet Toolkit - For accessing and manipulating WordNet")
@@ -657,11 +1367,15 @@ def main():
     parser.add_argument('-s', '--synset', help='Retrieve synset information by synsetid')
     parser.add_argument('-k', '--sensekey', help='Retrieve synset information by sensekey')
     parser.add_argument('-t', '--term', help='Retrieve synset information by term (word form)')
+    parser.add_argument('-D', '--daemon', help='Forward lookups to `wntk serve` when it is running', action='store_true')
+    parser.add_argument('--daemon-socket', help='Socket of `wntk serve` (default: %s)' % (DEFAULT_SOCKET,), default=DEFAULT_SOCKET)
 
     tasks = parser.add_subparsers(title='task', help='Task to be performed')
 
     # Convert GWordnetXML into GWordnetSQL
-    cmd_convert = tasks.add_parser('create', help='Create DB and then import data')
+    cmd_convert = tasks.add_parser('create', help='Create DB and then import data (changed synsets only)')
+    cmd_convert.add_argument('--force', help='Drop all tables and import everything', action='store_true')
+    cmd_convert.add_argument('--batch', help='Synsets imported per transaction (default: %s)' % (BUILD_BATCH_SIZE,), type=int, default=BUILD_BATCH_SIZE)
     cmd_convert.set_defaults(func=convert)
     # Search synsets by synsetID
     cmd_getbyid = tasks.add_parser('synset', help='Retrieve synset information by synsetid')
@@ -679,6 +1393,48 @@ def main():
     cmd_getbylemma.add_argument('pos', nargs='?', help='Part-of-speech (a, n, r, x)')
     cmd_getbylemma.add_argument('-d', '--detail', help='Display all gloss information (for debugging?)', action='store_true')
     cmd_getbylemma.set_defaults(func=search_by_lemma)
+    # autocomplete lemmas
+    cmd_complete = tasks.add_parser('complete', help='Find lemmas which start with a prefix (most frequent first)')
+    cmd_complete.add_argument('prefix', help='Prefix of lemmas')
+    cmd_complete.add_argument('pos', nargs='?', help='Part-of-speech (n, v, a, r)')
+    cmd_complete.add_argument('-n', '--limit', help='Maximum number of lemmas', type=int, default=10)
+    cmd_complete.set_defaults(func=complete_lemma)
+    # bulk lookup
+    cmd_batch = tasks.add_parser('batch', help='Look up synset IDs, sensekeys and lemmas (one per line) in bulk')
+    cmd_batch.add_argument('input', nargs='?', help='Query file (default: stdin)')
+    cmd_batch.add_argument('-o', '--output', help='Output file (default: stdout)')
+    cmd_batch.add_argument('-f', '--format', help='Output format (default: jsonl)', choices=['jsonl', 'tsv'], default='jsonl')
+    cmd_batch.add_argument('-n', '--chunk', help='Queries resolved at a time (default: %s)' % (BATCH_CHUNK_SIZE,), type=int, default=BATCH_CHUNK_SIZE)
+    cmd_batch.set_defaults(func=batch_lookup)
+    # align gloss sentences (NTU-MC)
+    cmd_align = tasks.add_parser('align', help='Align raw gloss sentences to glosses (NTU-MC preparation)')
+    cmd_align.add_argument('-j', '--jobs', help='Number of worker processes (default: CPU count)', type=int)
+    cmd_align.add_argument('-o', '--output', help='Write IDs of misaligned synsets to this file')
+    cmd_align.add_argument('--patch', help='Apply GlossTag patch (%s)' % (GLOSSTAG_PATCH,), action='store_true')
+    cmd_align.set_defaults(func=align_glosses)
+    # export to NTU-MC
+    cmd_ntumc = tasks.add_parser('ntumc', help='Export Gloss WordNet to NTU-MC')
+    cmd_ntumc.add_argument('-f', '--format', help='Output format (default: script)', choices=['script', 'sqlite', 'csv'], default='script')
+    cmd_ntumc.add_argument('-o', '--output', help='SQL script, NTU-MC SQLite DB or CSV file prefix')
+    cmd_ntumc.add_argument('-j', '--jobs', help='Number of worker processes for sentence alignment', type=int)
+    cmd_ntumc.add_argument('--stored', help='Use sentences and word offsets stored by `wntk splits`', action='store_true')
+    cmd_ntumc.set_defaults(func=export_glosstag_ntumc)
+    # store gloss sentence splits and word offsets
+    cmd_splits = tasks.add_parser('splits', help='Store gloss sentence splits and word offsets in Gloss WordNet DB')
+    cmd_splits.add_argument('--patch', help='GlossTag patch file (default: %s)' % (GLOSSTAG_PATCH,), default=GLOSSTAG_PATCH)
+    cmd_splits.add_argument('--force', help='Rebuild all synsets', action='store_true')
+    cmd_splits.add_argument('-j', '--jobs', help='Number of worker processes for sentence alignment', type=int)
+    cmd_splits.set_defaults(func=store_splits)
+    # apply GlossTag patches to DB
+    cmd_patch = tasks.add_parser('patch', help='Apply GlossTag patch files to Gloss WordNet DB')
+    cmd_patch.add_argument('files', nargs='*', help='Patch files (default: %s)' % (GLOSSTAG_PATCH,))
+    cmd_patch.add_argument('--all', help='Apply all synsets in the files (default: only those overridden by GlossTagPatch)', action='store_true')
+    cmd_patch.set_defaults(func=patch_gwn)
+    # lookup daemon
+    cmd_serve = tasks.add_parser('serve', help='Answer lookups on a Unix socket with warm caches (see --daemon)')
+    cmd_serve.add_argument('--socket', help='Socket path (default: %s)' % (DEFAULT_SOCKET,), default=DEFAULT_SOCKET)
+    cmd_serve.add_argument('--omw', help='Path to OMW SQLite DB', default=YLConfig.OMW_DB)
+    cmd_serve.set_defaults(func=start_daemon)
     # show info
     cmd_info = tasks.add_parser('info', help='Show configuration information')
     cmd_info.set_defaults(func=show_info)
@@ -687,7 +1443,8 @@ def main():
     if len(sys.argv) > 1:
         args = parser.parse_args()
         config_logging(args, logger)
-        args.func(args)
+        if not (args.daemon and forward_to_daemon(args)):
+            args.func(args)
     else:
         parser.print_help()
     return
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+Thin entry point of wntk
+Latest version can be found at https://github.com/letuananh/yawlib
+
+Lookups with -D/--daemon are forwarded to `wntk serve` before anything else is imported,
+everything else (and lookups the daemon cannot answer) runs yawlib.wntk.
+
+Usage:
+    python3 -m yawlib.wntk_client --daemon synset 01775164-v
+
+@author: Le Tuan Anh <tuananh.ke@gmail.com>
+'''
+
+# Copyright (c) 2017, Le Tuan Anh <tuananh.ke@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+__author__ = "Le Tuan Anh <tuananh.ke@gmail.com>"
+__copyright__ = "Copyright 2017, yawlib"
+__credits__ = []
+__license__ = "MIT"
+__version__ = "0.1"
+__maintainer__ = "Le Tuan Anh"
+__email__ = "<tuananh.ke@gmail.com>"
+__status__ = "Prototype"
+
+########################################################################
+
+import sys
+
+from .daemon import DEFAULT_SOCKET, forward
+
+########################################################################
+
+DAEMON_FLAGS = ('-D', '--daemon')
+# global options of wntk (see wntk.main)
+VALUE_OPTIONS = ('-i', '--gloss_xml', '-w', '--wnsql', '-g', '--glossdb', '-p', '--pos',
+                 '-s', '--synset', '-k', '--sensekey', '-t', '--term', '--daemon-socket')
+FLAG_OPTIONS = ('-v', '--verbose', '-q', '--quiet', '-m', '--mockup') + DAEMON_FLAGS
+# lookup commands: (max positional arguments, value options)
+LOOKUPS = {'synset': (1, ()), 'key': (1, ()), 'lemma': (2, ()), 'complete': (2, ('-n', '--limit'))}
+DEFAULT_LIMIT = 10
+
+
+def split_option(arg):
+    return arg.split('=', 1) if arg.startswith('--') and '=' in arg else (arg, None)
+
+
+def parse_lookup(argv):
+    ''' (socket, request) of a lookup with -D/--daemon, None if it should be run by wntk
+    A request has the same fields as wntk.daemon_request()
+    '''
+    socket_path = DEFAULT_SOCKET
+    daemon = False
+    argv = list(argv)
+    # global options
+    while argv and argv[0].startswith('-'):
+        opt, value = split_option(argv.pop(0))
+        if opt in VALUE_OPTIONS:
+            if value is None:
+                if not argv:
+                    return None
+                value = argv.pop(0)
+            if opt == '--daemon-socket':
+                socket_path = value
+        elif opt in FLAG_OPTIONS and value is None:
+            daemon = daemon or opt in DAEMON_FLAGS
+        else:
+            return None
+    if not daemon or not argv or argv[0] not in LOOKUPS:
+        return None
+    command = argv.pop(0)
+    max_args, value_options = LOOKUPS[command]
+    positional = []
+    detail = ''
+    limit = DEFAULT_LIMIT
+    while argv:
+        arg = argv.pop(0)
+        opt, value = split_option(arg)
+        if opt in ('-d', '--detail') and value is None and command != 'complete':
+            detail = '1'
+        elif opt in value_options:
+            if value is None:
+                if not argv:
+                    return None
+                value = argv.pop(0)
+            try:
+                limit = int(value)
+            except ValueError:
+                return None
+        elif arg.startswith('-') or len(positional) == max_args:
+            return None
+        else:
+            positional.append(arg)
+    if not positional:
+        return None
+    if command == 'lemma':
+        return socket_path, (command, positional[0], positional[1] if len(positional) > 1 else '', detail)
+    elif command == 'complete':
+        return socket_path, (command, positional[0], positional[1] if len(positional) > 1 else '', limit)
+    return socket_path, (command, positional[0], detail)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    lookup = parse_lookup(argv)
+    if lookup is not None:
+        payload = forward(lookup[1], lookup[0])
+        if payload is not None:
+            sys.stdout.write(payload)
+            return
+        # the daemon has been asked already, look it up locally
+        sys.argv[1:] = [arg for arg in argv if arg not in DAEMON_FLAGS]
+    from .wntk import main as wntk_main
+    wntk_main()
+
+
+if __name__ == "__main__":
+    main()
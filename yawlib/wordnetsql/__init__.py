@@ -38,8 +38,8 @@ __email__ = "<tuananh.ke@gmail.com>"
 __status__ = "Prototype"
 
 
-from .wordnetsql import WordnetSQL
+from .wordnetsql import WordnetSQL, LemmaIndex
 
 #------------------------------------------------------------------------------
 
-__all__ = ['WordnetSQL']
+__all__ = ['WordnetSQL', 'LemmaIndex']
@@ -39,14 +39,26 @@ __status__ = "Prototype"
 
 #-----------------------------------------------------------------------
 
+import heapq
+import itertools
 import sqlite3
+import threading
+from array import array
 from collections import defaultdict as dd
 from puchikarui import Schema, Execution  # DataSource, Table
+from yawlib.caching import DictCache
 from yawlib.config import YLConfig
+from yawlib.connections import LocalConnections
+from yawlib.metrics import REGISTRY, instrument
+from yawlib.singleflight import single_flight
 from yawlib.models import SynsetID, Synset, SynsetCollection
+from yawlib.sidconv import sids_to_wnsql, wnsql_to_sids
 
 #-----------------------------------------------------------------------
 
+NOT_CACHED = object()  # None results are cached too
+
+
 
 class Wordnet3Schema(Schema):
 
@@ -59,125 +71,386 @@ class Wordnet3Schema(Schema):
         self.add_table('samples', 'synsetid sampleid sample'.split(), alias='ex')
 
 
+class LemmaIndex(object):
+
+    ''' Sorted in-memory lemma vocabulary for prefix search, ranked by summed tagcount
+
+    Lemmas are stored in one UTF-8 buffer (byte order is code point order) with an offset array
+    instead of one str object per lemma, lookups only create the str objects they return
+    '''
+
+    # adjective satellites are counted as adjectives
+    POS_BITS = {'n': 1, 'v': 2, 'a': 4, 's': 4, 'r': 8}
+    # top results of prefixes matching more than LARGE_RANGE lemmas are memoized
+    MAX_RESULTS = 100
+    LARGE_RANGE = 512
+
+    def __init__(self, rows):
+        ''' rows -- (lemma, pos, tagcount) '''
+        counts = dd(lambda: dd(int))
+        for lemma, pos, tagcount in rows:
+            counts[lemma.lower()][pos] += tagcount or 0
+        lemmas = sorted(counts.keys())
+        encoded = [lemma.encode('utf-8') for lemma in lemmas]
+        self.data = b''.join(encoded)
+        self.offsets = array('l', [0])
+        self.offsets.extend(itertools.accumulate(len(x) for x in encoded))
+        self.masks = array('B', [0] * len(lemmas))
+        self.tagcounts = {p: array('l', [0] * len(lemmas)) for p in ('', 'n', 'v', 'a', 'r')}
+        for idx, lemma in enumerate(lemmas):
+            for pos, tagcount in counts[lemma].items():
+                pos = 'a' if pos == 's' else pos
+                if pos in self.POS_BITS:
+                    self.masks[idx] |= self.POS_BITS[pos]
+                    self.tagcounts[pos][idx] += tagcount
+                self.tagcounts[''][idx] += tagcount
+        self.memo = {}
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __iter__(self):
+        return (self.lemma(idx) for idx in range(len(self)))
+
+    def lemma(self, idx):
+        return self.data[self.offsets[idx]:self.offsets[idx + 1]].decode('utf-8')
+
+    def _bisect(self, key, lo=0):
+        ''' Index of the first lemma >= key (UTF-8 bytes) '''
+        data, offsets = self.data, self.offsets
+        hi = len(self)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if data[offsets[mid]:offsets[mid + 1]] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def complete(self, prefix, limit=10, pos=None):
+        ''' Find lemmas which start with prefix (most frequent first) '''
+        prefix = prefix.lower()
+        if pos and pos not in self.POS_BITS:
+            return []
+        pos = 'a' if pos == 's' else (pos or '')
+        key = prefix.encode('utf-8')
+        lo = self._bisect(key)
+        # 0xff is never found in UTF-8
+        hi = self._bisect(key + b'\xff', lo)
+        if hi - lo > self.LARGE_RANGE and limit <= self.MAX_RESULTS:
+            top = self.memo.get((prefix, pos))
+            if top is None:
+                top = self.memo[(prefix, pos)] = self._top(lo, hi, self.MAX_RESULTS, pos)
+            top = top[:limit]
+        else:
+            top = self._top(lo, hi, limit, pos)
+        return [self.lemma(idx) for idx in top]
+
+    def _top(self, lo, hi, limit, pos):
+        counts = self.tagcounts[pos]
+        candidates = range(lo, hi)
+        if pos:
+            bit, masks = self.POS_BITS[pos], self.masks
+            candidates = (idx for idx in candidates if masks[idx] & bit)
+        # same tagcount => alphabetical order
+        return heapq.nlargest(limit, candidates, key=lambda idx: (counts[idx], -idx))
+
+
 class WordnetSQL:
 
+    # Maximum number of host parameters in one SQLite query
+    MAX_PARAMS = 500
+
     def __init__(self, db_path):
         self.db_path = db_path
         self.schema = Wordnet3Schema(self.db_path)
         # Caches
-        self.sk_cache = dd(set)
-        self.sid_cache = dd(set)
-        self.hypehypo_cache = dd(set)
-        self.tagcount_cache = dd(lambda: 0)
+        self.sk_cache = DictCache('wordnetsql_sk')
+        self.sid_cache = DictCache('wordnetsql_sid')
+        self.hypehypo_cache = DictCache('wordnetsql_hypehypo')
+        self.tagcount_cache = DictCache('wordnetsql_tagcount')
+        # Thread-local read-only connections
+        self._local_conns = LocalConnections(self.db_path)
+        self._lemma_index = None
+        self._lemma_index_lock = threading.Lock()
+        REGISTRY.track_connections(self, 'wordnetsql')
 
     def get_conn(self):
         conn = sqlite3.connect(self.db_path)
         return conn
 
+    def get_local_conn(self):
+        ''' Get the read-only connection of the current thread
+        The connection is kept open and reused by the thread (closed when it exits), do not close it.
+        '''
+        return self._local_conns.get()
+
+    def close(self):
+        ''' Close all thread-local connections '''
+        self._local_conns.close()
+
+    @property
+    def open_connections(self):
+        return len(self._local_conns)
+
+    def clear_caches(self):
+        ''' Drop cached lookups and the lemma index, reconnect to the database
+        (e.g. after the database file has been replaced)
+        '''
+        for cache in (self.sk_cache, self.sid_cache, self.hypehypo_cache, self.tagcount_cache,
+                      self.word_cache, self.lemma_list_cache, self.sense_cache, self.gloss_cache):
+            cache.clear()
+        with self._lemma_index_lock:
+            self._lemma_index = None
+        self._local_conns.reset()
+
+    def select_senses(self, where, values):
+        ''' Select (synsetid, lemma, sensekey, tagcount, lexdomainid, definition) rows from wordsXsensesXsynsets '''
+        query = '''SELECT synsetid, lemma, sensekey, tagcount, lexdomainid, definition
+                     FROM wordsXsensesXsynsets WHERE {}'''.format(where)
+        return self.get_local_conn().execute(query, values).fetchall()
+
+    @instrument('wordnetsql')
+    def get_examples(self, sids):
+        ''' Get examples of many synsets at once
+        sids -- WNSQL synset IDs
+        Return a map from WNSQL synset IDs (int) to lists of examples
+        '''
+        exes = dd(list)
+        sids = list(set(int(x) for x in sids))
+        conn = self.get_local_conn()
+        for i in range(0, len(sids), self.MAX_PARAMS):
+            chunk = sids[i:i + self.MAX_PARAMS]
+            query = '''SELECT synsetid, sample FROM samples
+                         WHERE synsetid IN ({}) ORDER BY synsetid, sampleid'''.format(','.join('?' * len(chunk)))
+            for synsetid, sample in conn.execute(query, chunk):
+                exes[synsetid].append(sample)
+        return exes
+
+    def get_lemma_index(self):
+        ''' Build the lemma index for prefix search (only once) '''
+        if self._lemma_index is None:
+            with self._lemma_index_lock:
+                if self._lemma_index is None:
+                    query = '''SELECT lemma, pos, SUM(tagcount) FROM words
+                                 INNER JOIN senses USING (wordid)
+                                 INNER JOIN synsets USING (synsetid)
+                                 GROUP BY wordid, pos'''
+                    self._lemma_index = LemmaIndex(self.get_local_conn().execute(query))
+        return self._lemma_index
+
+    @instrument('wordnetsql')
+    def complete(self, prefix, limit=10, pos=None):
+        ''' Find lemmas which start with prefix, ranked by summed tagcount
+        (e.g. complete('lov', 3) => ['love', 'lovely', 'lover'])
+        '''
+        return self.get_lemma_index().complete(prefix, limit, pos)
+
     def get_all_synsets(self):
         with Execution(self.schema) as exe:
             return exe.schema.wss.select(columns=['synsetid', 'lemma', 'sensekey', 'tagcount'])
 
+    @single_flight('wordnetsql')
+    @instrument('wordnetsql')
     def get_synset_by_id(self, synsetid):
         sid = self.ensure_sid(synsetid)
-        with Execution(self.schema) as exe:
-            # get synset object
-            rows = exe.schema.wss.select(where='synsetid=?', values=(sid,))
-            if rows is not None and len(rows) > 0:
-                ss = Synset(synsetid)
-                ss.definition = rows[0].definition
-                for row in rows:
-                    ss.add_lemma(row.lemma)
-                    ss.add_key(row.sensekey)
-                    ss.tagcount += row.tagcount
-                # add examples
-                exes = exe.schema.ex.select(where='synsetid=?', values=[sid], orderby='sampleid')
-                for ex in exes:
-                    ss.exes.append(ex.sample)
-                return ss
-
+        rows = self.select_senses('synsetid=?', (sid,))
+        if rows:
+            (_, _, _, _, lexdomainid, definition) = rows[0]
+            ss = Synset(synsetid, lexfile=lexdomainid)
+            ss.definition = definition
+            for (_, lemma, sensekey, tagcount, _, _) in rows:
+                ss.add_lemma(lemma)
+                ss.add_key(sensekey)
+                ss.tagcount += tagcount
+            # add examples
+            ss.exes.extend(self.get_examples([sid])[int(sid)])
+            return ss
+
+    @single_flight('wordnetsql')
+    @instrument('wordnetsql')
     def get_synset_by_sk(self, sk):
-        with Execution(self.schema) as exe:
-            # get synset object
-            rows = exe.schema.wss.select(where='sensekey=?', values=(sk,))
-            if rows is not None and len(rows) > 0:
-                ss = Synset(rows[0].synsetid)
-                ss.definition = rows[0].definition
-                for row in rows:
-                    ss.add_lemma(row.lemma)
-                    ss.add_key(row.sensekey)
-                    ss.tagcount += row.tagcount
-                # add examples
-                exes = exe.schema.ex.select(where='synsetid=?', values=[rows[0].synsetid], orderby='sampleid')
-                for ex in exes:
-                    ss.exes.append(ex.sample)
-                return ss
-
+        rows = self.select_senses('sensekey=?', (sk,))
+        if rows:
+            (synsetid, _, _, _, lexdomainid, definition) = rows[0]
+            ss = Synset(synsetid, lexfile=lexdomainid)
+            ss.definition = definition
+            for (_, lemma, sensekey, tagcount, _, _) in rows:
+                ss.add_lemma(lemma)
+                ss.add_key(sensekey)
+                ss.tagcount += tagcount
+            # add examples
+            ss.exes.extend(self.get_examples([synsetid])[synsetid])
+            return ss
+
+    @single_flight('wordnetsql')
+    @instrument('wordnetsql')
     def get_synsets_by_lemma(self, lemma):
-        with Execution(self.schema) as exe:
-            # get synset object
-            rows = exe.schema.wss.select(where='lemma=?', values=(lemma,))
-            synsets = SynsetCollection()
-            if rows is not None and len(rows) > 0:
-                for row in rows:
-                    ss = Synset(row.synsetid)
-                    ss.definition = row.definition
-                    ss.add_lemma(row.lemma)
-                    ss.add_key(row.sensekey)
-                    ss.tagcount = row.tagcount
-                    # add examples
-                    exes = exe.schema.ex.select(where='synsetid=?', values=[row.synsetid], orderby='sampleid')
-                    for ex in exes:
-                        ss.exes.append(ex.sample)
-                    synsets.add(ss)
-            return synsets
+        rows = self.select_senses('lemma=?', (lemma,))
+        synsets = SynsetCollection()
+        exes = self.get_examples(row[0] for row in rows)
+        for (synsetid, lemma, sensekey, tagcount, lexdomainid, definition) in rows:
+            ss = Synset(synsetid, lexfile=lexdomainid)
+            ss.definition = definition
+            ss.add_lemma(lemma)
+            ss.add_key(sensekey)
+            ss.tagcount = tagcount
+            # add examples
+            ss.exes.extend(exes[synsetid])
+            synsets.add(ss)
+        return synsets
+
+    def _select_senses_in(self, column, values):
+        ''' Select wordsXsensesXsynsets rows where column is in values (a few queries for many values) '''
+        values = list(values)
+        rows = []
+        for i in range(0, len(values), self.MAX_PARAMS):
+            chunk = values[i:i + self.MAX_PARAMS]
+            rows.extend(self.select_senses('{} IN ({})'.format(column, ','.join('?' * len(chunk))), chunk))
+        return rows
+
+    @instrument('wordnetsql')
+    def get_synsets_by_ids(self, synsetids):
+        ''' Get many synsets at once
+        Return a map from SynsetID to Synset (synsets which cannot be found are left out)
+        '''
+        synsets = self._build_synsets(self._select_senses_in('synsetid', set(self.ensure_sids(synsetids))))
+        return {ss.sid: ss for ss in synsets.values()}
+
+    def _build_synsets(self, rows):
+        ''' Assemble wordsXsensesXsynsets rows into synsets (examples are fetched at once)
+        Return a map from WNSQL synset IDs (int) to Synset
+        '''
+        synsets = {}
+        for (synsetid, lemma, sensekey, tagcount, lexdomainid, definition) in rows:
+            ss = synsets.get(synsetid)
+            if ss is None:
+                ss = synsets[synsetid] = Synset(synsetid, lexfile=lexdomainid)
+                ss.definition = definition
+            ss.add_lemma(lemma)
+            ss.add_key(sensekey)
+            ss.tagcount += tagcount
+        exes = self.get_examples(synsets.keys())
+        for synsetid, ss in synsets.items():
+            ss.exes.extend(exes[synsetid])
+        return synsets
+
+    @instrument('wordnetsql')
+    def get_synsets_after(self, since_id=None, pos=None, limit=MAX_PARAMS):
+        ''' Get the next page of synsets ordered by WNSQL synset ID (keyset pagination)
+        since_id -- only synsets after this synset ID are returned (None: from the first synset)
+        pos -- POS letters to keep (e.g. 'as' for adjectives and adjective satellites)
+        '''
+        where = 'synsetid > ?'
+        values = [int(self.ensure_sid(since_id)) if since_id else 0]
+        if pos:
+            where += ' AND pos IN ({})'.format(','.join('?' * len(pos)))
+            values.extend(pos)
+        query = 'SELECT synsetid FROM synsets WHERE {} ORDER BY synsetid LIMIT ?'.format(where)
+        ids = [row[0] for row in self.get_local_conn().execute(query, values + [min(limit, self.MAX_PARAMS)])]
+        if not ids:
+            return []
+        synsets = self._build_synsets(self._select_senses_in('synsetid', ids))
+        return [synsets[synsetid] for synsetid in ids if synsetid in synsets]
+
+    def iter_synsets(self, since_id=None, pos=None, page_size=MAX_PARAMS):
+        ''' Iterate over all synsets ordered by WNSQL synset ID, one page at a time
+        No cursor is kept open between pages, so memory use is bounded by page_size
+        and an interrupted iteration can be resumed with since_id=<last synset ID>
+        '''
+        while True:
+            page = self.get_synsets_after(since_id, pos, page_size)
+            if not page:
+                return
+            yield from page
+            since_id = page[-1].sid
+
+    @instrument('wordnetsql')
+    def get_synsets_by_sks(self, sks):
+        ''' Get the synsets of many sensekeys at once
+        Return a map from sensekey to Synset (sensekeys which cannot be found are left out)
+        '''
+        synsets = {}
+        for (synsetid, lemma, sensekey, tagcount, lexdomainid, definition) in self._select_senses_in('sensekey', set(sks)):
+            ss = synsets[sensekey] = Synset(synsetid, lexfile=lexdomainid)
+            ss.definition = definition
+            ss.add_lemma(lemma)
+            ss.add_key(sensekey)
+            ss.tagcount = tagcount
+        exes = self.get_examples(ss.sid.to_wnsql() for ss in synsets.values())
+        for ss in synsets.values():
+            ss.exes.extend(exes[int(ss.sid.to_wnsql())])
+        return synsets
+
+    @instrument('wordnetsql')
+    def get_synsets_by_lemmas(self, lemmas):
+        ''' Get the synsets of many lemmas at once
+        Return a map from lemma to SynsetCollection (lemmas which cannot be found are left out)
+        '''
+        rows = self._select_senses_in('lemma', set(lemmas))
+        exes = self.get_examples(row[0] for row in rows)
+        synsets = dd(SynsetCollection)
+        for (synsetid, lemma, sensekey, tagcount, lexdomainid, definition) in rows:
+            ss = Synset(synsetid, lexfile=lexdomainid)
+            ss.definition = definition
+            ss.add_lemma(lemma)
+            ss.add_key(sensekey)
+            ss.tagcount = tagcount
+            ss.exes.extend(exes[synsetid])
+            synsets[lemma].add(ss)
+        return dict(synsets)
 
     def cache_tagcounts(self):
         with Execution(self.schema) as exe:
             results = exe.schema.wss.select(columns=['synsetid', 'tagcount'])
         for res in results:
-            self.tagcount_cache[res.synsetid] += res.tagcount
+            self.tagcount_cache[res.synsetid] = self.tagcount_cache.setdefault(res.synsetid, 0) + res.tagcount
 
+    @instrument('wordnetsql')
     def get_tagcount(self, sid):
-        if sid in self.tagcount_cache:
-            return self.tagcount_cache[sid]
+        counter = self.tagcount_cache.get(sid)
+        if counter is not None:
+            return counter
         with Execution(self.schema) as exe:
             results = exe.schema.wss.select(where='synsetid=?', values=[sid], columns=['tagcount'])
         counter = 0
         for res in results:
             counter += res.tagcount
-        self.tagcount_cache[sid] = counter
-        return counter
+        return self.tagcount_cache.put(sid, counter)
 
+    @single_flight('wordnetsql')
+    @instrument('wordnetsql')
     def get_senseinfo_by_sk(self, sk):
-        if sk in self.sk_cache:
-            return self.sk_cache[sk]
+        result = self.sk_cache.get(sk, NOT_CACHED)
+        if result is not NOT_CACHED:
+            return result
         result = None
         with Execution(self.schema) as exe:
             result = exe.schema.wss.select_single(where='sensekey=?', values=[sk],
                                                   columns=['pos', 'synsetid', 'sensekey'])
-        self.sk_cache[sk] = result
-        return result
+        return self.sk_cache.put(sk, result)
 
     def ensure_sid(self, sid):
-        '''Ensure that a given synset ID is an instance of SynsetID'''
-        if isinstance(sid, SynsetID):
-            sid = sid.to_wnsql()
-        else:
-            sid = SynsetID.from_string(str(sid)).to_wnsql()
-        return sid
+        '''Ensure that a given synset ID is in WNSQL format'''
+        return SynsetID.from_string(sid).to_wnsql()
 
+    def ensure_sids(self, sids):
+        '''Bulk version of ensure_sid (WNSQL IDs are returned as int)'''
+        return sids_to_wnsql([SynsetID.from_string(x) for x in sids])
+
+    @single_flight('wordnetsql')
+    @instrument('wordnetsql')
     def get_senseinfo_by_sid(self, synsetid):
         sid = self.ensure_sid(synsetid)
-        if sid in self.sid_cache:
-            return self.sid_cache[sid]
+        result = self.sid_cache.get(sid, NOT_CACHED)
+        if result is not NOT_CACHED:
+            return result
         result = None
         with Execution(self.schema) as exe:
             result = exe.schema.wss.select_single(where='synsetid=?', values=[sid],
                                                   columns=['pos', 'synsetid',
                                                            'sensekey', 'definition', 'tagcount'])
-        self.sid_cache[sid] = result
-        return result
+        return self.sid_cache.put(sid, result)
 
     def get_examples_by_sid(self, synsetid):
         sid = self.ensure_sid(synsetid)
@@ -197,28 +470,30 @@ class WordnetSQL:
             for result in results:
                 self.sk_cache[result.sensekey] = result
 
+    @single_flight('wordnetsql')
+    @instrument('wordnetsql')
     def get_hypehypo(self, sid):
         ''' Get all hypernyms and hyponyms of a given synset
         '''
         sid = SynsetID.from_string(str(sid))
-        if sid in self.hypehypo_cache:
-            return self.hypehypo_cache[sid]
+        senses = self.hypehypo_cache.get(sid)
+        if senses is not None:
+            return senses
         result = None
         with Execution(self.schema) as exe:
             result = exe.schema.sss.select(where='ssynsetid = ? and linkid in (1,2,3,4, 11,12,13,14,15,16,40,50,81)',
                                            values=[sid.to_wnsql()],
                                            columns=['linkid', 'dpos', 'dsynsetid', 'dsensekey', 'dwordid'])
-        for r in result:
-            self.hypehypo_cache[sid].add(r)
-        return self.hypehypo_cache[sid]
+        return self.hypehypo_cache.put(sid, set(result))
 
     def cache_all_hypehypo(self):
         with Execution(self.schema) as exe:
             results = exe.schema.sss.select(columns=['linkid', 'dpos', 'dsynsetid', 'dsensekey', 'dwordid', 'ssynsetid'])
-            for result in results:
-                self.hypehypo_cache[result.ssynsetid].update(result)
+            sids = wnsql_to_sids([r.ssynsetid for r in results])
+            for sid, result in zip(sids, results):
+                self.hypehypo_cache.setdefault(sid, set()).add(result)
 
-    word_cache = dict()
+    word_cache = DictCache('wordnetsql_word')
 
     def get_hypehypo_text(self, sid):
         senses = self.get_hypehypo(sid)
@@ -229,8 +504,9 @@ class WordnetSQL:
             wordids = [sense.wordid for sense in senses]
             need_to_find = []
             for wordid in wordids:
-                if wordid in WordnetSQL.word_cache:
-                    lemmas.append(WordnetSQL.word_cache[wordid])
+                lemma = WordnetSQL.word_cache.get(wordid)
+                if lemma is not None:
+                    lemmas.append(lemma)
                 else:
                     need_to_find.append(str(wordid))
             if len(need_to_find) > 0:
@@ -278,8 +554,9 @@ class WordnetSQL:
         WordnetSQL.sense_map_cache = lemma_map
         return lemma_map
 
-    lemma_list_cache = dict()
+    lemma_list_cache = DictCache('wordnetsql_lemma_list')
 
+    @instrument('wordnetsql')
     def search_senses(self, lemma_list, pos=None, a_conn=None):
         if len(lemma_list) == 0:
             return list()
@@ -287,8 +564,9 @@ class WordnetSQL:
         CACHE_JOIN_TOKEN = '|\t'*12
         cache_key=CACHE_JOIN_TOKEN.join(lemma_list)
         # caching method
-        if cache_key in WordnetSQL.lemma_list_cache:
-            return WordnetSQL.lemma_list_cache[cache_key]
+        senses = WordnetSQL.lemma_list_cache.get(cache_key)
+        if senses is not None:
+            return senses
 
         # Build query lemma, pos, synsetid, sensekey, definition, tagcount
         _query = """SELECT lemma, pos, synsetid, sensekey, definition, tagcount 
@@ -318,14 +596,17 @@ class WordnetSQL:
         WordnetSQL.lemma_list_cache[cache_key] = senses
         return senses
     
-    sense_cache = dict()
+    sense_cache = DictCache('wordnetsql_sense')
+    @single_flight('wordnetsql')
+    @instrument('wordnetsql')
     def get_all_senses(self, lemma, pos=None):
         '''Get all senses of a lemma
 
         Return an object with the type of lelesk.SenseInfo
         '''
-        if (lemma, pos) in WordnetSQL.sense_cache:
-            return WordnetSQL.sense_cache[(lemma, pos)]
+        senses = WordnetSQL.sense_cache.get((lemma, pos))
+        if senses is not None:
+            return senses
         conn = self.get_conn()
         c = conn.cursor()
         if pos:
@@ -357,18 +638,19 @@ class WordnetSQL:
             result = c.execute("""SELECT lemma, pos, synsetid, sensekey, definition FROM wordsXsensesXsynsets;""").fetchall()
 
             for (lemma, pos, synsetid, sensekey, definition) in result:
-                if lemma not in WordnetSQL.sense_cache:
-                    WordnetSQL.sense_cache[lemma] = []
-                WordnetSQL.sense_cache[lemma].append(SenseInfo(SynsetID.from_string(synsetid), sensekey, '', definition))
+                WordnetSQL.sense_cache.setdefault(lemma, []).append(SenseInfo(SynsetID.from_string(synsetid), sensekey, '', definition))
 
+    @instrument('wordnetsql')
     def get_gloss_by_sk(self, sk):
         sid = self.get_senseinfo_by_sk(sk).get_full_sid()
         return self.get_gloss_by_id(sid)
     
-    gloss_cache = dict()
+    gloss_cache = DictCache('wordnetsql_gloss')
+    @instrument('wordnetsql')
     def get_gloss_by_id(self, sid):
-        if sid in WordnetSQL.gloss_cache:
-            return WordnetSQL.gloss_cache[sid]
+        a_sense = WordnetSQL.gloss_cache.get(sid, NOT_CACHED)
+        if a_sense is not NOT_CACHED:
+            return a_sense
         if not sid:
             return None
         gloss_file = self.search_by_id(sid)
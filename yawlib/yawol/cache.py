@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+HTTP response cache for yawol REST servers
+Latest version can be found at https://github.com/letuananh/yawlib
+
+Responses are cached as ready-to-send bytes, keyed by route and normalized query.
+ETags are derived from the WordNet DB file fingerprint and the cache key, so a
+conditional request (If-None-Match) can be answered with 304 without a lookup.
+The DB fingerprint is checked again at most every check_interval seconds, cached
+responses are dropped (and the on_change hook is called) when it changes.
+
+Usage:
+    rcache = ResponseCache(YLConfig.WNSQL30_PATH, on_change=service.invalidate)
+    query = normalize_query(synsetid)
+    key = rcache.make_key('synset', query)
+    etag = rcache.etag(key)
+    if rcache.not_modified(etag, if_none_match):
+        ...  # 304
+    resp = rcache.get(key, lambda: build_json_bytes())
+
+@author: Le Tuan Anh <tuananh.ke@gmail.com>
+'''
+
+# Copyright (c) 2017, Le Tuan Anh <tuananh.ke@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+__author__ = "Le Tuan Anh <tuananh.ke@gmail.com>"
+__copyright__ = "Copyright 2017, yawlib"
+__credits__ = []
+__license__ = "MIT"
+__version__ = "0.1"
+__maintainer__ = "Le Tuan Anh"
+__email__ = "<tuananh.ke@gmail.com>"
+__status__ = "Prototype"
+
+########################################################################
+
+import os
+import time
+import hashlib
+import logging
+
+from ..models import SynsetID
+from ..caching import LRUCache
+
+########################################################################
+
+logger = logging.getLogger(__name__)
+DEFAULT_MAX_AGE = 86400
+DEFAULT_CHECK_INTERVAL = 1.0  # seconds between DB fingerprint checks
+
+########################################################################
+
+
+def db_fingerprint(db_path):
+    ''' Fingerprint of a database file (size, modification time and inode) '''
+    try:
+        st = os.stat(db_path)
+        return '{:x}-{:x}-{:x}'.format(st.st_size, st.st_mtime_ns, st.st_ino)
+    except OSError:
+        logger.warning("Database file {} could not be found".format(db_path))
+        return 'nodb'
+
+
+def normalize_query(query):
+    ''' Normalize a query so that equivalent queries share a cache entry
+    (e.g. 01775164-v, 01775164v and v01775164 are the same synset)
+    '''
+    query = query.strip()
+    sid = SynsetID.parse(query)
+    return sid.to_canonical() if sid is not None else query
+
+
+class CachedResponse(object):
+    ''' A ready-to-send response (body is None when nothing was found) '''
+
+    __slots__ = ('status', 'body')
+
+    def __init__(self, status, body=None):
+        self.status = status
+        self.body = body
+
+
+class ResponseCache(object):
+
+    def __init__(self, db_path, maxsize=4096, max_age=DEFAULT_MAX_AGE, check_interval=DEFAULT_CHECK_INTERVAL, on_change=None):
+        ''' check_interval -- seconds between DB fingerprint checks (0: every request, None: only by refresh())
+        on_change -- called when the database has changed (e.g. YawolService.invalidate)
+        '''
+        self.db_path = db_path
+        self.max_age = max_age
+        self.check_interval = check_interval
+        self.on_change = on_change
+        self.fingerprint = db_fingerprint(db_path)
+        self.checked = time.monotonic()
+        self.cache = LRUCache(maxsize, name='response')
+
+    @property
+    def cache_control(self):
+        return 'public, max-age={}'.format(self.max_age)
+
+    def make_key(self, route, query):
+        return '{}/{}'.format(route, query)
+
+    def etag(self, key, variant=''):
+        ''' Strong ETag of a response (variant: e.g. JSONP callback) '''
+        self.check()
+        digest = hashlib.sha1('\0'.join((self.fingerprint, key, variant)).encode('utf-8')).hexdigest()
+        return '"{}"'.format(digest)
+
+    def not_modified(self, etag, if_none_match):
+        ''' Check an If-None-Match header value against an ETag '''
+        if not if_none_match:
+            return False
+        if if_none_match.strip() == '*':
+            return True
+        for tag in if_none_match.split(','):
+            tag = tag.strip()
+            if tag.startswith('W/'):
+                tag = tag[2:]
+            if tag == etag:
+                return True
+        return False
+
+    def cached(self, key):
+        ''' Get a cached response (None if it has not been cached) '''
+        self.check()
+        return self.cache.get(key)
+
+    def build(self, key, compute):
+        ''' Build a response with compute() and cache it
+        compute() returns JSON bytes, a generator of bytes chunks or None (not found)
+        '''
+        data = compute()
+        if data is None:
+            resp = CachedResponse(404)
+        else:
+            if not isinstance(data, bytes):
+                data = b''.join(data)
+            resp = CachedResponse(200, data)
+        return self.cache.put(key, resp)
+
+    def get(self, key, compute):
+        ''' Get a cached response or build it with compute() '''
+        resp = self.cached(key)
+        if resp is None:
+            resp = self.build(key, compute)
+        return resp
+
+    def check(self):
+        ''' refresh() if the fingerprint has not been checked for check_interval seconds '''
+        if self.check_interval is None:
+            return False
+        now = time.monotonic()
+        if now - self.checked < self.check_interval:
+            return False
+        return self.refresh()
+
+    def refresh(self):
+        ''' Drop all cached responses (and call on_change) if the database file has changed '''
+        self.checked = time.monotonic()
+        fingerprint = db_fingerprint(self.db_path)
+        if fingerprint != self.fingerprint:
+            self.fingerprint = fingerprint
+            if self.on_change is not None:
+                self.on_change()
+            self.cache.clear()
+            return True
+        return False
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+Lookups behind yawol REST routes, independent of web frameworks
+Latest version can be found at https://github.com/letuananh/yawlib
+
+Lookup methods return JSON bytes, a generator of JSON bytes chunks or None (not found).
+
+@author: Le Tuan Anh <tuananh.ke@gmail.com>
+'''
+
+# Copyright (c) 2017, Le Tuan Anh <tuananh.ke@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+__author__ = "Le Tuan Anh <tuananh.ke@gmail.com>"
+__copyright__ = "Copyright 2017, yawlib"
+__credits__ = []
+__license__ = "MIT"
+__version__ = "0.1"
+__maintainer__ = "Le Tuan Anh"
+__email__ = "<tuananh.ke@gmail.com>"
+__status__ = "Prototype"
+
+########################################################################
+
+import json
+import time
+import logging
+from collections import OrderedDict
+
+from ..models import POS, SynsetID
+from ..caching import LRUCache
+from ..serializer import SynsetSerializer
+
+########################################################################
+
+logger = logging.getLogger(__name__)
+MAX_BATCH_SIZE = 1000
+MAX_BATCH_BYTES = 1048576  # maximum size of a batch request body
+MAX_COMPLETIONS = 100
+NEGATIVE_CACHE_SIZE = 65536
+NEGATIVE_CACHE_TTL = 300  # seconds a query which could not be found is remembered
+# query kinds
+QUERY_SID = 'sid'
+QUERY_SK = 'sk'
+QUERY_LEMMA = 'lemma'
+EXPORT_FIELDS = ('synsetid', 'definition', 'lemmas', 'sensekeys', 'tagcount', 'examples')
+
+########################################################################
+
+
+class ServiceError(Exception):
+    ''' Invalid request (status is the HTTP status code to respond with) '''
+
+    def __init__(self, message, status=400):
+        Exception.__init__(self, message)
+        self.status = status
+
+
+class BatchError(ServiceError):
+    ''' Invalid batch request '''
+    pass
+
+
+def split_pos(query):
+    ''' love/n => ('love', 'n'), love => ('love', None) '''
+    lemma, sep, pos = query.rpartition('/')
+    if sep and lemma and pos in POS.POSES:
+        return lemma, pos
+    return query, None
+
+
+def classify_query(query):
+    ''' Classify a query by its syntax (no database access, no exceptions)
+    Return one of ('sid', SynsetID), ('sk', sensekey) or ('lemma', (lemma, pos))
+    '''
+    query = query.strip()
+    if '%' in query:
+        return QUERY_SK, query
+    sid = SynsetID.parse(query)
+    if sid is not None:
+        return QUERY_SID, sid
+    return QUERY_LEMMA, split_pos(query)
+
+
+def filter_pos(synsets, pos):
+    ''' Keep synsets of a POS (a includes adjective satellites) '''
+    if not pos:
+        return list(synsets)
+    poses = 'as' if pos == 'a' else pos
+    return [ss for ss in synsets if ss.sid.pos in poses]
+
+
+class YawolService(object):
+
+    def __init__(self, wsql, serializer=None, max_batch_size=MAX_BATCH_SIZE, negative_cache_size=NEGATIVE_CACHE_SIZE,
+                 max_batch_bytes=MAX_BATCH_BYTES, negative_ttl=NEGATIVE_CACHE_TTL):
+        self.wsql = wsql
+        self.serializer = serializer if serializer is not None else SynsetSerializer()
+        self.max_batch_size = max_batch_size
+        self.max_batch_bytes = max_batch_bytes
+        self.negative_ttl = negative_ttl
+        # classified queries which could not be found => expiry time
+        # (cleared by invalidate() when the database changes)
+        self.misses = LRUCache(negative_cache_size, name='negative')
+
+    def is_missed(self, key):
+        ''' Check if a classified query could not be found within the last negative_ttl seconds '''
+        expires = self.misses.get(key)
+        if expires is None:
+            return False
+        if expires > time.monotonic():
+            return True
+        self.misses.pop(key)
+        return False
+
+    def add_miss(self, key):
+        self.misses.put(key, time.monotonic() + self.negative_ttl)
+
+    def lookup(self, kind, value):
+        ''' Find synsets of a classified query with a single indexed lookup '''
+        if self.is_missed((kind, value)):
+            return []
+        if kind == QUERY_SID:
+            ss = self.wsql.get_synset_by_id(value)
+            synsets = [ss] if ss is not None else []
+        elif kind == QUERY_SK:
+            ss = self.wsql.get_synset_by_sk(value)
+            synsets = [ss] if ss is not None else []
+        else:
+            lemma, pos = value
+            synsets = filter_pos(self.wsql.get_synsets_by_lemma(lemma), pos)
+        if not synsets:
+            self.add_miss((kind, value))
+        return synsets
+
+    def invalidate(self):
+        ''' Forget cached misses and DAO caches (called when the database has changed) '''
+        self.misses.clear()
+        self.wsql.clear_caches()
+
+    def get_synset(self, synsetid):
+        sid = SynsetID.parse(synsetid)
+        if sid is not None:
+            synsets = self.lookup(QUERY_SID, sid)
+            if synsets:
+                return self.serializer.synset(synsets[0])
+
+    def search(self, query):
+        ''' Search by synsetID, sensekey or lemma (optionally with POS, e.g. love/n) '''
+        synsets = self.lookup(*classify_query(query))
+        if synsets:
+            return self.serializer.iter_collection(synsets)
+
+    def check_batch_bytes(self, size):
+        ''' Reject a batch request body of size bytes (can be checked while the body is being read) '''
+        if size > self.max_batch_bytes:
+            raise BatchError("Batch request is too large (maximum: {} bytes)".format(self.max_batch_bytes), status=413)
+
+    def read_batch(self, body):
+        ''' Parse the body of a batch request
+        body -- JSON {"queries": [...]} or a JSON array of queries
+        '''
+        self.check_batch_bytes(len(body))
+        try:
+            data = json.loads(body.decode('utf-8') if isinstance(body, bytes) else body)
+        except ValueError:
+            raise BatchError("Batch request must be a JSON document")
+        queries = data.get('queries') if isinstance(data, dict) else data
+        if not isinstance(queries, list) or not all(isinstance(q, str) for q in queries):
+            raise BatchError("Batch queries must be a list of strings")
+        if len(queries) > self.max_batch_size:
+            raise BatchError("Too many queries (maximum: {})".format(self.max_batch_size), status=413)
+        return queries
+
+    def batch(self, queries):
+        ''' Resolve synset IDs, sensekeys and lemmas (optionally with POS, e.g. love/n) at once
+        Return a generator of JSON bytes chunks ({query: [synsets], ...})
+        '''
+        return self.serializer.iter_mapping(self.resolve(queries).items())
+
+    def resolve(self, queries):
+        ''' Resolve many queries with one bulk DAO call per query kind
+        Return an ordered map from query to a list of synsets
+        '''
+        queries = {q: classify_query(q) for q in queries}
+        found = {QUERY_SID: {}, QUERY_SK: {}, QUERY_LEMMA: {}}
+        pending = {QUERY_SID: set(), QUERY_SK: set(), QUERY_LEMMA: set()}
+        for kind, value in queries.values():
+            if not self.is_missed((kind, value)):
+                pending[kind].add(value[0] if kind == QUERY_LEMMA else value)
+        if pending[QUERY_SID]:
+            found[QUERY_SID] = self.wsql.get_synsets_by_ids(pending[QUERY_SID])
+        if pending[QUERY_SK]:
+            found[QUERY_SK] = self.wsql.get_synsets_by_sks(pending[QUERY_SK])
+        if pending[QUERY_LEMMA]:
+            found[QUERY_LEMMA] = self.wsql.get_synsets_by_lemmas(pending[QUERY_LEMMA])
+        results = OrderedDict()
+        for query, (kind, value) in queries.items():
+            if kind == QUERY_LEMMA:
+                synsets = filter_pos(found[kind].get(value[0], ()), value[1])
+            else:
+                ss = found[kind].get(value)
+                synsets = [ss] if ss is not None else []
+            if not synsets:
+                self.add_miss((kind, value))
+            results[query] = synsets
+        return results
+
+    def export(self, pos=None, fields=None, since_id=None):
+        ''' Export synsets as newline-delimited JSON ordered by synset ID
+        pos -- n, v, a (includes adjective satellites), r or s
+        fields -- comma-separated keys to keep (synsetid is always kept)
+        since_id -- resume an export after this synset ID
+        Return a generator of JSON bytes chunks, one page of synsets is read at a time
+        '''
+        if pos and pos not in POS.POSES:
+            raise ServiceError("Invalid POS: {}".format(pos))
+        if fields:
+            fields = [f.strip() for f in fields.split(',') if f.strip()]
+            invalid = [f for f in fields if f not in EXPORT_FIELDS]
+            if invalid:
+                raise ServiceError("Invalid fields: {} (available: {})".format(', '.join(invalid), ', '.join(EXPORT_FIELDS)))
+            fields = [f for f in EXPORT_FIELDS if f == 'synsetid' or f in fields]
+        sid = None
+        if since_id:
+            sid = SynsetID.parse(since_id.strip())
+            if sid is None:
+                raise ServiceError("Invalid synset ID: {}".format(since_id))
+        synsets = self.wsql.iter_synsets(since_id=sid, pos='as' if pos == 'a' else pos)
+        return self.serializer.iter_lines(synsets, fields or None)
+
+    def complete(self, prefix, limit=10, pos=None):
+        ''' Lemmas which start with prefix (JSON array, most frequent first) '''
+        try:
+            limit = min(max(int(limit), 1), MAX_COMPLETIONS)
+        except (TypeError, ValueError):
+            limit = 10
+        return self.serializer.dumps(self.wsql.complete(prefix, limit, pos or None))
+
+    def version(self, server, version):
+        return self.serializer.dumps({'product': 'yawol',
+                                      'version': version,
+                                      'server': server})
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+Warm up yawol caches once in the master process before workers are forked
+Latest version can be found at https://github.com/letuananh/yawlib
+
+Usage (e.g. gunicorn with preload_app = True, see gunicorn.conf.py):
+    warmup(service, response_cache)
+
+The lemma index is stored in a few flat buffers (UTF-8 bytes, offset and
+tagcount arrays), reading it does not touch per-lemma objects so its pages stay
+shared with the workers. Cached responses are ordinary Python objects, reference
+counting and LRU bookkeeping write to them, so a worker copies the pages of the
+responses it serves (they are still computed only once). SQLite connections
+opened during warm-up are closed so that workers never share them, and
+gc.freeze() keeps the garbage collector in workers from writing to objects
+loaded so far.
+
+@author: Le Tuan Anh <tuananh.ke@gmail.com>
+'''
+
+# Copyright (c) 2017, Le Tuan Anh <tuananh.ke@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+__author__ = "Le Tuan Anh <tuananh.ke@gmail.com>"
+__copyright__ = "Copyright 2017, yawlib"
+__credits__ = []
+__license__ = "MIT"
+__version__ = "0.1"
+__maintainer__ = "Le Tuan Anh"
+__email__ = "<tuananh.ke@gmail.com>"
+__status__ = "Prototype"
+
+########################################################################
+
+import gc
+import os
+import time
+import logging
+
+from .cache import normalize_query
+
+########################################################################
+
+logger = logging.getLogger(__name__)
+PRELOAD_ENV = 'YAWOL_PRELOAD'
+TOP_LEMMAS = 1000
+
+########################################################################
+
+
+def preload_enabled():
+    ''' Warm-up is enabled by the YAWOL_PRELOAD environment variable (1, true or yes) '''
+    return os.environ.get(PRELOAD_ENV, '').lower() in ('1', 'true', 'yes')
+
+
+def warmup(service, response_cache=None, top=TOP_LEMMAS, freeze=True):
+    ''' Load hot caches of a YawolService
+    - the lemma index and completions of one-letter prefixes (autocomplete)
+    - search responses of the top most frequent lemmas (when a response cache is given)
+    Return a dict of statistics
+    '''
+    start = time.perf_counter()
+    index = service.wsql.get_lemma_index()
+    # memoize top completions of one-letter prefixes
+    for prefix in {lemma[:1] for lemma in index}:
+        index.complete(prefix)
+    responses = 0
+    if response_cache is not None and top:
+        for lemma in index.complete('', top):
+            query = normalize_query(lemma)
+            response_cache.get(response_cache.make_key('search', query), lambda: service.search(query))
+            responses += 1
+    # connections must not be shared with forked workers
+    service.wsql.close()
+    gc.collect()
+    if freeze and hasattr(gc, 'freeze'):
+        gc.freeze()
+    stats = {'lemmas': len(index), 'responses': responses, 'seconds': time.perf_counter() - start}
+    logger.info("Yawol warm-up: {lemmas} lemmas indexed, {responses} responses cached in {seconds:.2f}s".format(**stats))
+    return stats
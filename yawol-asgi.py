@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+YAWOL - Yet Another Wordnet Online (REST server, ASGI/asyncio version)
+Latest version can be found at https://github.com/letuananh/yawlib
+
+Same routes as yawol-flask. DAO calls are dispatched to a bounded thread pool,
+each thread uses its own read-only SQLite connection. When too many lookups are
+pending, new ones wait for a short while and are then rejected with 503.
+
+Usage:
+    python3 yawol-asgi.py --port 5000 --threads 8 --max-pending 256
+    gunicorn -c gunicorn.conf.py -k uvicorn.workers.UvicornWorker 'yawol-asgi:create_app()'
+
+uvicorn is needed to run this script, the app object (YawolASGI) can be
+served by any other ASGI server as well.
+
+@author: Le Tuan Anh <tuananh.ke@gmail.com>
+'''
+
+# Copyright (c) 2017, Le Tuan Anh <tuananh.ke@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+__author__ = "Le Tuan Anh <tuananh.ke@gmail.com>"
+__copyright__ = "Copyright 2017, yawlib"
+__credits__ = []
+__license__ = "MIT"
+__version__ = "0.1"
+__maintainer__ = "Le Tuan Anh"
+__email__ = "<tuananh.ke@gmail.com>"
+__status__ = "Prototype"
+
+########################################################################
+
+import time
+import asyncio
+import logging
+import argparse
+from urllib.parse import parse_qs
+from concurrent.futures import ThreadPoolExecutor
+
+from yawlib import YLConfig
+from yawlib import WordnetSQL as WSQL
+from yawlib.metrics import REGISTRY, REQUEST_SECONDS, CONTENT_TYPE
+from yawlib.singleflight import AsyncSingleFlight
+from yawlib.yawol import ResponseCache, YawolService, ServiceError, BatchError, normalize_query
+from yawlib.yawol import warmup, preload_enabled
+
+try:
+    import uvicorn
+except ImportError:
+    uvicorn = None
+
+
+# ---------------------------------------------------------------------
+# CONFIGURATION
+# ---------------------------------------------------------------------
+logger = logging.getLogger(__name__)
+SERVER_NAME = 'yawol-asgi/asyncio'
+JSON = 'application/json'
+JSONP = 'application/javascript'
+NDJSON = 'application/x-ndjson'
+SERVER_BUSY = (503, 'text/plain', [('retry-after', '1')], b'Server is busy')
+
+
+class YawolASGI(object):
+
+    ROUTES = {'synset': 'get_synset', 'search': 'search'}
+    # route labels of the request latency metric
+    ROUTE_NAMES = {'': 'index', 'version': 'version', 'synset': 'get_synset', 'search': 'search',
+                   'complete': 'complete', 'batch': 'batch', 'export': 'export', 'metrics': 'metrics'}
+
+    def __init__(self, db_path, threads=8, max_pending=256, queue_timeout=1.0):
+        self.wsql = WSQL(db_path)
+        self.service = YawolService(self.wsql)
+        self.response_cache = ResponseCache(db_path, on_change=self.service.invalidate)
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='yawol-dao')
+        self.max_pending = max_pending
+        self.queue_timeout = queue_timeout
+        self.limiter = None  # created in the running event loop
+        # identical concurrent lookups share one DAO call (CachedResponses are not modified, no copies)
+        self.flights = AsyncSingleFlight('yawol-asgi', copy_result=None)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+        elif scope['type'] == 'http':
+            start = time.perf_counter()
+            status, content_type, headers, body = await self.handle(scope, receive)
+            headers = [(k.encode('latin-1'), v.encode('latin-1')) for k, v in headers]
+            if content_type:
+                headers.append((b'content-type', content_type.encode('latin-1')))
+            if isinstance(body, bytes):
+                headers.append((b'content-length', str(len(body)).encode('latin-1')))
+                body = [body]
+            await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+            # body is sent in chunks (large batches, exports)
+            if hasattr(body, '__aiter__'):
+                async for chunk in body:
+                    await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            else:
+                for chunk in body:
+                    await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            await send({'type': 'http.response.body', 'body': b''})
+            REQUEST_SECONDS.labels(self.route_name(scope['path']), status).observe(time.perf_counter() - start)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                self.limiter = asyncio.Semaphore(self.max_pending)
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.shutdown()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
+        self.wsql.close()
+
+    async def handle(self, scope, receive):
+        parts = scope['path'].split('/', 3)
+        # parts: ['', 'yawol', route, query]
+        if len(parts) < 3 or parts[0] or parts[1] != 'yawol':
+            return 404, 'text/plain', [], b'Not found'
+        route = parts[2]
+        if route == 'batch' and len(parts) == 3:
+            if scope['method'] != 'POST':
+                return 405, 'text/plain', [('allow', 'POST')], b'Method not allowed'
+            return await self.batch(scope, receive)
+        elif scope['method'] != 'GET':
+            return 405, 'text/plain', [('allow', 'GET')], b'Method not allowed'
+        params = parse_qs(scope.get('query_string', b'').decode('utf-8'))
+        callback = params['callback'][0] if 'callback' in params else ''
+        if route == '' and len(parts) == 3:
+            return 200, 'text/html', [], 'Yawol {yv} - {sn}'.format(yv=__version__, sn=SERVER_NAME).encode('utf-8')
+        elif route == 'export' and len(parts) == 3:
+            try:
+                chunks = self.service.export(*(params[k][0] if k in params else None for k in ('pos', 'fields', 'since_id')))
+            except ServiceError as e:
+                return e.status, 'text/plain', [], str(e).encode('utf-8')
+            return 200, NDJSON, [], self.iter_chunks(chunks)
+        elif route == 'metrics' and len(parts) == 3:
+            return 200, CONTENT_TYPE, [], REGISTRY.render().encode('utf-8')
+        elif route == 'version' and len(parts) == 3:
+            return self.respond(self.service.version(SERVER_NAME, __version__), callback)
+        elif route in self.ROUTES and len(parts) == 4 and parts[3]:
+            return await self.lookup(self.ROUTES[route], parts[3], callback, scope)
+        elif route == 'complete' and len(parts) == 4 and parts[3]:
+            limit = params['limit'][0] if 'limit' in params else 10
+            pos = params['pos'][0] if 'pos' in params else None
+            try:
+                data = await self.run_dao(self.service.complete, parts[3], limit, pos)
+            except asyncio.TimeoutError:
+                return SERVER_BUSY
+            return self.respond(data, callback)
+        return 404, 'text/plain', [], b'Not found'
+
+    async def lookup(self, func_name, query, callback, scope):
+        query = normalize_query(query)
+        key = self.response_cache.make_key(func_name, query)
+        etag = self.response_cache.etag(key, callback)
+        headers = [('etag', etag), ('cache-control', self.response_cache.cache_control)]
+        if self.response_cache.not_modified(etag, self.get_header(scope, b'if-none-match')):
+            return 304, None, headers, b''
+        resp = self.response_cache.cached(key)
+        if resp is None:
+            lookup_func = getattr(self.service, func_name)
+            try:
+                resp = await self.flights.do(key, self.run_dao, self.response_cache.build, key, lambda: lookup_func(query))
+            except asyncio.TimeoutError:
+                return SERVER_BUSY
+        if resp.body is None:
+            return 404, 'text/plain', [], b'Not found'
+        status, content_type, _, body = self.respond(resp.body, callback)
+        return status, content_type, headers, body
+
+    async def batch(self, scope, receive):
+        try:
+            # oversized bodies are rejected before (content-length) or while they are read
+            length = self.get_header(scope, b'content-length')
+            if length and length.isdigit():
+                self.service.check_batch_bytes(int(length))
+            body = []
+            size = 0
+            more_body = True
+            while more_body:
+                message = await receive()
+                chunk = message.get('body', b'')
+                size += len(chunk)
+                self.service.check_batch_bytes(size)
+                body.append(chunk)
+                more_body = message.get('more_body', False)
+            queries = self.service.read_batch(b''.join(body))
+        except BatchError as e:
+            return e.status, 'text/plain', [], str(e).encode('utf-8')
+        try:
+            # synsets are looked up here, the response is serialized while it is being sent
+            chunks = await self.run_dao(self.service.batch, queries)
+        except asyncio.TimeoutError:
+            return SERVER_BUSY
+        return 200, JSON, [], self.iter_chunks(chunks)
+
+    async def run_dao(self, func, *args):
+        ''' Run a DAO call in the thread pool (at most max_pending calls are pending)
+        asyncio.TimeoutError is raised when no slot is free after queue_timeout seconds
+        '''
+        if self.limiter is None:
+            self.limiter = asyncio.Semaphore(self.max_pending)
+        await asyncio.wait_for(self.limiter.acquire(), self.queue_timeout)
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+        finally:
+            self.limiter.release()
+
+    def route_name(self, path):
+        parts = path.split('/', 3)
+        if len(parts) >= 3 and parts[1] == 'yawol':
+            return self.ROUTE_NAMES.get(parts[2], 'unknown')
+        return 'unknown'
+
+    async def iter_chunks(self, chunks):
+        ''' Pull chunks from a blocking generator in the DAO thread pool (one chunk at a time) '''
+        while True:
+            chunk = await self.run_dao(next, chunks, None)
+            if chunk is None:
+                return
+            yield chunk
+
+    def respond(self, data, callback=''):
+        if callback:
+            return 200, JSONP, [], b''.join((callback.encode('utf-8'), b'(', data, b')'))
+        else:
+            return 200, JSON, [], data
+
+    def get_header(self, scope, name):
+        for key, value in scope['headers']:
+            if key == name:
+                return value.decode('latin-1')
+        return None
+
+
+def create_app(db_path=YLConfig.WNSQL30_PATH, **kwargs):
+    ''' App factory for gunicorn
+    Caches are warmed up here (YAWOL_PRELOAD), i.e. once in the master process when preload_app is set,
+    lifespan startup runs in every worker
+    '''
+    app = YawolASGI(db_path, **kwargs)
+    if preload_enabled():
+        warmup(app.service, app.response_cache)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Yawol REST server (ASGI/asyncio)")
+    parser.add_argument('-d', '--db', help='Path to WordNet SQLite DB', default=YLConfig.WNSQL30_PATH)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('-p', '--port', type=int, default=5000)
+    parser.add_argument('-t', '--threads', type=int, default=8, help='Number of DAO threads')
+    parser.add_argument('--max-pending', type=int, default=256, help='Maximum number of pending DAO lookups')
+    parser.add_argument('--queue-timeout', type=float, default=1.0, help='Seconds to wait for a free slot before responding 503')
+    args = parser.parse_args()
+    if uvicorn is None:
+        print("uvicorn is required to run yawol-asgi (pip install uvicorn)")
+        return
+    app = YawolASGI(args.db, threads=args.threads, max_pending=args.max_pending, queue_timeout=args.queue_timeout)
+    uvicorn.run(app, host=args.host, port=args.port, log_level='warning')
+
+
+if __name__ == '__main__':
+    main()
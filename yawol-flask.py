@@ -45,15 +45,17 @@ __status__ = "Prototype"
 
 ########################################################################
 
-import json
+import time
 import logging
 import flask
-from flask import Flask, Response, abort
+from flask import Flask, Response, abort, g
 from functools import wraps
 from flask import request
 from yawlib import YLConfig
-from yawlib import SynsetID, SynsetCollection
 from yawlib import WordnetSQL as WSQL
+from yawlib.metrics import REGISTRY, REQUEST_SECONDS, CONTENT_TYPE
+from yawlib.yawol import ResponseCache, YawolService, ServiceError, BatchError, normalize_query
+from yawlib.yawol import warmup, preload_enabled
 
 
 # ---------------------------------------------------------------------
@@ -62,57 +64,121 @@ from yawlib import WordnetSQL as WSQL
 logger = logging.getLogger(__name__)
 app = Flask(__name__, static_url_path="")
 wsql = WSQL(YLConfig.WNSQL30_PATH)
+service = YawolService(wsql)
+response_cache = ResponseCache(YLConfig.WNSQL30_PATH, on_change=service.invalidate)
+# request bodies (batch) larger than this are rejected with 413 while they are read
+app.config['MAX_CONTENT_LENGTH'] = service.max_batch_bytes
+if preload_enabled():
+    # e.g. gunicorn -c gunicorn.conf.py yawol-flask:app
+    warmup(service, response_cache)
+
+
+@app.before_request
+def start_timer():
+    g.start_time = time.perf_counter()
+
+
+@app.after_request
+def record_latency(response):
+    ''' Streamed bodies are timed until the first chunk '''
+    start = getattr(g, 'start_time', None)
+    if start is not None:
+        REQUEST_SECONDS.labels(request.endpoint or 'unknown', response.status_code).observe(time.perf_counter() - start)
+    return response
 
 
 # Adopted from: http://flask.pocoo.org/snippets/79/
 def jsonp(func):
-    """Wraps JSONified output for JSONP requests."""
+    """Wraps JSONified output for JSONP requests.
+    Views return JSON bytes or a generator of JSON bytes chunks."""
     @wraps(func)
     def decorated_function(*args, **kwargs):
         data = func(*args, **kwargs)
         callback = request.args.get('callback', False)
         if callback:
-            content = "{}({})".format(str(callback), data)
+            content = wrap_callback(str(callback).encode('utf-8'), data)
             return Response(content, mimetype="application/javascript")
         else:
             return Response(data, mimetype="application/json")
     return decorated_function
 
 
+def wrap_callback(callback, data):
+    yield callback + b'('
+    if isinstance(data, bytes):
+        yield data
+    else:
+        yield from data
+    yield b')'
+
+
+def cached(func):
+    """Serves a view from the response cache (ETag/304, Cache-Control).
+    Views return JSON bytes, a generator of JSON bytes chunks or None (not found)."""
+    @wraps(func)
+    def decorated_function(*args, **kwargs):
+        query = normalize_query(args[0] if args else next(iter(kwargs.values())))
+        key = response_cache.make_key(func.__name__, query)
+        callback = request.args.get('callback', '')
+        etag = response_cache.etag(key, callback)
+        headers = {'ETag': etag, 'Cache-Control': response_cache.cache_control}
+        if response_cache.not_modified(etag, request.headers.get('If-None-Match')):
+            return Response(status=304, headers=headers)
+        resp = response_cache.get(key, lambda: func(query))
+        if resp.body is None:
+            abort(404)
+        if callback:
+            content = b''.join(wrap_callback(str(callback).encode('utf-8'), resp.body))
+            return Response(content, mimetype="application/javascript", headers=headers)
+        else:
+            return Response(resp.body, mimetype="application/json", headers=headers)
+    return decorated_function
+
+
 @app.route('/yawol/synset/<synsetid>', methods=['GET'])
-@jsonp
+@cached
 def get_synset(synsetid):
-    ss = wsql.get_synset_by_id(synsetid)
-    if ss is not None:
-        return ss.to_json_str()
-    else:
-        abort(404)
+    return service.get_synset(synsetid)
 
 
 @app.route('/yawol/search/<query>', methods=['GET'])
-@jsonp
+@cached
 def search(query):
-    # assume that query is a synset?
+    return service.search(query)
+
+
+@app.route('/yawol/complete/<prefix>', methods=['GET'])
+@jsonp
+def complete(prefix):
+    return service.complete(prefix, request.args.get('limit', 10), request.args.get('pos'))
+
+
+@app.route('/yawol/batch', methods=['POST'])
+def batch():
+    ''' Resolve many synset IDs, sensekeys and lemmas in one request
+    Body: {"queries": ["01775164-v", "love%2:37:00::", "love/n", ...]} '''
     try:
-        sid = SynsetID.from_string(query)
-        ss = wsql.get_synset_by_id(sid)
-        if ss is not None:
-            return SynsetCollection().add(ss).to_json_str()
-    except Exception as e:
-        # not synsetid
-        logger.exception(e, "Invalid synset ID")
-        pass
-    # try search by lemma
-    synsets = wsql.get_synsets_by_lemma(query)
-    if synsets:
-        return synsets.to_json_str()
-    else:
-        # search by sensekey
-        ss = wsql.get_synset_by_sk(query)
-        if ss:
-            return SynsetCollection().add(ss).to_json_str()
-    # invalid query
-    abort(404)
+        queries = service.read_batch(request.get_data())
+    except BatchError as e:
+        return Response(str(e), status=e.status, mimetype='text/plain')
+    return Response(service.batch(queries), mimetype="application/json")
+
+
+@app.route('/yawol/export', methods=['GET'])
+def export():
+    ''' Stream synsets as newline-delimited JSON ordered by synset ID
+    Query: ?pos=n&fields=lemmas,definition&since_id=<last synsetid received> '''
+    try:
+        chunks = service.export(request.args.get('pos'), request.args.get('fields'), request.args.get('since_id'))
+    except ServiceError as e:
+        return Response(str(e), status=e.status, mimetype='text/plain')
+    return Response(chunks, mimetype="application/x-ndjson")
+
+
+@app.route('/yawol/metrics', methods=['GET'])
+def metrics():
+    ''' Metrics in Prometheus text format '''
+    return Response(REGISTRY.render(), content_type=CONTENT_TYPE)
 
 
 @app.route('/yawol/', methods=['GET'])
@@ -123,9 +189,7 @@ def index():
 @app.route('/yawol/version', methods=['GET'])
 @jsonp
 def version():
-    return json.dumps({'product': 'yawol',
-                       'version': __version__,
-                       'server': 'yawol-flask/Flask-{}'.format(flask.__version__)})
+    return service.version('yawol-flask/Flask-{}'.format(flask.__version__), __version__)
 
 
 if __name__ == '__main__':
@@ -3,3 +3,11 @@ from django.apps import AppConfig
 
 class YawoldjangoConfig(AppConfig):
     name = 'yawoldjango'
+
+    def ready(self):
+        ''' Warm up yawol caches when YAWOL_PRELOAD is set
+        (with gunicorn preload_app this runs once in the master process, see gunicorn.conf.py) '''
+        from yawlib.yawol import warmup, preload_enabled
+        if preload_enabled():
+            from . import views
+            warmup(views.service, views.response_cache)
@@ -6,5 +6,9 @@ urlpatterns = [
     url(r'^$', views.index, name='index'),
     url(r'^synset/(?P<synsetid>\w+)$', views.get_synset, name='synset'),
     url(r'^search/(?P<query>.+)$', views.search, name='search'),
+    url(r'^complete/(?P<prefix>.+)$', views.complete, name='complete'),
+    url(r'^batch$', views.batch, name='batch'),
+    url(r'^export$', views.export, name='export'),
+    url(r'^metrics$', views.metrics, name='metrics'),
     url(r'^version/?$', views.version, name='version')
 ]
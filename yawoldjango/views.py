@@ -45,13 +45,17 @@ __status__ = "Prototype"
 
 ########################################################################
 
-import json
+import time
 import logging
 import django
-from django.http import HttpResponse, Http404
+from functools import wraps
+from django.http import HttpResponse, HttpResponseNotModified, StreamingHttpResponse, Http404
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
 from yawlib import YLConfig
-from yawlib import SynsetID, SynsetCollection
 from yawlib import WordnetSQL as WSQL
+from yawlib.metrics import REGISTRY, REQUEST_SECONDS, CONTENT_TYPE
+from yawlib.yawol import ResponseCache, YawolService, ServiceError, BatchError, normalize_query
 
 
 # ---------------------------------------------------------------------
@@ -59,74 +63,158 @@ from yawlib import WordnetSQL as WSQL
 # ---------------------------------------------------------------------
 logger = logging.getLogger(__name__)
 wsql = WSQL(YLConfig.WNSQL30_PATH)
+service = YawolService(wsql)
+response_cache = ResponseCache(YLConfig.WNSQL30_PATH, on_change=service.invalidate)
+
+
+def timed(func):
+    ''' Record the latency of a view (streamed bodies are timed until the first chunk) '''
+    @wraps(func)
+    def decorator(request, *args, **kwargs):
+        start = time.perf_counter()
+        status = 500
+        try:
+            response = func(request, *args, **kwargs)
+            status = response.status_code
+            return response
+        except Http404:
+            status = 404
+            raise
+        finally:
+            REQUEST_SECONDS.labels(func.__name__, status).observe(time.perf_counter() - start)
+    return decorator
 
 
 def jsonp(func):
-    ''' JSON/JSONP decorator '''
+    ''' JSON/JSONP decorator
+    Views return JSON bytes, a generator of JSON bytes chunks or a JSON-serializable object '''
+    @wraps(func)
     def decorator(request, *args, **kwargs):
         objects = func(request, *args, **kwargs)
         # ignore HttpResponse
         if isinstance(objects, HttpResponse):
             return objects
         # JSON/JSONP response
-        data = json.dumps(objects)
+        if isinstance(objects, (dict, list)):
+            data = service.serializer.dumps(objects)
+        else:
+            data = objects
         if 'callback' in request.GET:
             callback = request.GET['callback']
         elif 'callback' in request.POST:
             callback = request.POST['callback']
-        else:
+        elif isinstance(data, bytes):
             return HttpResponse(data, "application/json")
+        else:
+            return StreamingHttpResponse(data, "application/json")
         # is JSONP
         # logging.debug("A jsonp response")
-        data = '{c}({d});'.format(c=callback, d=data)
-        return HttpResponse(data, "application/javascript")
+        return StreamingHttpResponse(wrap_callback(callback.encode('utf-8'), data), "application/javascript")
     return decorator
 
 
-@jsonp
+def wrap_callback(callback, data):
+    yield callback + b'('
+    if isinstance(data, bytes):
+        yield data
+    else:
+        yield from data
+    yield b');'
+
+
+def cached(func):
+    ''' Response cache decorator (ETag/304, Cache-Control)
+    Views return JSON bytes, a generator of JSON bytes chunks or None (not found) '''
+    @wraps(func)
+    def decorator(request, *args, **kwargs):
+        query = normalize_query(args[0] if args else next(iter(kwargs.values())))
+        key = response_cache.make_key(func.__name__, query)
+        callback = request.GET.get('callback', request.POST.get('callback', ''))
+        etag = response_cache.etag(key, callback)
+        if response_cache.not_modified(etag, request.META.get('HTTP_IF_NONE_MATCH')):
+            response = HttpResponseNotModified()
+        else:
+            resp = response_cache.get(key, lambda: func(request, query))
+            if resp.body is None:
+                raise Http404("Invalid query")
+            if callback:
+                response = HttpResponse(b''.join(wrap_callback(callback.encode('utf-8'), resp.body)), "application/javascript")
+            else:
+                response = HttpResponse(resp.body, "application/json")
+        response['ETag'] = etag
+        response['Cache-Control'] = response_cache.cache_control
+        return response
+    return decorator
+
+
+@timed
+@cached
 def get_synset(request, synsetid):
     ''' Get a synset by ID
     Mapping: /yawol/synset/<synsetID> '''
-    ss = wsql.get_synset_by_id(synsetid)
-    if ss is not None:
-        return ss.to_json()
-    else:
-        raise Http404("Synset doesn't exist")
+    return service.get_synset(synsetid)
 
 
-@jsonp
+@timed
+@cached
 def search(request, query):
     ''' Search by lemma, sensekey or synsetID
     Mapping: /yawol/search/<query>
     '''
-    # assume that query is a synset?
+    return service.search(query)
+
+
+@timed
+@jsonp
+def complete(request, prefix):
+    ''' Autocomplete lemmas (most frequent first)
+    Mapping: /yawol/complete/<prefix>?limit=10&pos=n
+    '''
+    return service.complete(prefix, request.GET.get('limit', 10), request.GET.get('pos'))
+
+
+@csrf_exempt
+@timed
+@require_POST
+def batch(request):
+    ''' Resolve many synset IDs, sensekeys and lemmas in one request
+    Mapping: /yawol/batch
+    Body: {"queries": ["01775164-v", "love%2:37:00::", "love/n", ...]}
+    '''
     try:
-        sid = SynsetID.from_string(query)
-        ss = wsql.get_synset_by_id(sid)
-        if ss is not None:
-            return SynsetCollection().add(ss).to_json()
-    except:
-        pass
-    # try to search by lemma
-    synsets = wsql.get_synsets_by_lemma(query)
-    if synsets:
-        return synsets.to_json()
-    else:
-        # try to search by sensekey
-        ss = wsql.get_synset_by_sk(query)
-        if ss:
-            return SynsetCollection().add(ss).to_json()
-    # invalid query
-    raise Http404('Invalid query')
+        queries = service.read_batch(request.body)
+    except BatchError as e:
+        return HttpResponse(str(e), 'text/plain', status=e.status)
+    return StreamingHttpResponse(service.batch(queries), "application/json")
+
+
+@timed
+def export(request):
+    ''' Stream synsets as newline-delimited JSON ordered by synset ID
+    Mapping: /yawol/export?pos=n&fields=lemmas,definition&since_id=<last synsetid received>
+    '''
+    try:
+        chunks = service.export(request.GET.get('pos'), request.GET.get('fields'), request.GET.get('since_id'))
+    except ServiceError as e:
+        return HttpResponse(str(e), 'text/plain', status=e.status)
+    return StreamingHttpResponse(chunks, "application/x-ndjson")
+
+
+@timed
+def metrics(request):
+    ''' Metrics in Prometheus text format
+    Mapping: /yawol/metrics
+    '''
+    return HttpResponse(REGISTRY.render(), CONTENT_TYPE)
 
 
+@timed
 def index(request):
     ''' Yawol-django root '''
     return HttpResponse('Yawol {yv} - yawol-django/Django-{dv}'.format(yv=__version__, dv=django.get_version()), 'text/html')
 
 
+@timed
 @jsonp
 def version(request):
-    return {'product': 'yawol',
-            'version': __version__,
-            'server': 'yawol-django/Django-{}'.format(django.get_version())}
+    return service.version('yawol-django/Django-{}'.format(django.get_version()), __version__)